@@ -0,0 +1,413 @@
+import os, sys, json, time, uuid, signal, socket, asyncio, argparse, tempfile
+from collections import OrderedDict, deque
+from pathlib import Path
+
+# Permite ejecutarlo como script además de `python -m app.host.daemon`
+ROOT = Path(__file__).resolve().parents[2]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from app.json_codec import dumps_line, loads
+from app.host.mcp_client import MCPClientManager, STREAM_LIMIT, MAX_INFLIGHT
+from app.host.log_writer import get_logger, utc_ts
+from app.host.metrics import METRICS
+
+# Daemon del host: un proceso con un loop de larga vida que es dueño de los servidores MCP
+# (y de la caché de resultados) y atiende a varias UIs por un socket Unix local.
+# - Protocolo: JSON-RPC por líneas, como stdio. `hello`, `call`, `call_batch`, `status`,
+#   `metrics` y `$/cancelRequest`; el daemon avisa con la notificación `status` cuando un servidor cambia.
+# - Cada conexión es una sesión. Por servidor, las llamadas de todas las sesiones pasan por un
+#   FairScheduler: round-robin entre sesiones, así una UI con una ráfaga no deja esperando a otra.
+# - `DaemonClient` tiene la interfaz de MCPClientManager (call, call_batch, server_names,
+#   server_info, status, metrics, start_all, close), así las UIs, ToolCatalog y ToolCallExecutor no cambian.
+#
+#   python -m app.host.daemon            # luego la TUI / Streamlit lo usan solos (MCP_DAEMON=auto)
+
+DAEMON_MODE = os.getenv("MCP_DAEMON", "auto").lower()   # auto | 1 | 0
+STATUS_PUSH_S = 2.0   # además de en cada cambio, el estado (colas, sesiones) se reenvía cada tanto
+# Plazo total (cola del scheduler + llamada) si la UI no pasa timeout: el mayor de los defaults
+# de los transportes (stdio 10 s, HTTP 15 s); los batches, como call_batch, 30 s
+CALL_TIMEOUT, BATCH_TIMEOUT = 15, 30
+CLIENT_GRACE_S = 1.0  # DaemonClient espera un poco más, así normalmente llega el error del daemon
+
+def default_socket_path():
+    uid = os.getuid() if hasattr(os, "getuid") else 0
+    return os.getenv("MCP_DAEMON_SOCKET") or os.path.join(tempfile.gettempdir(), f"mcp-host-{uid}.sock")
+
+def daemon_available(path=None):
+    """¿Se usa el daemon? MCP_DAEMON=0 nunca; =1 siempre; auto, si su socket existe."""
+    if DAEMON_MODE in ("0", "false", "no") or not hasattr(socket, "AF_UNIX"):
+        return False
+    return DAEMON_MODE in ("1", "true", "yes") or os.path.exists(path or default_socket_path())
+
+class FairScheduler:
+    """Lugares de ejecución de un servidor repartidos en round-robin entre sesiones.
+
+    Mientras sobren lugares las llamadas pasan directo; cuando se llenan, cada sesión tiene su
+    cola y al liberarse un lugar se atiende a la siguiente sesión, no a la siguiente llamada.
+    """
+
+    def __init__(self, slots):
+        self.slots = max(1, slots)
+        self.busy = 0
+        self.queues = OrderedDict()   # sesión -> deque de futures, en orden de turno
+        self.waited_ms_max = 0.0
+        self.queued = 0
+
+    async def run(self, session, fn):
+        if self.busy < self.slots and not self.queues:
+            self.busy += 1
+        else:
+            t0 = time.perf_counter()
+            fut = asyncio.get_running_loop().create_future()
+            self.queues.setdefault(session, deque()).append(fut)
+            self.queued += 1
+            try:
+                await fut
+            except asyncio.CancelledError:
+                if fut.done() and not fut.cancelled():
+                    self._release()  # el lugar llegó junto con la cancelación
+                raise
+            self.waited_ms_max = max(self.waited_ms_max, (time.perf_counter() - t0) * 1000)
+        try:
+            return await fn()
+        finally:
+            self._release()
+
+    def _release(self):
+        self.busy -= 1
+        while self.busy < self.slots and self.queues:
+            session, q = next(iter(self.queues.items()))
+            fut = q.popleft()
+            if q:
+                self.queues.move_to_end(session)  # la sesión vuelve al final del turno
+            else:
+                del self.queues[session]
+            if fut.done():  # cancelada mientras esperaba
+                continue
+            self.busy += 1
+            fut.set_result(None)
+
+    def stats(self):
+        return {"busy": self.busy, "slots": self.slots, "waiting": sum(len(q) for q in self.queues.values()),
+                "sessions_waiting": len(self.queues), "queued": self.queued,
+                "waited_ms_max": round(self.waited_ms_max, 1)}
+
+def _encode_batch(results):
+    return [{"__error__": str(r)} if isinstance(r, Exception) else r for r in results]
+
+def _decode_batch(results):
+    return [RuntimeError(r["__error__"]) if isinstance(r, dict) and "__error__" in r else r for r in results]
+
+class _Session:
+    def __init__(self, writer):
+        self.id = uuid.uuid4().hex[:8]
+        self.writer = writer
+        self.tasks = {}   # id del request -> task
+        self.calls = 0
+        self.since = time.time()
+
+    async def send(self, obj):
+        if self.writer.is_closing():
+            return
+        self.writer.write(dumps_line(obj))
+        await self.writer.drain()  # una UI que no lee frena solo a su sesión
+
+class HostDaemon:
+    def __init__(self, mgr):
+        self.mgr = mgr
+        self.sessions = set()
+        self.schedulers = {}
+        for s in mgr.cfg.get("servers", []):
+            slots = s.get("max_inflight", MAX_INFLIGHT) if "command" in s else s.get("max_connections", 8)
+            self.schedulers[s["name"]] = FairScheduler(slots)
+        mgr.listeners.append(self._on_server_change)
+        self.logger = get_logger("mcp")
+        self._push = None
+
+    def _log(self, event, **data):
+        self.logger.log({"ts": utc_ts(), "direction": "daemon", "event": event, **data})
+
+    def status(self):
+        return {"servers": self.mgr.status(),
+                "info": {n: self.mgr.server_info(n) for n in self.mgr.server_names()},
+                "schedulers": {n: s.stats() for n, s in self.schedulers.items()},
+                "sessions": [{"session": s.id, "calls": s.calls, "inflight": len(s.tasks),
+                              "connected_s": round(time.time() - s.since)} for s in self.sessions]}
+
+    def _on_server_change(self, name, client):
+        if self._push is None or self._push.done():
+            self._push = asyncio.ensure_future(self._broadcast())
+
+    async def _broadcast(self):
+        msg = {"jsonrpc": "2.0", "method": "status", "params": self.status()}
+        await asyncio.gather(*(s.send(msg) for s in list(self.sessions)), return_exceptions=True)
+
+    async def push_status_forever(self):
+        while True:
+            await asyncio.sleep(STATUS_PUSH_S)
+            if self.sessions:
+                await self._broadcast()
+
+    async def handle(self, reader, writer):
+        session = _Session(writer)
+        self.sessions.add(session)
+        self._log("connect", session=session.id)
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (ValueError, ConnectionError):
+                    break
+                if not line:
+                    break
+                try:
+                    msg = loads(line)
+                except Exception:
+                    await session.send({"jsonrpc": "2.0", "id": None, "error": {"code": -32700, "message": "Parse error"}})
+                    continue
+                await self._dispatch(session, msg)
+        finally:
+            # UI cerrada: lo que tenía en curso se cancela (y llega $/cancelRequest al servidor)
+            for t in list(session.tasks.values()):
+                t.cancel()
+            self.sessions.discard(session)
+            self._log("disconnect", session=session.id, calls=session.calls)
+            writer.close()
+
+    async def _dispatch(self, session, msg):
+        if not isinstance(msg, dict) or not isinstance(msg.get("params") or {}, dict):
+            # JSON válido pero no un request (p.ej. [], 1, "x"): error, sin cortar la sesión
+            mid = msg.get("id") if isinstance(msg, dict) else None
+            await session.send({"jsonrpc": "2.0", "id": mid, "error": {"code": -32600, "message": "Invalid Request"}})
+            return
+        mid, method = msg.get("id"), msg.get("method")
+        params = msg.get("params") or {}
+        if method == "$/cancelRequest":
+            task = session.tasks.get(params.get("id"))
+            if task is not None:
+                task.cancel()
+        elif method == "hello":
+            if params.get("session"):
+                session.id = f"{params['session']}-{session.id}"
+            await session.send({"jsonrpc": "2.0", "id": mid, "result": {
+                "session": session.id, "cfg": self.mgr.cfg, **self.status()}})
+        elif method == "status":
+            await session.send({"jsonrpc": "2.0", "id": mid, "result": self.status()})
+        elif method == "metrics":
+            # Las del proceso del daemon: ahí están el manager y los transportes
+            await session.send({"jsonrpc": "2.0", "id": mid, "result": METRICS.snapshot()})
+        elif method in ("call", "call_batch"):
+            session.calls += 1
+            session.tasks[mid] = asyncio.ensure_future(self._call(session, mid, method, params))
+        else:
+            await session.send({"jsonrpc": "2.0", "id": mid, "error": {"code": -32601, "message": f"Method not found: {method}"}})
+
+    async def _call(self, session, mid, method, params):
+        server = params.get("server")
+        try:
+            sched = self.schedulers.get(server)
+            if sched is None:
+                raise RuntimeError(f"Server not available: {server}")
+            # El timeout cuenta desde que llega el pedido: incluye la espera en el scheduler
+            loop = asyncio.get_running_loop()
+            timeout = params.get("timeout")
+            deadline = loop.time() + (timeout or (CALL_TIMEOUT if method == "call" else BATCH_TIMEOUT))
+            if method == "call":
+                run = lambda: self.mgr.call(server, params.get("method"), params.get("params"),
+                                            max(0.001, deadline - loop.time()) if timeout else None)
+            else:
+                calls = [(m, p) for m, p in params.get("calls", [])]
+                run = lambda: self.mgr.call_batch(server, calls)
+            try:
+                result = await asyncio.wait_for(sched.run(session.id, run), deadline - loop.time())
+            except asyncio.TimeoutError:
+                raise RuntimeError(f"⏳ Timeout esperando a {server} en el daemon "
+                                   f"({sched.busy} en curso, {sum(map(len, sched.queues.values()))} en cola)")
+            if method != "call":
+                result = _encode_batch(result)
+            await session.send({"jsonrpc": "2.0", "id": mid, "result": result})
+        except asyncio.CancelledError:
+            pass  # la pidió cancelar la UI, o se desconectó: nadie espera la respuesta
+        except Exception as e:
+            await session.send({"jsonrpc": "2.0", "id": mid, "error": {"code": -32000, "message": str(e)}})
+        finally:
+            session.tasks.pop(mid, None)
+
+
+class DaemonClient:
+    """Cliente del daemon con la interfaz de MCPClientManager. Una instancia = una sesión."""
+
+    def __init__(self, path=None, session=None):
+        self.path = path or default_socket_path()
+        self.session = session
+        self.cfg = {"servers": []}
+        self.pending = {}
+        self.next_id = 1
+        self.snapshot = {"servers": {}, "info": {}}
+        self.reader = self.writer = self.read_task = None
+        self.loop = None
+        self._refresh = None
+
+    async def start_all(self):
+        self.loop = asyncio.get_running_loop()
+        self.reader, self.writer = await asyncio.open_unix_connection(self.path, limit=STREAM_LIMIT)
+        self.read_task = asyncio.ensure_future(self._read_loop())
+        hello = await self._request("hello", {"session": self.session})
+        self.session = hello["session"]
+        self.cfg = hello["cfg"]
+        self.snapshot = hello
+
+    async def _read_loop(self):
+        try:
+            while True:
+                line = await self.reader.readline()
+                if not line:
+                    break
+                msg = loads(line)
+                if msg.get("method") == "status":
+                    self.snapshot = msg["params"]
+                    continue
+                fut = self.pending.pop(msg.get("id"), None)
+                if fut is not None and not fut.done():
+                    fut.set_result(msg)
+        finally:
+            for fut in self.pending.values():
+                if not fut.done():
+                    fut.set_exception(RuntimeError("Se perdió la conexión con el daemon MCP"))
+            self.pending.clear()
+
+    async def _request(self, method, params, timeout=None):
+        if timeout is not None:
+            # Si el daemon no contesta a tiempo, wait_for cancela y eso manda $/cancelRequest
+            try:
+                return await asyncio.wait_for(self._request(method, params), timeout + CLIENT_GRACE_S)
+            except asyncio.TimeoutError:
+                raise RuntimeError(f"⏳ Timeout esperando al daemon MCP (>{timeout}s)")
+        if self.read_task is None or self.read_task.done():
+            raise RuntimeError("Sin conexión con el daemon MCP")
+        _id = self.next_id
+        self.next_id += 1
+        fut = asyncio.get_running_loop().create_future()
+        self.pending[_id] = fut
+        try:
+            self.writer.write(dumps_line({"jsonrpc": "2.0", "id": _id, "method": method, "params": params}))
+            await self.writer.drain()
+            msg = await fut
+        except asyncio.CancelledError:
+            if not self.writer.is_closing():
+                self.writer.write(dumps_line({"jsonrpc": "2.0", "method": "$/cancelRequest", "params": {"id": _id}}))
+            raise
+        finally:
+            self.pending.pop(_id, None)
+        if "error" in msg:
+            raise RuntimeError(msg["error"].get("message", str(msg["error"])))
+        return msg["result"]
+
+    async def call(self, server, method, params, timeout=None):
+        return await self._request("call", {"server": server, "method": method, "params": params, "timeout": timeout},
+                                   timeout=timeout or CALL_TIMEOUT)
+
+    async def call_batch(self, server, calls):
+        return _decode_batch(await self._request("call_batch", {"server": server, "calls": [list(c) for c in calls]},
+                                                 timeout=BATCH_TIMEOUT))
+
+    async def metrics(self):
+        return await self._request("metrics", {})
+
+    def server_names(self):
+        return [s["name"] for s in self.cfg.get("servers", [])]
+
+    def server_info(self, name):
+        return self.snapshot.get("info", {}).get(name)
+
+    def status(self):
+        # Sincrónico como el del manager: devuelve lo último que mandó el daemon y pide uno nuevo.
+        # Puede llamarse desde otro hilo (el script de Streamlit), así que se agenda en el loop propio.
+        if self.read_task is not None and not self.read_task.done():
+            self.loop.call_soon_threadsafe(self._schedule_refresh)
+        return self.snapshot.get("servers", {})
+
+    def _schedule_refresh(self):
+        if self._refresh is None or self._refresh.done():
+            self._refresh = asyncio.ensure_future(self._refresh_status())
+
+    async def _refresh_status(self):
+        try:
+            self.snapshot = await self._request("status", {})
+        except RuntimeError:
+            pass
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        if self.read_task is not None:
+            await asyncio.gather(self.read_task, return_exceptions=True)
+
+async def open_manager(cfg, session=None):
+    """El daemon si está disponible (ver daemon_available); si no, un MCPClientManager propio."""
+    if daemon_available():
+        client = DaemonClient(session=session)
+        try:
+            await client.start_all()
+            return client
+        except (FileNotFoundError, ConnectionRefusedError):
+            if DAEMON_MODE in ("1", "true", "yes"):
+                raise RuntimeError(f"MCP_DAEMON=1 pero no hay daemon escuchando en {client.path}")
+    mgr = MCPClientManager(cfg)
+    await mgr.start_all()
+    return mgr
+
+def _claim_socket(path):
+    # Un socket que quedó de un daemon muerto se borra; uno vivo significa que ya hay daemon
+    if not os.path.exists(path):
+        return
+    s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        s.connect(path)
+    except (ConnectionRefusedError, FileNotFoundError):
+        os.unlink(path)
+        return
+    finally:
+        s.close()
+    raise SystemExit(f"Ya hay un daemon MCP escuchando en {path}")
+
+async def serve(cfg, path):
+    _claim_socket(path)
+    mgr = MCPClientManager(cfg)
+    await mgr.start_all()
+    daemon = HostDaemon(mgr)
+    server = await asyncio.start_unix_server(daemon.handle, path=path, limit=STREAM_LIMIT)
+    os.chmod(path, 0o600)  # solo el usuario dueño puede usar sus servidores
+    pusher = asyncio.ensure_future(daemon.push_status_forever())
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    print(f"🛰️  Daemon MCP escuchando en {path} ({len(mgr.server_names())} servidores)", file=sys.stderr)
+    try:
+        await stop.wait()
+    finally:
+        pusher.cancel()
+        server.close()
+        for s in list(daemon.sessions):
+            s.writer.close()
+        await server.wait_closed()
+        await mgr.close()
+        if os.path.exists(path):
+            os.unlink(path)
+        print("Daemon MCP detenido", file=sys.stderr)
+
+def main():
+    ap = argparse.ArgumentParser(description="Daemon del host MCP: comparte los servidores entre UIs por un socket Unix")
+    ap.add_argument("--config", default=str(ROOT / "app" / "host" / "servers.config.json"))
+    ap.add_argument("--socket", default=default_socket_path())
+    ap.add_argument("--quiet", action="store_true", help="Sin eco del tráfico JSON-RPC en la consola")
+    args = ap.parse_args()
+    cfg = json.load(open(args.config, "r", encoding="utf-8"))
+    if args.quiet:
+        cfg["servers"] = [dict(s, echo=False) for s in cfg["servers"]]
+    asyncio.run(serve(cfg, args.socket))
+
+if __name__ == "__main__":
+    main()
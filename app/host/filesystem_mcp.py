@@ -1,10 +1,20 @@
 # filesystem_mcp.py (versión stdio JSON-RPC)
-import sys, os, json
+import sys, os, mmap, bisect, fnmatch, itertools
+from collections import OrderedDict
+from pathlib import Path
+
+# Permite importar app.* al ejecutarse como script (python app/host/<servidor>.py)
+ROOT = Path(__file__).resolve().parents[2]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from app.json_codec import dumps_line, loads
 
 TOOLS = [
     {
         "name": "filesystem/write_file",
         "description": "Crea o sobrescribe un archivo con contenido.",
+        "annotations": {"readOnlyHint": False, "destructiveHint": True},
         "input_schema": {
             "type": "object",
             "properties": {
@@ -16,22 +26,37 @@ TOOLS = [
     },
     {
         "name": "filesystem/read_file",
-        "description": "Lee el contenido de un archivo.",
+        "description": "Lee el contenido de un archivo, por rangos de bytes o de líneas. "
+                       "Si no cabe en max_bytes devuelve next_cursor para pedir el resto.",
+        "annotations": {"readOnlyHint": True, "idempotentHint": True},
         "input_schema": {
             "type": "object",
             "properties": {
-                "path": {"type": "string"}
+                "path": {"type": "string"},
+                "offset": {"type": "integer", "description": "Byte inicial (modo bytes)"},
+                "length": {"type": "integer", "description": "Bytes a leer desde offset"},
+                "start_line": {"type": "integer", "description": "Primera línea, desde 1 (modo líneas)"},
+                "end_line": {"type": "integer", "description": "Última línea, inclusive"},
+                "max_bytes": {"type": "integer", "description": "Tope de bytes por respuesta (def. 1 MiB)"},
+                "cursor": {"type": "string", "description": "next_cursor de la respuesta anterior"}
             },
             "required": ["path"]
         }
     },
     {
         "name": "filesystem/list_dir",
-        "description": "Lista los archivos en un directorio.",
+        "description": "Lista un directorio con tipo, tamaño y mtime de cada entrada, paginado. "
+                       "Si quedan entradas devuelve next_cursor para pedir la página siguiente.",
+        "annotations": {"readOnlyHint": True, "idempotentHint": True},
         "input_schema": {
             "type": "object",
             "properties": {
-                "path": {"type": "string"}
+                "path": {"type": "string"},
+                "recursive": {"type": "boolean", "description": "Incluir subdirectorios (no sigue symlinks)"},
+                "glob": {"type": "string", "description": "Filtro fnmatch sobre el nombre o la ruta relativa, ej: *.py"},
+                "limit": {"type": "integer", "description": "Entradas por página (def. 1000, máx. 10000)"},
+                "stat": {"type": "boolean", "description": "Incluir size y mtime (def. true)"},
+                "cursor": {"type": "string", "description": "next_cursor de la respuesta anterior"}
             },
             "required": ["path"]
         }
@@ -39,6 +64,7 @@ TOOLS = [
     {
         "name": "filesystem/delete_file",
         "description": "Elimina un archivo.",
+        "annotations": {"readOnlyHint": False, "destructiveHint": True},
         "input_schema": {
             "type": "object",
             "properties": {
@@ -55,6 +81,251 @@ def ok(id, result):
 def err(id, code, message):
     return {"jsonrpc": "2.0", "id": id, "error": {"code": code, "message": message}}
 
+# Tope por respuesta: un frame JSON-RPC es una línea y el host la lee entera en memoria
+READ_MAX_BYTES = int(os.getenv("MCP_FS_READ_MAX_BYTES", 1024 * 1024))
+READ_MAX_BYTES_LIMIT = 32 * 1024 * 1024
+SCAN_BLOCK = 1024 * 1024
+SCAN_WINDOW = 16 * SCAN_BLOCK  # múltiplo de mmap.ALLOCATIONGRANULARITY
+
+def _utf8_cut(data, eof):
+    """Recorta al final una secuencia UTF-8 incompleta para que la página siguiente empiece en un carácter."""
+    if eof or not data:
+        return data
+    i, n = len(data) - 1, 0
+    while i >= 0 and n < 3 and (data[i] & 0xC0) == 0x80:  # bytes de continuación 10xxxxxx
+        i, n = i - 1, n + 1
+    if i < 0:
+        return data
+    lead = data[i]
+    need = 2 if lead >> 5 == 0b110 else 3 if lead >> 4 == 0b1110 else 4 if lead >> 3 == 0b11110 else 1
+    return data[:i] if need > n + 1 else data
+
+def _window(f, start, length):
+    """mmap de solo lectura que cubre [start, start+length); devuelve (mm, base) con base alineada.
+    Se mapean ventanas y no el archivo entero: las páginas tocadas cuentan en el RSS."""
+    base = start - start % mmap.ALLOCATIONGRANULARITY
+    return mmap.mmap(f.fileno(), start + length - base, access=mmap.ACCESS_READ, offset=base), base
+
+def _line_offset(f, size, line):
+    """Offset del comienzo de `line` (1-based) contando saltos por bloques: memoria constante."""
+    pos, cur = 0, 1
+    while cur < line and pos < size:
+        mm, base = _window(f, pos, min(SCAN_WINDOW, size - pos))
+        with mm:
+            while cur < line and pos - base < len(mm):
+                r = pos - base
+                nl = mm[r:r + SCAN_BLOCK].count(b"\n")
+                if cur + nl < line:
+                    cur, pos = cur + nl, min(base + len(mm), pos + SCAN_BLOCK)
+                    continue
+                for _ in range(line - cur):  # el salto buscado está en este bloque
+                    r = mm.find(b"\n", r) + 1
+                cur, pos = line, base + r
+    return min(pos, size)
+
+LIST_LIMIT = 1000
+LIST_LIMIT_MAX = 10000
+# Con glob, cuántas entradas se miran después de la página para decidir si hay otra. Pasado
+# el tope se devuelve un cursor optimista (la página siguiente puede volver vacía).
+LIST_LOOKAHEAD = 2000
+# Listados ordenados de directorios grandes, para que paginar no re-lea y re-ordene todo en cada
+# página. Se invalidan por mtime del directorio (cambia al crear/borrar/renombrar entradas).
+DIR_CACHE_MIN_ENTRIES = 2000
+DIR_CACHE_MAX_ENTRIES = 1_000_000
+_dir_cache: "OrderedDict[str, tuple]" = OrderedDict()
+_dir_cache_entries = 0
+
+def _entry_type(entry):
+    # DirEntry trae el tipo del propio readdir (d_type): sin stat extra
+    if entry.is_symlink():
+        return "symlink"
+    if entry.is_dir(follow_symlinks=False):
+        return "dir"
+    if entry.is_file(follow_symlinks=False):
+        return "file"
+    return "other"
+
+def _sorted_dir(path):
+    """(nombres, tipos) del directorio, ordenados por nombre."""
+    global _dir_cache_entries
+    mtime = os.stat(path).st_mtime_ns
+    hit = _dir_cache.get(path)
+    if hit is not None and hit[0] == mtime:
+        _dir_cache.move_to_end(path)
+        return hit[1], hit[2]
+    with os.scandir(path) as it:
+        kinds = {e.name: _entry_type(e) for e in it}
+    names = sorted(kinds)  # ordenar str sueltos es ~1.5x más rápido que tuplas (nombre, tipo)
+    types = [kinds[n] for n in names]
+    if hit is not None:
+        _dir_cache_entries -= len(_dir_cache.pop(path)[1])
+    if DIR_CACHE_MIN_ENTRIES <= len(names) <= DIR_CACHE_MAX_ENTRIES:
+        _dir_cache[path] = (mtime, names, types)
+        _dir_cache_entries += len(names)
+        while _dir_cache_entries > DIR_CACHE_MAX_ENTRIES:
+            _dir_cache_entries -= len(_dir_cache.popitem(last=False)[1][1])
+    return names, types
+
+def _walk_sorted(root, rel, recursive, after, errors):
+    """Recorrido en preorden con las entradas de cada directorio ordenadas por nombre.
+
+    `after` son los componentes de la última ruta entregada (el cursor): se baja por bisección
+    directamente hasta esa posición en vez de recorrer lo ya entregado.
+    """
+    try:
+        names, types = _sorted_dir(root)
+    except OSError as e:
+        errors.append(f"{rel or '.'}: {e.strerror or e}")
+        return
+    i = 0
+    if after:
+        i = bisect.bisect_left(names, after[0])
+        if i < len(names) and names[i] == after[0]:
+            if recursive and types[i] == "dir":
+                # el directorio ya se entregó (o algo dentro): seguir desde su contenido
+                yield from _walk_sorted(os.path.join(root, names[i]), f"{rel}{names[i]}/", recursive, after[1:], errors)
+            i += 1
+    for name, kind in zip(names[i:], types[i:]) if i else zip(names, types):
+        yield f"{rel}{name}", name, kind, root
+        if recursive and kind == "dir":
+            yield from _walk_sorted(os.path.join(root, name), f"{rel}{name}/", recursive, None, errors)
+
+def list_dir_page(path, args):
+    """Una página de `path`, ordenada por nombre. El tipo sale de d_type vía os.scandir, sin stat;
+    size/mtime cuestan un lstat solo por entrada devuelta. El cursor es la ruta relativa de la
+    última entrada, así paginar no re-entrega ni salta entradas aunque el directorio cambie."""
+    if not os.path.isdir(path):
+        raise NotADirectoryError(f"{path} no es un directorio válido")
+    limit = int(args.get("limit") or LIST_LIMIT)
+    if not 0 < limit <= LIST_LIMIT_MAX:
+        raise ValueError(f"limit debe estar entre 1 y {LIST_LIMIT_MAX}")
+    recursive, pattern = bool(args.get("recursive")), args.get("glob")
+    with_stat = args.get("stat", True) is not False
+    after = args["cursor"].split("/") if args.get("cursor") else None
+
+    entries, errors, last = [], [], None
+    match = (lambda rel, name: fnmatch.fnmatch(name, pattern) or fnmatch.fnmatch(rel, pattern)) if pattern \
+        else (lambda rel, name: True)
+    walker = _walk_sorted(path, "", recursive, after, errors)
+    for rel, name, kind, parent in walker:
+        last = rel
+        if not match(rel, name):
+            continue
+        item = {"name": name, "path": rel, "type": kind}
+        if with_stat:
+            try:
+                st = os.lstat(os.path.join(parent, name))
+                if kind != "dir":
+                    item["size"] = st.st_size
+                item["mtime"] = round(st.st_mtime, 3)
+            except OSError:
+                pass  # borrado entre el listado y el stat
+        entries.append(item)
+        if len(entries) == limit:
+            break
+    more = False
+    if len(entries) == limit:
+        # Con glob, solo hay página siguiente si queda alguna entrada que coincida, pero sin
+        # recorrer el resto del árbol: si no aparece en LIST_LOOKAHEAD entradas, se supone que sí
+        scanned = 0
+        for rel, name, _, _ in itertools.islice(walker, LIST_LOOKAHEAD if pattern else 1):
+            scanned += 1
+            if match(rel, name):
+                more = True
+                break
+        else:
+            more = bool(pattern) and scanned == LIST_LOOKAHEAD
+    walker.close()
+    data = {"files": [e["path"] for e in entries], "entries": entries,
+            "next_cursor": last if more else None}
+    if errors:
+        data["errors"] = errors[:20]
+    return {"content": [{"type": "json", "data": data}]}
+
+def _parse_cursor(cursor):
+    try:
+        kind, *nums = cursor.split(":")
+        nums = [int(x) for x in nums]
+        if (kind, len(nums)) in (("b", 1), ("b", 2), ("l", 2)) and min(nums) >= 0:
+            return kind, nums
+    except (AttributeError, ValueError):
+        pass
+    raise ValueError(f"cursor inválido: {cursor!r}")
+
+def read_file_range(path, args):
+    """Lee una página de `path` sin cargar el archivo completo.
+
+    Modo bytes (offset/length) o modo líneas (start_line/end_line, líneas buscadas con mmap).
+    Cada respuesta trae como mucho `max_bytes`; si quedó contenido, `next_cursor` lo continúa.
+    """
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Archivo {path} no existe")
+    max_bytes = int(args.get("max_bytes") or READ_MAX_BYTES)
+    if not 0 < max_bytes <= READ_MAX_BYTES_LIMIT:
+        raise ValueError(f"max_bytes debe estar entre 1 y {READ_MAX_BYTES_LIMIT}")
+    line_mode = args.get("start_line") is not None or args.get("end_line") is not None
+    start_line, offset = int(args.get("start_line") or 1), int(args.get("offset") or 0)
+    stop = offset + int(args["length"]) if args.get("length") is not None else None  # fin de la ventana pedida
+    if args.get("cursor"):
+        kind, nums = _parse_cursor(args["cursor"])
+        line_mode = kind == "l"
+        if line_mode:
+            start_line, offset = nums
+        else:
+            # b:<pos>:<fin>: el fin de la ventana original viaja en el cursor
+            offset, stop = nums[0], nums[1] if len(nums) > 1 else None
+    elif line_mode:
+        offset = None  # se busca con mmap
+    if start_line < 1 or (offset is not None and offset < 0):
+        raise ValueError("offset y start_line no pueden ser negativos (start_line empieza en 1)")
+
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        info = {"path": path, "size": size}
+        if not line_mode:
+            limit = size if stop is None else min(size, stop)
+            f.seek(offset)
+            raw = f.read(max(0, min(max_bytes, limit - offset)))  # read(n) reserva n bytes aunque el archivo sea menor
+            end = offset + len(raw)
+            data = _utf8_cut(raw, end >= limit) or raw  # un carácter más largo que max_bytes se entrega cortado
+            end = offset + len(data)
+            cursor = f"b:{end}" if stop is None else f"b:{end}:{stop}"
+            info.update(mode="bytes", offset=offset, length=len(data), eof=end >= size,
+                        next_cursor=cursor if end < limit else None)
+            return {"content": [{"type": "text", "text": data.decode("utf-8", "replace")}], "range": info}
+
+        end_line = args.get("end_line")
+        end_line = int(end_line) if end_line is not None else None
+        if offset is None:
+            offset = _line_offset(f, size, start_line)
+        stop = min(size, offset + max_bytes)
+        pos, line, partial = offset, start_line, False
+        if offset < size:  # mmap no admite longitud 0 (archivo vacío o inicio más allá del final)
+            mm, base = _window(f, offset, stop - offset)
+            with mm:
+                while pos < size and (end_line is None or line <= end_line):
+                    nl = mm.find(b"\n", pos - base)
+                    if nl < 0:
+                        if stop < size:  # la línea no entra entera en la página
+                            partial = pos == offset  # una sola línea más larga que max_bytes: se corta
+                            if partial:
+                                pos = offset + len(_utf8_cut(mm[offset - base:], False))
+                            break
+                        pos, line = size, line + 1
+                        break
+                    pos, line = base + nl + 1, line + 1
+                data = mm[offset - base:pos - base]
+        else:
+            data = b""
+        last_line = line - 1 if not partial else line
+        more = pos < size and (end_line is None or line <= end_line)
+        info.update(mode="lines", offset=offset, length=len(data), start_line=start_line,
+                    end_line=last_line, eof=pos >= size,
+                    next_cursor=f"l:{line}:{pos}" if more else None)
+        if partial:
+            info["truncated_line"] = True
+        return {"content": [{"type": "text", "text": data.decode("utf-8", "replace")}], "range": info}
+
 def handle_call(name, args):
     if name == "filesystem/write_file":
         path, content = args["path"], args["content"]
@@ -62,18 +333,9 @@ def handle_call(name, args):
             f.write(content)
         return {"content": [{"type": "text", "text": f"Archivo {path} creado"}]}
     if name == "filesystem/read_file":
-        path = args["path"]
-        if not os.path.exists(path):
-            raise FileNotFoundError(f"Archivo {path} no existe")
-        with open(path, "r", encoding="utf-8") as f:
-            content = f.read()
-        return {"content": [{"type": "text", "text": content}]}
+        return read_file_range(args["path"], args)
     if name == "filesystem/list_dir":
-        path = args["path"]
-        if not os.path.isdir(path):
-            raise NotADirectoryError(f"{path} no es un directorio válido")
-        files = os.listdir(path)
-        return {"content": [{"type": "json", "data": {"files": files}}]}
+        return list_dir_page(args["path"], args)
     if name == "filesystem/delete_file":
         path = args["path"]
         if not os.path.exists(path):
@@ -82,31 +344,46 @@ def handle_call(name, args):
         return {"content": [{"type": "text", "text": f"Archivo {path} eliminado"}]}
     raise ValueError(f"Unknown tool: {name}")
 
+def handle_request(data):
+    """Procesa un request JSON-RPC; devuelve la respuesta, o None si es una notificación (sin id)."""
+    if not isinstance(data, dict):
+        return err(None, -32600, "Invalid Request")
+    mid, method, params = data.get("id"), data.get("method"), data.get("params", {}) or {}
+    if method == "initialize":
+        resp = ok(mid, {"protocolVersion": "2024-08-01", "server": "filesystem"})
+    elif method == "ping":
+        resp = ok(mid, {})
+    elif method == "tools/list":
+        resp = ok(mid, {"tools": TOOLS})
+    elif method == "tools/call":
+        try:
+            name, args = params.get("name"), params.get("arguments", {}) or {}
+            resp = ok(mid, handle_call(name, args))
+        except Exception as e:
+            resp = err(mid, -32000, str(e))
+    else:
+        resp = err(mid, -32601, f"Method not found: {method}")
+    return resp if "id" in data else None
+
+def handle_message(data):
+    """Un frame puede ser un request o un batch (array); el batch se responde con un array."""
+    if isinstance(data, list):
+        if not data:
+            return err(None, -32600, "Invalid Request: empty batch")
+        out = [r for r in (handle_request(d) for d in data) if r is not None]
+        return out or None
+    return handle_request(data)
+
 def main():
-    for line in sys.stdin:
+    out = sys.stdout.buffer
+    for line in sys.stdin.buffer:  # bytes de punta a punta: sin decodificar/re-codificar cada frame
         try:
-            data = json.loads(line)
-            mid, method, params = data.get("id"), data.get("method"), data.get("params", {}) or {}
-            if method == "initialize":
-                print(json.dumps(ok(mid, {"protocolVersion": "2024-08-01", "server": "filesystem"})))
-                sys.stdout.flush()
-            elif method == "tools/list":
-                print(json.dumps(ok(mid, {"tools": TOOLS})))
-                sys.stdout.flush()
-            elif method == "tools/call":
-                name, args = params.get("name"), params.get("arguments", {}) or {}
-                try:
-                    result = handle_call(name, args)
-                    print(json.dumps(ok(mid, result)))
-                except Exception as e:
-                    print(json.dumps(err(mid, -32000, str(e))))
-                sys.stdout.flush()
-            else:
-                print(json.dumps(err(mid, -32601, f"Method not found: {method}")))
-                sys.stdout.flush()
+            resp = handle_message(loads(line))
         except Exception as e:
-            print(json.dumps(err(None, -32700, f"Parse error: {e}")))
-            sys.stdout.flush()
+            resp = err(None, -32700, f"Parse error: {e}")
+        if resp is not None:
+            out.write(dumps_line(resp))
+            out.flush()
 
 if __name__ == "__main__":
     main()
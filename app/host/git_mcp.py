@@ -1,10 +1,19 @@
 # git_mcp.py (versión stdio)
-import sys, json, subprocess, os
+import sys, time, subprocess, os, re, tempfile
+from pathlib import Path
+
+# Permite importar app.* al ejecutarse como script (python app/host/<servidor>.py)
+ROOT = Path(__file__).resolve().parents[2]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from app.json_codec import dumps_line, loads
 
 TOOLS = [
     {
         "name": "git/init",
         "description": "Inicializa un repositorio Git en un directorio.",
+        "annotations": {"readOnlyHint": False, "destructiveHint": False},
         "input_schema": {
             "type": "object",
             "properties": {"path": {"type": "string"}},
@@ -13,16 +22,94 @@ TOOLS = [
     },
     {
         "name": "git/status",
-        "description": "Devuelve el estado del repositorio.",
+        "description": "Devuelve el estado del repositorio (rama, upstream y archivos cambiados).",
+        "annotations": {"readOnlyHint": True, "idempotentHint": True},
         "input_schema": {
             "type": "object",
-            "properties": {"path": {"type": "string"}},
+            "properties": {
+                "path": {"type": "string"},
+                "limit": {"type": "integer", "description": "Máximo de archivos listados (def. 1000)"},
+                "refresh": {"type": "boolean", "description": "Ignorar la caché de status"}
+            },
+            "required": ["path"]
+        }
+    },
+    {
+        "name": "git/read_file",
+        "description": "Lee un archivo tal como está en una revisión (por defecto HEAD), sin tocar el working tree.",
+        "annotations": {"readOnlyHint": True, "idempotentHint": True},
+        "input_schema": {
+            "type": "object",
+            "properties": {
+                "path": {"type": "string", "description": "Ruta del repositorio"},
+                "file": {"type": "string", "description": "Ruta del archivo relativa a la raíz del repo"},
+                "rev": {"type": "string", "description": "Commit, rama o tag (def. HEAD)"},
+                "max_bytes": {"type": "integer", "description": "Tope de bytes devueltos (def. 1 MiB)"}
+            },
+            "required": ["path", "file"]
+        }
+    },
+    {
+        "name": "git/log",
+        "description": "Historial de commits, paginado. Si quedan commits devuelve next_cursor para pedir la página siguiente.",
+        "annotations": {"readOnlyHint": True, "idempotentHint": True},
+        "input_schema": {
+            "type": "object",
+            "properties": {
+                "path": {"type": "string", "description": "Ruta del repositorio"},
+                "rev": {"type": "string", "description": "Desde qué commit/rama (def. HEAD)"},
+                "limit": {"type": "integer", "description": "Commits por página (def. 50, máx. 500)"},
+                "paths": {"type": "array", "items": {"type": "string"}, "description": "Limitar a estas rutas (pathspecs)"},
+                "author": {"type": "string"},
+                "grep": {"type": "string", "description": "Filtrar por texto en el mensaje"},
+                "stat": {"type": "boolean", "description": "Incluir archivos cambiados y líneas +/- por commit"},
+                "cursor": {"type": "string", "description": "next_cursor de la respuesta anterior"}
+            },
+            "required": ["path"]
+        }
+    },
+    {
+        "name": "git/diff",
+        "description": "Diff del working tree, del índice (staged) o entre dos revisiones. "
+                       "Diffs grandes se devuelven por páginas de max_bytes con next_cursor.",
+        "annotations": {"readOnlyHint": True, "idempotentHint": True},
+        "input_schema": {
+            "type": "object",
+            "properties": {
+                "path": {"type": "string", "description": "Ruta del repositorio"},
+                "base": {"type": "string", "description": "Revisión base (sin base: contra el índice, o HEAD si staged)"},
+                "target": {"type": "string", "description": "Revisión destino (sin target: working tree)"},
+                "staged": {"type": "boolean", "description": "Diff de lo que está en el índice"},
+                "paths": {"type": "array", "items": {"type": "string"}, "description": "Limitar a estas rutas (pathspecs)"},
+                "stat": {"type": "boolean", "description": "Solo archivos y líneas +/-, sin el patch"},
+                "context": {"type": "integer", "description": "Líneas de contexto (def. 3)"},
+                "max_bytes": {"type": "integer", "description": "Tope de bytes por página (def. 256 KiB)"},
+                "cursor": {"type": "string", "description": "next_cursor de la respuesta anterior"}
+            },
+            "required": ["path"]
+        }
+    },
+    {
+        "name": "git/show",
+        "description": "Muestra un commit (cabecera, mensaje y patch). Patches grandes se devuelven por páginas con next_cursor.",
+        "annotations": {"readOnlyHint": True, "idempotentHint": True},
+        "input_schema": {
+            "type": "object",
+            "properties": {
+                "path": {"type": "string", "description": "Ruta del repositorio"},
+                "rev": {"type": "string", "description": "Commit a mostrar (def. HEAD)"},
+                "paths": {"type": "array", "items": {"type": "string"}, "description": "Limitar a estas rutas (pathspecs)"},
+                "stat": {"type": "boolean", "description": "Solo archivos y líneas +/-, sin el patch"},
+                "max_bytes": {"type": "integer", "description": "Tope de bytes por página (def. 256 KiB)"},
+                "cursor": {"type": "string", "description": "next_cursor de la respuesta anterior"}
+            },
             "required": ["path"]
         }
     },
     {
         "name": "git/commit",
         "description": "Hace commit de cambios con un mensaje.",
+        "annotations": {"readOnlyHint": False, "destructiveHint": False},
         "input_schema": {
             "type": "object",
             "properties": {
@@ -46,45 +133,523 @@ def run_git_command(path, args):
         raise RuntimeError(result.stderr.strip())
     return result.stdout.strip()
 
+# --- Backend de larga vida: cat-file --batch por repo y status en caché ---
+
+# 0 (por defecto): sin caché por tiempo. Editar el working tree no toca nada de .git, así que
+# el sello índice/HEAD/rama no alcanza para saber que un status sigue vigente (p.ej. write_file
+# seguido de git/status). Con MCP_GIT_STATUS_TTL > 0 se acepta esa ventana de desactualización.
+STATUS_TTL = float(os.getenv("MCP_GIT_STATUS_TTL", 0))
+STATUS_LIMIT = 1000
+READ_MAX_BYTES = 1024 * 1024
+
+_GIT_VERSION = None
+
+def _git_version():
+    # Una sola vez por proceso: status lo consulta en cada lectura sin caché
+    global _GIT_VERSION
+    if _GIT_VERSION is None:
+        try:
+            out = subprocess.run(["git", "--version"], capture_output=True, text=True).stdout
+            _GIT_VERSION = tuple(int(x) for x in out.split()[2].split(".")[:2])
+        except Exception:
+            _GIT_VERSION = (0, 0)
+    return _GIT_VERSION
+
+def _status_config():
+    # -c en cada status en vez de `git config`: no se modifica la configuración del repo del usuario.
+    # untrackedCache: git guarda en el índice qué directorios no cambiaron y no los vuelve a leer.
+    # fsmonitor nativo (git >= 2.37) solo existe en Windows y macOS.
+    opts = ["-c", "core.untrackedCache=true"]
+    if sys.platform in ("win32", "darwin") and _git_version() >= (2, 37):
+        opts += ["-c", "core.fsmonitor=true"]
+    return opts
+
+class CatFile:
+    """Proceso `git cat-file --batch` (o `--batch-check`) que vive mientras el servidor:
+    cada lectura de objeto es una línea por el pipe, sin lanzar un git nuevo."""
+
+    def __init__(self, repo, check=False):
+        self.repo = repo
+        self.check = check
+        self.proc = None
+
+    def _start(self):
+        mode = "--batch-check" if self.check else "--batch"
+        self.proc = subprocess.Popen(["git", "-C", self.repo, "cat-file", mode],
+                                     stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+
+    def query(self, name, max_bytes=None):
+        """(oid, tipo, tamaño, datos) o None si el objeto no existe. Con --batch-check, datos=None.
+        Si el objeto supera max_bytes, el resto se lee del pipe y se descarta."""
+        if "\n" in name or not name:
+            raise ValueError(f"Nombre de objeto inválido: {name!r}")
+        for attempt in (0, 1):
+            if self.proc is None or self.proc.poll() is not None:
+                self._start()
+            try:
+                self.proc.stdin.write(name.encode("utf-8") + b"\n")
+                self.proc.stdin.flush()
+                header = self.proc.stdout.readline()
+            except (BrokenPipeError, OSError):
+                header = b""
+            if header:
+                break
+            self.close()  # el proceso murió: se relanza una vez
+        else:
+            raise RuntimeError(f"git cat-file no responde en {self.repo}")
+        parts = header.decode("utf-8", "replace").split()
+        if len(parts) != 3 or parts[-1] in ("missing", "ambiguous"):
+            return None
+        oid, kind, size = parts[0], parts[1], int(parts[2])
+        if self.check:
+            return oid, kind, size, None
+        keep = size if max_bytes is None else min(size, max_bytes)
+        data = self.proc.stdout.read(keep)
+        left = size - keep
+        while left > 0:
+            left -= len(self.proc.stdout.read(min(left, 1 << 20)))
+        self.proc.stdout.read(1)  # LF final
+        return oid, kind, size, data
+
+    def close(self):
+        if self.proc is not None:
+            try:
+                self.proc.stdin.close()
+                self.proc.wait(timeout=2)
+            except Exception:
+                self.proc.kill()
+            self.proc = None
+
+class GitRepo:
+    """Estado por repositorio: procesos cat-file y la última salida de status."""
+
+    def __init__(self, top, git_dir):
+        self.top = top
+        self.git_dir = git_dir
+        self.batch = CatFile(top)
+        self.batch_check = CatFile(top, check=True)
+        self.status_key = None
+        self.status_at = 0.0
+        self.status = None
+
+    def _stamp(self):
+        # Cambia si cambian el índice, HEAD o la rama a la que apunta HEAD (commit, checkout, add...)
+        paths = [os.path.join(self.git_dir, "index"), os.path.join(self.git_dir, "HEAD"),
+                 os.path.join(self.git_dir, "packed-refs")]
+        try:
+            with open(paths[1], encoding="utf-8") as f:
+                head = f.read().strip()
+            if head.startswith("ref: "):
+                paths.append(os.path.join(self.git_dir, *head[5:].split("/")))
+        except OSError:
+            pass
+        stamp = []
+        for p in paths:
+            try:
+                st = os.stat(p)
+                stamp.append((st.st_mtime_ns, st.st_size))
+            except OSError:
+                stamp.append(None)
+        return tuple(stamp)
+
+    def get_status(self, refresh=False):
+        """Status parseado. Con STATUS_TTL > 0 se reutiliza mientras índice/HEAD/rama no cambien y
+        no pase el TTL; ediciones del working tree dentro de esa ventana no se ven."""
+        if (not refresh and self.status is not None and self._stamp() == self.status_key
+                and time.monotonic() - self.status_at < STATUS_TTL):
+            return self.status, True
+        out = subprocess.run(["git", "-C", self.top] + _status_config() +
+                             ["status", "--porcelain=v2", "-z", "--branch"], capture_output=True)
+        if out.returncode != 0:
+            raise RuntimeError(out.stderr.decode("utf-8", "replace").strip())
+        self.status = parse_status_v2(out.stdout)
+        # La clave se toma *después*: status puede reescribir el índice (stat refresh, untracked cache)
+        self.status_key = self._stamp()
+        self.status_at = time.monotonic()
+        return self.status, False
+
+    def close(self):
+        self.batch.close()
+        self.batch_check.close()
+
+_repos = {}      # raíz del repo -> GitRepo
+_repo_of = {}    # path pedido -> raíz del repo
+
+def get_repo(path):
+    key = os.path.abspath(path)
+    top = _repo_of.get(key)
+    if top is None:
+        out = run_git_command(path, ["rev-parse", "--show-toplevel", "--absolute-git-dir"]).splitlines()
+        top, git_dir = out[0], out[1]
+        if top not in _repos:
+            _repos[top] = GitRepo(top, git_dir)
+        _repo_of[key] = top
+    return _repos[top]
+
+def forget_repo(path):
+    # git/init sobre un path ya visto como "no repo" o parte de otro: volver a resolver
+    _repo_of.pop(os.path.abspath(path), None)
+
+def parse_status_v2(raw):
+    """Parsea `git status --porcelain=v2 -z --branch`."""
+    branch, entries = {}, []
+    recs = raw.decode("utf-8", "replace").split("\0")
+    i = 0
+    while i < len(recs):
+        rec = recs[i]
+        i += 1
+        if not rec:
+            continue
+        if rec.startswith("# branch."):
+            key, _, value = rec[9:].partition(" ")
+            if key == "ab":
+                ahead, behind = value.split()
+                branch["ahead"], branch["behind"] = int(ahead), -int(behind)
+            else:
+                branch[key] = value
+        elif rec[0] == "1":
+            f = rec.split(" ", 8)
+            entries.append({"kind": "changed", "xy": f[1], "path": f[8]})
+        elif rec[0] == "2":
+            f = rec.split(" ", 9)
+            entries.append({"kind": "renamed", "xy": f[1], "path": f[9], "orig_path": recs[i]})
+            i += 1  # en -z la ruta original va en el registro siguiente
+        elif rec[0] == "u":
+            f = rec.split(" ", 10)
+            entries.append({"kind": "unmerged", "xy": f[1], "path": f[10]})
+        elif rec[0] in "?!":
+            entries.append({"kind": "untracked" if rec[0] == "?" else "ignored", "xy": rec[0] * 2, "path": rec[2:]})
+    return {"branch": branch, "entries": entries}
+
+def format_status(status, limit):
+    """Texto estilo `git status --short --branch` (el formato que devolvía git/status)."""
+    b = status["branch"]
+    head = b.get("head", "")
+    if b.get("oid") == "(initial)":
+        line = f"## No commits yet on {head}"
+    else:
+        line = f"## {'HEAD (no branch)' if head == '(detached)' else head}"
+    if b.get("upstream"):
+        line += f"...{b['upstream']}"
+        ab = [f"{k} {b[k]}" for k in ("ahead", "behind") if b.get(k)]
+        if ab:
+            line += f" [{', '.join(ab)}]"
+    lines = [line]
+    for e in status["entries"][:limit]:
+        xy = e["xy"].replace(".", " ")
+        path = f"{e['orig_path']} -> {e['path']}" if e["kind"] == "renamed" else e["path"]
+        lines.append(f"{xy} {path}")
+    return "\n".join(lines)
+
+def git_status(args):
+    repo = get_repo(args["path"])
+    limit = int(args.get("limit") or STATUS_LIMIT)
+    status, cached = repo.get_status(bool(args.get("refresh")))
+    entries = status["entries"]
+    data = {"branch": status["branch"], "entries": entries[:limit], "total": len(entries),
+            "truncated": len(entries) > limit, "clean": not entries, "cached": cached}
+    return {"content": [{"type": "text", "text": format_status(status, limit)},
+                        {"type": "json", "data": data}]}
+
+def git_read_file(args):
+    repo = get_repo(args["path"])
+    rev, file = args.get("rev") or "HEAD", args["file"].replace("\\", "/").lstrip("/")
+    max_bytes = int(args.get("max_bytes") or READ_MAX_BYTES)
+    obj = repo.batch.query(f"{rev}:{file}", max_bytes)
+    if obj is None:
+        raise FileNotFoundError(f"{file} no existe en {rev}")
+    oid, kind, size, data = obj
+    if kind != "blob":
+        raise IsADirectoryError(f"{file} en {rev} es un {kind}, no un archivo")
+    return {"content": [{"type": "text", "text": data.decode("utf-8", "replace")}],
+            "object": {"oid": oid, "size": size, "truncated": size > len(data)}}
+
+# --- Historial: log / diff / show paginados, leyendo la salida de git por trozos ---
+
+LOG_LIMIT, LOG_LIMIT_MAX = 50, 500
+DIFF_MAX_BYTES, DIFF_MAX_BYTES_LIMIT = 256 * 1024, 4 * 1024 * 1024
+STREAM_CHUNK = 64 * 1024
+# Sin pager, colores, diff externo ni rutas con escapes octales: salida estable y legible
+GIT_READ_OPTS = ["-c", "core.quotePath=false", "-c", "color.ui=false", "-c", "diff.external="]
+
+def stream_git(top, args, offset=0, max_bytes=DIFF_MAX_BYTES):
+    """Corre git y lee su stdout por trozos de STREAM_CHUNK: descarta los primeros `offset` bytes,
+    guarda como mucho `max_bytes` y mata el proceso en cuanto sobra algo.
+    Nunca se tiene en memoria más de una página. Devuelve (bytes, quedó_más).
+    stderr va a un archivo temporal: un pipe sin leer se llena (p.ej. muchos warnings) y git se bloquea."""
+    errf = tempfile.TemporaryFile()
+    proc = subprocess.Popen(["git", "-C", top] + GIT_READ_OPTS + args,
+                            stdout=subprocess.PIPE, stderr=errf)
+    buf, skipped, more = bytearray(), 0, False
+    try:
+        while True:
+            chunk = proc.stdout.read1(STREAM_CHUNK)
+            if not chunk:
+                break
+            if skipped < offset:
+                take = min(len(chunk), offset - skipped)
+                skipped += take
+                chunk = chunk[take:]
+            if len(chunk) > max_bytes - len(buf):
+                buf += chunk[:max_bytes - len(buf)]
+                more = True
+                break
+            buf += chunk
+    finally:
+        if more:
+            proc.kill()
+        proc.stdout.close()
+        code = proc.wait()
+        errf.seek(0)
+        stderr = errf.read()
+        errf.close()
+    if not more and code != 0:
+        raise RuntimeError(stderr.decode("utf-8", "replace").strip())
+    return bytes(buf), more
+
+def _page_cut(data, more):
+    """Corta la página en el último salto de línea (o, si una sola línea no entra, en un carácter UTF-8 completo)."""
+    if not more or not data:
+        return data
+    nl = data.rfind(b"\n")
+    if nl >= 0:
+        return data[:nl + 1]
+    i, n = len(data) - 1, 0
+    while i >= 0 and n < 3 and (data[i] & 0xC0) == 0x80:  # bytes de continuación 10xxxxxx
+        i, n = i - 1, n + 1
+    if i < 0:
+        return data
+    lead = data[i]
+    need = 2 if lead >> 5 == 0b110 else 3 if lead >> 4 == 0b1110 else 4 if lead >> 3 == 0b11110 else 1
+    return data[:i] if n + 1 < need else data
+
+OID_RE = re.compile(r"[0-9a-f]{40}(?:[0-9a-f]{24})?")  # SHA-1 o SHA-256
+
+def _parse_cursor(cursor, kind):
+    try:
+        k, value = cursor.split(":", 1)
+        if k == kind == "b" and int(value) >= 0:
+            return int(value)
+        if k == kind and kind in ("c", "s"):
+            # El oid viene del cliente y termina como argumento de git: solo un hash completo
+            oid, skip = value.split(":")
+            if int(skip) >= 0 and OID_RE.fullmatch(oid):
+                return oid, int(skip)
+    except (AttributeError, ValueError):
+        pass
+    raise ValueError(f"cursor inválido: {cursor!r}")
+
+def _pathspecs(args):
+    paths = args.get("paths") or []
+    if isinstance(paths, str):
+        paths = [paths]
+    return ["--"] + [str(p) for p in paths]
+
+def _commit_oid(repo, rev):
+    # cat-file --batch-check entiende rev~N, ramas, tags...; ^{commit} pela los tags anotados
+    obj = repo.batch_check.query(f"{rev}^{{commit}}")
+    if obj is None:
+        raise ValueError(f"Revisión desconocida: {rev}")
+    return obj[0]
+
+def _max_bytes(args):
+    return max(1, min(int(args.get("max_bytes") or DIFF_MAX_BYTES), DIFF_MAX_BYTES_LIMIT))
+
+def parse_numstat(lines):
+    files, added, deleted = [], 0, 0
+    for line in lines:
+        a, _, rest = line.partition("\t")
+        d, _, path = rest.partition("\t")
+        if not path:
+            continue
+        binary = a == "-"
+        f = {"path": path, "added": 0 if binary else int(a), "deleted": 0 if binary else int(d)}
+        if binary:
+            f["binary"] = True
+        added, deleted = added + f["added"], deleted + f["deleted"]
+        files.append(f)
+    return {"files": files, "changed": len(files), "added": added, "deleted": deleted}
+
+def format_numstat(stat):
+    lines = [f"{'bin' if f.get('binary') else '+' + str(f['added'])} {'' if f.get('binary') else '-' + str(f['deleted'])}".rstrip().ljust(14)
+             + f["path"] for f in stat["files"]]
+    lines.append(f"{stat['changed']} archivos, +{stat['added']} -{stat['deleted']}")
+    return "\n".join(lines)
+
+def git_log(args):
+    """Commits paginados. El cursor fija el commit de inicio ya resuelto (c:<oid>:<skip>), así
+    que commits nuevos en la rama no corren las páginas siguientes."""
+    repo = get_repo(args["path"])
+    limit = max(1, min(int(args.get("limit") or LOG_LIMIT), LOG_LIMIT_MAX))
+    if args.get("cursor"):
+        oid, skip = _parse_cursor(args["cursor"], "c")
+    else:
+        oid, skip = _commit_oid(repo, args.get("rev") or "HEAD"), 0
+    cmd = ["log", f"--max-count={limit + 1}", f"--skip={skip}",
+           "--format=%x1e%H%x1f%P%x1f%an%x1f%ae%x1f%aI%x1f%s"]
+    if args.get("author"):
+        cmd.append(f"--author={args['author']}")
+    if args.get("grep"):
+        cmd.append(f"--grep={args['grep']}")
+    if args.get("stat"):
+        cmd.append("--numstat")
+    data, cut = stream_git(repo.top, cmd + ["--end-of-options", oid] + _pathspecs(args), max_bytes=DIFF_MAX_BYTES_LIMIT)
+    records = data.decode("utf-8", "replace").split("\x1e")[1:]
+    partial = None
+    if cut:
+        partial = records.pop() if records else ""  # el último commit quedó a medias
+        if records or "\n" not in partial:
+            partial = None
+        # Si ni el primero entró (un --numstat de más de 4 MiB), se entrega igual con el stat
+        # truncado: una página vacía con next_cursor=None parecería el final del historial
+    commits = []
+    for rec in records + ([partial] if partial is not None else []):
+        head, _, rest = rec.partition("\n")
+        h, parents, name, email, date, subject = head.split("\x1f", 5)
+        c = {"oid": h, "parents": parents.split(), "author": name, "email": email, "date": date, "subject": subject}
+        if args.get("stat"):
+            lines = rest.strip("\n").splitlines()
+            c["stat"] = parse_numstat(lines[:-1] if rec is partial else lines)
+            if rec is partial:
+                c["stat"]["truncated"] = True
+        commits.append(c)
+    if cut and not commits:
+        raise RuntimeError(f"git log: el primer commit no entra en {DIFF_MAX_BYTES_LIMIT} bytes de salida")
+    more = len(commits) > limit or cut
+    commits = commits[:limit]
+    text = "\n".join(f"{c['oid'][:10]} {c['date'][:10]} {c['author']}: {c['subject']}" for c in commits)
+    return {"content": [{"type": "text", "text": text or "(sin commits)"},
+                        {"type": "json", "data": {"commits": commits,
+                                                  "next_cursor": f"c:{oid}:{skip + len(commits)}" if more and commits else None}}]}
+
+def _paged_output(repo, cmd, offset, args, cursor=lambda end: f"b:{end}"):
+    """Página de una salida larga (diff/show) a partir de `offset` bytes de la salida de git."""
+    data, more = stream_git(repo.top, cmd, offset, _max_bytes(args))
+    data = _page_cut(data, more)
+    end = offset + len(data)
+    return {"content": [{"type": "text", "text": data.decode("utf-8", "replace")}],
+            "range": {"offset": offset, "length": len(data), "eof": not more,
+                      "next_cursor": cursor(end) if more else None}}
+
+def _stat_output(repo, cmd, args, revs=()):
+    # --numstat va antes de --end-of-options y del "--" de las rutas
+    data, more = stream_git(repo.top, cmd + ["--numstat"] + list(revs) + _pathspecs(args), max_bytes=DIFF_MAX_BYTES_LIMIT)
+    return data, more
+
+def git_diff(args):
+    repo = get_repo(args["path"])
+    cmd = ["diff", "--no-ext-diff"]
+    if args.get("staged"):
+        cmd.append("--cached")
+    if args.get("context") is not None:
+        cmd.append(f"-U{max(0, int(args['context']))}")
+    for key in ("base", "target"):
+        rev = args.get(key)
+        if rev:
+            if rev.startswith("-"):
+                raise ValueError(f"Revisión inválida: {rev}")
+            cmd.append(rev)
+    if args.get("stat"):
+        data, more = _stat_output(repo, cmd, args)
+        stat = parse_numstat(_page_cut(data, more).decode("utf-8", "replace").splitlines())
+        stat["truncated"] = more
+        return {"content": [{"type": "text", "text": format_numstat(stat)}, {"type": "json", "data": stat}]}
+    offset = _parse_cursor(args["cursor"], "b") if args.get("cursor") else 0
+    return _paged_output(repo, cmd + _pathspecs(args), offset, args)
+
+def git_show(args):
+    repo = get_repo(args["path"])
+    if args.get("cursor"):
+        oid, offset = _parse_cursor(args["cursor"], "s")
+    else:
+        oid, offset = _commit_oid(repo, args.get("rev") or "HEAD"), 0
+    if args.get("stat"):
+        data, more = _stat_output(repo, ["show", "--format=%H%x1f%P%x1f%an%x1f%ae%x1f%aI%x1f%B%x1e"], args,
+                                  revs=["--end-of-options", oid])
+        head, _, rest = data.decode("utf-8", "replace").partition("\x1e")
+        h, parents, name, email, date, message = head.split("\x1f", 5)
+        lines = rest.splitlines()
+        if more:
+            lines = lines[:-1]
+        stat = parse_numstat(lines)
+        stat["truncated"] = more
+        commit = {"oid": h, "parents": parents.split(), "author": name, "email": email, "date": date,
+                  "message": message.strip(), "stat": stat}
+        text = f"commit {h}\nAuthor: {name} <{email}>\nDate:   {date}\n\n{message.strip()}\n\n{format_numstat(stat)}"
+        return {"content": [{"type": "text", "text": text}, {"type": "json", "data": commit}]}
+    # El cursor (s:<oid>:<offset>) guarda el commit ya resuelto: las páginas siguen siendo del mismo
+    # commit aunque la rama avance entre una y otra
+    res = _paged_output(repo, ["show", "--no-ext-diff", "--format=fuller", "--end-of-options", oid] + _pathspecs(args), offset, args,
+                        cursor=lambda end: f"s:{oid}:{end}")
+    res["range"]["oid"] = oid
+    return res
+
 def handle_call(name, args):
     if name == "git/init":
         path = args["path"]
         os.makedirs(path, exist_ok=True)
+        forget_repo(path)
         return {"content": [{"type": "text", "text": run_git_command(path, ["init"])}]}
     if name == "git/status":
-        path = args["path"]
-        return {"content": [{"type": "text", "text": run_git_command(path, ["status", "--short", "--branch"])}]}
+        return git_status(args)
+    if name == "git/read_file":
+        return git_read_file(args)
+    if name == "git/log":
+        return git_log(args)
+    if name == "git/diff":
+        return git_diff(args)
+    if name == "git/show":
+        return git_show(args)
     if name == "git/commit":
         path, msg = args["path"], args["message"]
         run_git_command(path, ["add", "."])
-        return {"content": [{"type": "text", "text": run_git_command(path, ["commit", "-m", msg])}]}
+        text = run_git_command(path, ["commit", "-m", msg])
+        get_repo(path).status = None  # el índice/ref ya cambian de mtime, pero no depender de su resolución
+        return {"content": [{"type": "text", "text": text}]}
     raise ValueError(f"Unknown tool: {name}")
 
+def handle_request(data):
+    """Procesa un request JSON-RPC; devuelve la respuesta, o None si es una notificación (sin id)."""
+    if not isinstance(data, dict):
+        return err(None, -32600, "Invalid Request")
+    mid, method, params = data.get("id"), data.get("method"), data.get("params", {}) or {}
+    if method == "initialize":
+        resp = ok(mid, {"protocolVersion": "2024-08-01", "server": "git"})
+    elif method == "ping":
+        resp = ok(mid, {})
+    elif method == "tools/list":
+        resp = ok(mid, {"tools": TOOLS})
+    elif method == "tools/call":
+        try:
+            name, args = params.get("name"), params.get("arguments", {}) or {}
+            resp = ok(mid, handle_call(name, args))
+        except Exception as e:
+            resp = err(mid, -32000, str(e))
+    else:
+        resp = err(mid, -32601, f"Method not found: {method}")
+    return resp if "id" in data else None
+
+def handle_message(data):
+    """Un frame puede ser un request o un batch (array); el batch se responde con un array."""
+    if isinstance(data, list):
+        if not data:
+            return err(None, -32600, "Invalid Request: empty batch")
+        out = [r for r in (handle_request(d) for d in data) if r is not None]
+        return out or None
+    return handle_request(data)
+
 def main():
-    for line in sys.stdin:
+    out = sys.stdout.buffer
+    for line in sys.stdin.buffer:  # bytes de punta a punta: sin decodificar/re-codificar cada frame
         try:
-            data = json.loads(line)
-            mid, method, params = data.get("id"), data.get("method"), data.get("params", {}) or {}
-            if method == "initialize":
-                print(json.dumps(ok(mid, {"protocolVersion": "2024-08-01", "server": "git"})))
-                sys.stdout.flush()
-            elif method == "tools/list":
-                print(json.dumps(ok(mid, {"tools": TOOLS})))
-                sys.stdout.flush()
-            elif method == "tools/call":
-                name, args = params.get("name"), params.get("arguments", {}) or {}
-                try:
-                    result = handle_call(name, args)
-                    print(json.dumps(ok(mid, result)))
-                except Exception as e:
-                    print(json.dumps(err(mid, -32000, str(e))))
-                sys.stdout.flush()
-            else:
-                print(json.dumps(err(mid, -32601, f"Method not found: {method}")))
-                sys.stdout.flush()
+            resp = handle_message(loads(line))
         except Exception as e:
-            print(json.dumps(err(None, -32700, f"Parse error: {e}")))
-            sys.stdout.flush()
+            resp = err(None, -32700, f"Parse error: {e}")
+        if resp is not None:
+            out.write(dumps_line(resp))
+            out.flush()
+    for repo in _repos.values():
+        repo.close()
 
 if __name__ == "__main__":
     main()
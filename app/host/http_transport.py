@@ -0,0 +1,131 @@
+import asyncio, ssl
+from urllib.parse import urlsplit
+
+# Límite de línea/cuerpo por lectura de los StreamReader del pool
+STREAM_LIMIT = 64 * 1024 * 1024
+
+class HTTPError(RuntimeError):
+    def __init__(self, status, reason, body=b""):
+        super().__init__(f"HTTP {status} {reason}")
+        self.status = status
+        self.body = body
+
+class _Conn:
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    def usable(self):
+        return not self.reader.at_eof() and not self.writer.is_closing()
+
+    def close(self):
+        try:
+            self.writer.close()
+        except Exception:
+            pass
+
+class HTTPConnectionPool:
+    """Pool de conexiones HTTP/1.1 keep-alive sobre asyncio streams, para un solo origen.
+
+    Como máximo `max_connections` peticiones viajan a la vez; el resto espera un slot.
+    El `timeout` de cada petición es un deadline total: espera de slot + conexión + respuesta.
+    """
+
+    def __init__(self, url, max_connections=8):
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https"):
+            raise ValueError(f"URL no soportada: {url}")
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == "https" else 80)
+        self.ssl = ssl.create_default_context() if parts.scheme == "https" else None
+        self.path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        self.host_header = parts.netloc
+        self.max_connections = max_connections
+        self.idle = []
+        self.slots = asyncio.Semaphore(max_connections)
+        self.opened = 0  # conexiones TCP abiertas en total (para métricas/benchmarks)
+
+    async def post(self, body: bytes, timeout=15, content_type="application/json"):
+        return await asyncio.wait_for(self._post(body, content_type), timeout=timeout)
+
+    async def _post(self, body, content_type):
+        async with self.slots:
+            conn, reused = await self._acquire()
+            try:
+                status, reason, headers, payload = await self._roundtrip(conn, body, content_type)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                conn.close()
+                if not reused:
+                    raise
+                # Keep-alive caducado del lado del servidor: reintentar una vez con conexión nueva
+                conn, _ = await self._acquire(fresh=True)
+                try:
+                    status, reason, headers, payload = await self._roundtrip(conn, body, content_type)
+                except BaseException:
+                    conn.close()
+                    raise
+            except BaseException:
+                conn.close()
+                raise
+            if headers.get("connection", "").lower() == "close":
+                conn.close()
+            else:
+                self.idle.append(conn)
+        if status >= 400:
+            raise HTTPError(status, reason, payload)
+        return payload
+
+    async def _acquire(self, fresh=False):
+        while self.idle and not fresh:
+            conn = self.idle.pop()
+            if conn.usable():
+                return conn, True
+            conn.close()
+        reader, writer = await asyncio.open_connection(
+            self.host, self.port, ssl=self.ssl, limit=STREAM_LIMIT)
+        self.opened += 1
+        return _Conn(reader, writer), False
+
+    async def _roundtrip(self, conn, body, content_type):
+        head = (f"POST {self.path} HTTP/1.1\r\n"
+                f"Host: {self.host_header}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                "Connection: keep-alive\r\n\r\n")
+        conn.writer.write(head.encode("latin-1") + body)
+        await conn.writer.drain()
+
+        status_line = await conn.reader.readline()
+        if not status_line:
+            raise ConnectionResetError("El servidor cerró la conexión")
+        _, status, reason = (status_line.decode("latin-1").rstrip("\r\n").split(" ", 2) + [""])[:3]
+        headers = {}
+        while True:
+            line = await conn.reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            k, _, v = line.decode("latin-1").partition(":")
+            headers[k.strip().lower()] = v.strip()
+
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int((await conn.reader.readline()).split(b";")[0].strip() or b"0", 16)
+                if size == 0:
+                    while (await conn.reader.readline()) not in (b"\r\n", b"\n", b""):
+                        pass
+                    break
+                chunks.append(await conn.reader.readexactly(size))
+                await conn.reader.readexactly(2)
+            payload = b"".join(chunks)
+        elif "content-length" in headers:
+            payload = await conn.reader.readexactly(int(headers["content-length"]))
+        else:
+            # Sin longitud: el cuerpo termina al cerrar la conexión
+            payload = await conn.reader.read()
+            headers["connection"] = "close"
+        return int(status), reason, headers, payload
+
+    async def close(self):
+        while self.idle:
+            self.idle.pop().close()
@@ -0,0 +1,104 @@
+import os, json, time
+from .log_writer import save_llm_log
+
+# Streaming de chat.completions: el texto se entrega token a token y cada tool_call se
+# despacha en cuanto sus argumentos están completos, sin esperar al final de la respuesta.
+
+STREAM = os.getenv("OPENAI_STREAM", "1").lower() not in ("0", "false", "no")
+
+def _get(obj, key):
+    # Los deltas llegan como objetos del SDK; en pruebas/replays pueden venir como dict
+    return obj.get(key) if isinstance(obj, dict) else getattr(obj, key, None)
+
+class ToolCallAssembler:
+    """Reconstruye los tool_calls a partir de los deltas (`index`, `id`, `function.name`,
+    trozos de `function.arguments`).
+
+    Una llamada se da por completa cuando sus argumentos ya son un objeto JSON válido
+    (un objeto cerrado no puede seguir creciendo), cuando empieza la siguiente o al cerrar
+    el stream. En ese momento se llama `on_complete(tool_call)` una sola vez, con el
+    tool_call en el mismo formato dict que acepta `ToolCallExecutor.submit`.
+    """
+
+    def __init__(self, on_complete=None):
+        self.on_complete = on_complete
+        self.calls = {}
+        self.done = set()
+
+    def feed(self, deltas):
+        for d in deltas:
+            idx = _get(d, "index") or 0
+            tc = self.calls.get(idx)
+            if tc is None:
+                for prev in list(self.calls):  # el modelo emite las llamadas una tras otra
+                    self._complete(prev)
+                tc = self.calls[idx] = {"id": None, "type": "function", "function": {"name": "", "arguments": ""}}
+            if _get(d, "id"):
+                tc["id"] = _get(d, "id")
+            fn = _get(d, "function")
+            if fn is None:
+                continue
+            if _get(fn, "name"):
+                tc["function"]["name"] += _get(fn, "name")
+            piece = _get(fn, "arguments")
+            if piece:
+                tc["function"]["arguments"] += piece
+                # Solo vale la pena intentar el parseo cuando el trozo puede cerrar el objeto
+                if piece.rstrip().endswith("}") and idx not in self.done:
+                    try:
+                        json.loads(tc["function"]["arguments"])
+                    except ValueError:
+                        continue
+                    self._complete(idx)
+
+    def _complete(self, idx):
+        if idx in self.done:
+            return
+        self.done.add(idx)
+        if self.on_complete:
+            self.on_complete(self.calls[idx])
+
+    def finish(self):
+        for idx in sorted(self.calls):
+            self._complete(idx)
+        return [self.calls[i] for i in sorted(self.calls)]
+
+async def stream_chat(client, on_text=None, on_tool_call=None, log=save_llm_log, **kwargs):
+    """`client.chat.completions.create(stream=True, **kwargs)` con un AsyncOpenAI.
+
+    `on_text(fragmento)` recibe el contenido a medida que llega y `on_tool_call(tc)` cada
+    tool_call ya armado. `log(direction, payload)` registra la respuesta (p.ej. `ConversationMemory.log`).
+    Devuelve el mensaje del asistente como dict, listo para `messages`.
+    """
+    t0 = time.perf_counter()
+    first = None
+    text, finish, usage = [], None, None
+    asm = ToolCallAssembler(on_tool_call)
+    stream = await client.chat.completions.create(stream=True, stream_options={"include_usage": True}, **kwargs)
+    async for chunk in stream:
+        if getattr(chunk, "usage", None) is not None:
+            usage = chunk.usage.model_dump() if hasattr(chunk.usage, "model_dump") else chunk.usage
+        if not chunk.choices:
+            continue
+        choice = chunk.choices[0]
+        delta = choice.delta
+        if delta.content:
+            if first is None:
+                first = time.perf_counter()
+            text.append(delta.content)
+            if on_text:
+                on_text(delta.content)
+        if delta.tool_calls:
+            if first is None:
+                first = time.perf_counter()
+            asm.feed(delta.tool_calls)
+        if choice.finish_reason:
+            finish = choice.finish_reason
+    calls = asm.finish()
+    msg = {"role": "assistant", "content": "".join(text)}
+    if calls:
+        msg["tool_calls"] = calls
+    log("recv", {"stream": True, "message": msg, "finish_reason": finish, "usage": usage,
+                 "first_token_ms": round((first - t0) * 1000, 1) if first else None,
+                 "total_ms": round((time.perf_counter() - t0) * 1000, 1)})
+    return msg
@@ -0,0 +1,126 @@
+import os, json, time, queue, atexit, threading
+from pathlib import Path
+
+LOG_DIR = Path("logs")
+
+def _env_int(name, default):
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
+
+class JsonlLogger:
+    """Logger JSONL con cola acotada y un hilo escritor que vuelca por lotes.
+
+    `log()` solo serializa y encola: nunca toca disco en el camino de la petición.
+    El hilo escribe cuando junta `batch_size` registros o pasan `flush_interval` segundos,
+    en `<log_dir>/<prefix>-YYYYMMDD.jsonl` según la fecha de cada registro (rollover a medianoche).
+    Con la cola llena, `policy="drop"` descarta (y cuenta en `dropped`) y `policy="block"` espera.
+    """
+
+    def __init__(self, prefix, log_dir=LOG_DIR, max_queue=10000, batch_size=256,
+                 flush_interval=0.5, policy="drop"):
+        if policy not in ("drop", "block"):
+            raise ValueError(f"Política de cola inválida: {policy}")
+        self.prefix = prefix
+        self.log_dir = Path(log_dir)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.policy = policy
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.dropped = 0
+        self.written = 0
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._file = None
+        self._file_day = None
+
+    def log(self, record):
+        # Se serializa aquí: el llamador puede mutar el payload (p.ej. la lista de mensajes) después
+        line = json.dumps(record, ensure_ascii=False, default=str, separators=(",", ":"))
+        item = (time.strftime("%Y%m%d"), line)
+        if self._thread is None:
+            self._start()
+        if self.policy == "block":
+            self.queue.put(item)
+            return
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            self.dropped += 1
+
+    def _start(self):
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=f"log-{self.prefix}", daemon=True)
+                self._thread.start()
+                atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            first = self.queue.get()
+            batch = [first]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            try:
+                self._write(batch)
+            except Exception:
+                pass  # el logging nunca debe tumbar al host
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    def _write(self, batch):
+        day, lines = batch[0][0], []
+        for item_day, line in batch:
+            if item_day != day:
+                self._append(day, lines)
+                day, lines = item_day, []
+            lines.append(line)
+        self._append(day, lines)
+        self._file.flush()
+
+    def _append(self, day, lines):
+        if self._file_day != day:
+            if self._file:
+                self._file.close()
+            self.log_dir.mkdir(parents=True, exist_ok=True)
+            self._file = (self.log_dir / f"{self.prefix}-{day}.jsonl").open("a", encoding="utf-8")
+            self._file_day = day
+        self._file.write("\n".join(lines) + "\n")
+        self.written += len(lines)
+
+    def flush(self):
+        """Bloquea hasta que todo lo encolado esté escrito."""
+        if self._thread is not None:
+            self.queue.join()
+
+_loggers = {}
+_loggers_lock = threading.Lock()
+
+def get_logger(prefix):
+    """Logger compartido por prefijo ("mcp", "llm"); configurable por variables de entorno."""
+    with _loggers_lock:
+        if prefix not in _loggers:
+            _loggers[prefix] = JsonlLogger(
+                prefix,
+                log_dir=os.getenv("MCP_LOG_DIR", str(LOG_DIR)),
+                max_queue=_env_int("MCP_LOG_QUEUE", 10000),
+                batch_size=_env_int("MCP_LOG_BATCH", 256),
+                flush_interval=_env_int("MCP_LOG_FLUSH_MS", 500) / 1000.0,
+                policy=os.getenv("MCP_LOG_POLICY", "drop"),
+            )
+        return _loggers[prefix]
+
+def utc_ts():
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+
+def save_llm_log(direction, payload):
+    get_logger("llm").log({"ts": utc_ts(), "direction": direction, **payload})
@@ -1,102 +1,104 @@
-import sys, asyncio
+# 🔧 Nota: en Windows el loop por defecto (Proactor) es el único que soporta
+# asyncio.create_subprocess_exec; no forzar WindowsSelectorEventLoopPolicy.
 
-# 🔧 Fix: usar loop compatible con subprocess en Windows
-if sys.platform.startswith("win"):
-    asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
-
-import os, json, asyncio, time
-from pathlib import Path
+import os, asyncio
 from dotenv import load_dotenv
-from openai import OpenAI
-from .mcp_client import MCPClientManager
-from .tool_router import OPENAI_TOOLS
+from openai import OpenAI, AsyncOpenAI
+from .daemon import open_manager
+from .tool_catalog import ToolCatalog
+from .tool_executor import execute_tool_calls, ToolCallExecutor
+from .llm_stream import STREAM, stream_chat
+from .memory import ConversationMemory
 
 load_dotenv()
 MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
 client = OpenAI()
-
-def save_llm_log(direction, payload):
-    Path("logs").mkdir(exist_ok=True, parents=True)
-    with open(Path("logs")/f"llm-{time.strftime('%Y%m%d')}.jsonl","a",encoding="utf-8") as f:
-        rec = {"ts": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
-               "direction": direction, **payload}
-        f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+aclient = AsyncOpenAI()
 
 async def start_manager():
     import json
     cfg = json.load(open("app/host/servers.config.json","r",encoding="utf-8"))
-    mgr = MCPClientManager(cfg)
-    await mgr.start_all()
-    return mgr
+    # Con el daemon corriendo (python -m app.host.daemon) se comparten sus servidores;
+    # si no, este proceso lanza los suyos
+    return await open_manager(cfg, session="cli")
+
+def _print_delta(text):
+    print(text, end="", flush=True)
+
+async def stream_turn(mgr, memory, catalog):
+    """Turno en modo stream: el texto se imprime a medida que llega y cada tool_call se
+    ejecuta apenas sus argumentos están completos, mientras el modelo sigue generando."""
+    ex = ToolCallExecutor(mgr, catalog=catalog)
+    tools = await catalog.openai_tools()
+    messages = memory.window()
+    memory.log_send()
+    msg = await stream_chat(aclient, log=memory.log, on_text=_print_delta, on_tool_call=ex.submit, model=MODEL,
+                            messages=messages, tools=tools, tool_choice="auto", temperature=0.2)
+    if msg.get("tool_calls"):
+        tool_msgs = await ex.gather()
+        memory.add(msg)
+        memory.extend(tool_msgs)
+        messages = memory.window()
+        memory.log_send()
+        msg = await stream_chat(aclient, log=memory.log, on_text=_print_delta, model=MODEL, messages=messages, temperature=0.2)
+    print()
+    memory.add({"role":"assistant","content":msg["content"]})
 
 async def run_chat():
     mgr = await start_manager()
-    messages = [{
-        "role": "system",
-        "content": ("You are an MCP-capable assistant. "
-                    "When the user asks to read/write files, analyze code, or run repo actions, "
-                    "use the 'mcp_call' tool with the appropriate server and method.")
-    }]
-    print(f"Modelo: {MODEL}\nEscribe 'exit' para salir.\n")
+    catalog = ToolCatalog(mgr)
+    memory = ConversationMemory("You are an MCP-capable assistant. "
+                                "When the user asks to read/write files, analyze code, or run repo actions, "
+                                "use the MCP tools provided (one function per tool).")
+    session = getattr(mgr, "session", None)
+    print(f"Modelo: {MODEL}" + (f" · servidores del daemon (sesión {session})" if session else ""))
+    print("Escribe 'exit' para salir.\n")
 
     while True:
         user = input("> ").strip()
-        if user.lower() in ("exit","quit"): break
-        messages.append({"role":"user","content":user})
+        if user.lower() in ("exit","quit"):
+            memory.flush()
+            await mgr.close()
+            break
+        memory.add({"role":"user","content":user})
+
+        if STREAM:
+            await stream_turn(mgr, memory, catalog)
+            continue
 
-        save_llm_log("send", {"messages": messages})
+        messages = memory.window()
+        memory.log_send()
         r = client.chat.completions.create(
             model=MODEL,
             messages=messages,
-            tools=OPENAI_TOOLS,
+            tools=await catalog.openai_tools(),
             tool_choice="auto",
             temperature=0.2
         )
-        save_llm_log("recv", {"raw": r.model_dump()})
+        memory.log("recv", {"raw": r.model_dump()})
         msg = r.choices[0].message
 
-        tool_msgs = []
         if msg.tool_calls:
-            for tc in msg.tool_calls:
-                if tc.type != "function": continue
-                fn = tc.function.name
-                args = json.loads(tc.function.arguments or "{}")
-                if fn != "mcp_call":
-                    tool_msgs.append({"role": "tool", "tool_call_id": tc.id,
-                                      "name": fn, "content": f"Unsupported tool {fn}"})
-                    continue
-                try:
-                    result = await mgr.call(args["server"], args["method"], args.get("params", {}))
-                    tool_msgs.append({
-                        "role": "tool",
-                        "tool_call_id": tc.id,
-                        "name": "mcp_call",
-                        "content": json.dumps({"ok": True, "result": result}, ensure_ascii=False)
-                    })
-                except Exception as e:
-                    tool_msgs.append({
-                        "role": "tool",
-                        "tool_call_id": tc.id,
-                        "name": "mcp_call",
-                        "content": json.dumps({"ok": False, "error": str(e)}, ensure_ascii=False)
-                    })
+            # Todas las tool_calls del turno en paralelo; respuestas en el orden original
+            tool_msgs = await execute_tool_calls(mgr, msg.tool_calls, catalog=catalog)
 
-            messages.append({"role":"assistant","content":msg.content or "", "tool_calls": msg.tool_calls})
-            messages.extend(tool_msgs)
+            memory.add({"role":"assistant","content":msg.content or "", "tool_calls": msg.tool_calls})
+            memory.extend(tool_msgs)
 
-            save_llm_log("send", {"messages": messages[-12:]})
+            messages = memory.window()
+            memory.log_send()
             r2 = client.chat.completions.create(
                 model=MODEL,
                 messages=messages,
                 temperature=0.2
             )
-            save_llm_log("recv", {"raw": r2.model_dump()})
+            memory.log("recv", {"raw": r2.model_dump()})
             final_text = r2.choices[0].message.content
             print(final_text)
-            messages.append({"role":"assistant","content":final_text})
+            memory.add({"role":"assistant","content":final_text})
         else:
             print(msg.content)
-            messages.append({"role":"assistant","content":msg.content})
+            memory.add({"role":"assistant","content":msg.content})
 
 if __name__ == "__main__":
     asyncio.run(run_chat())
@@ -1,145 +1,591 @@
-import sys, json, time, threading, subprocess, asyncio, requests
-from pathlib import Path
-
-LOG_DIR = Path("logs"); LOG_DIR.mkdir(parents=True, exist_ok=True)
+import os, sys, time, asyncio
+from collections import deque
+from ..json_codec import dumps, dumps_line, dumps_str, loads
+from .http_transport import HTTPConnectionPool
+from .log_writer import get_logger, utc_ts
+from .result_cache import ResultCache
+from .supervisor import ServerSupervisor
+from .metrics import METRICS, ENABLED as METRICS_ENABLED, outcome_of, start_metrics_server
 
 def jdump(obj):
-    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+    return dumps_str(obj)
+
+def _result_or_error(resp):
+    if "error" in resp:
+        return RuntimeError(f"MCP error: {resp['error']}")
+    return resp["result"]
+
+# Límite de línea del StreamReader: respuestas grandes (read_file, reportes) caben en un frame
+STREAM_LIMIT = 64 * 1024 * 1024
+# Requests en vuelo por servidor stdio; el resto espera en cola (FIFO). "max_inflight" en la
+# entrada del servidor en servers.config.json lo cambia para ese servidor.
+MAX_INFLIGHT = int(os.getenv("MCP_MAX_INFLIGHT", 16))
+STDERR_LINE_MAX = 4000  # caracteres por línea de stderr que van al log
 
 class MCPProcessClient:
-    def __init__(self, name, command):
+    def __init__(self, name, command, echo=True, on_notification=None, max_inflight=MAX_INFLIGHT):
         self.name = name
         self.command = command
+        self.echo = echo
+        self.on_notification = on_notification  # callback(msg) para notificaciones del servidor
         self.proc = None
         self.pending = {}
+        self.pinging = set()  # ids de pings en vuelo: sus respuestas no se registran
+        self.last_recv = 0.0  # monotonic de la última línea recibida (el supervisor distingue ocupado de colgado)
+        self.batches = {}     # primer id -> ids de cada batch en vuelo, en orden de envío
+        self.next_id = 1
         self.reader = None
         self.writer = None
-        self.log_path = LOG_DIR / f"mcp-{time.strftime('%Y%m%d')}.jsonl"
-        self._lock = threading.Lock()
+        self.read_task = None
+        self.stderr_task = None
+        # Ventana de requests en vuelo: sin ella miles de llamadas simultáneas se escriben
+        # todas al pipe y esperan dentro del servidor, donde ya no se pueden cancelar
+        self.max_inflight = max(1, max_inflight)
+        self.inflight = 0
+        self.waiting = deque()  # [slots, future] en orden de llegada
+        self.stats = {"calls": 0, "queued": 0, "queue_ms_total": 0.0, "queue_ms_max": 0.0,
+                      "timeouts": 0, "cancelled": 0, "late": 0, "stderr_lines": 0}
+        self.logger = get_logger("mcp")
 
     def _log(self, direction, payload):
-        entry = {
-            "ts": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
-            "server": self.name,
-            "direction": direction,
-            **payload
-        }
-        with self._lock:
-            with self.log_path.open("a", encoding="utf-8") as f:
-                f.write(jdump(entry) + "\n")
+        self.logger.log({"ts": utc_ts(), "server": self.name, "direction": direction, **payload})
 
     async def start(self):
-        self.proc = subprocess.Popen(
-            self.command,
-            stdin=subprocess.PIPE,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True
+        self.proc = await asyncio.create_subprocess_exec(
+            *self.command,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            limit=STREAM_LIMIT
         )
         self.reader = self.proc.stdout
         self.writer = self.proc.stdin
-        threading.Thread(target=self._read_loop_sync, daemon=True).start()
+        # Un único lector por servidor, dueño del mismo loop que crea los futures
+        self.read_task = asyncio.create_task(self._read_loop())
+        # stderr se vacía siempre: un servidor que loguea mucho llenaría el pipe (64 KiB)
+        # y quedaría bloqueado en su próximo print, sin responder nunca
+        self.stderr_task = asyncio.create_task(self._drain_stderr())
         return {"ok": True, "msg": f"Servidor {self.name} iniciado"}
 
-    def _read_loop_sync(self):
-        for line in self.reader:
+    async def _drain_stderr(self):
+        stream = self.proc.stderr
+        while True:
             try:
-                msg = json.loads(line.strip())
-            except Exception:
-                self._log("recv", {"type": "garbled", "raw": line})
-                print(f"[{self.name}] ⚠️ Mensaje no válido: {line.strip()}", file=sys.stderr)
+                line = await stream.readline()
+            except ValueError:
+                continue  # línea más larga que STREAM_LIMIT: el StreamReader ya la descartó
+            if not line:
+                return
+            text = line.decode("utf-8", "replace").rstrip()
+            if not text:
                 continue
-            self._log("recv", {"type": "jsonrpc", "msg": msg})
-            print(f"[{self.name}] ⬅️ Recibido: {msg}", file=sys.stderr)
-            if "id" in msg and ("result" in msg or "error" in msg):
-                fut = self.pending.pop(msg["id"], None)
-                if fut and not fut.done():
-                    fut.set_result(msg)
+            self.stats["stderr_lines"] += 1
+            self._log("stderr", {"line": text[:STDERR_LINE_MAX]})
+            if self.echo:
+                print(f"[{self.name}] 🪵 {text}", file=sys.stderr)
 
-    async def call(self, method, params=None, timeout=10):
-        _id = int(time.time_ns())  # ID único
-        req = {"jsonrpc": "2.0", "id": _id, "method": method, "params": params or {}}
-        data = (jdump(req) + "\n")
-        self._log("send", {"type": "jsonrpc", "msg": req})
-        print(f"[{self.name}] ➡️ Enviando: {req}", file=sys.stderr)
+    async def _read_loop(self):
+        try:
+            while True:
+                line = await self.reader.readline()
+                if not line:
+                    break
+                self.last_recv = time.monotonic()
+                try:
+                    msg = loads(line)
+                except Exception:
+                    raw = line.decode("utf-8", "replace").strip()
+                    self._log("recv", {"type": "garbled", "raw": raw})
+                    print(f"[{self.name}] ⚠️ Mensaje no válido: {raw}", file=sys.stderr)
+                    continue
+                quiet = isinstance(msg, dict) and msg.get("result") == {} and msg.get("id") in self.pinging
+                if not quiet:
+                    self._log("recv", {"type": "jsonrpc", "msg": msg})
+                if self.echo and not quiet:
+                    print(f"[{self.name}] ⬅️ Recibido: {msg}", file=sys.stderr)
+                self._dispatch(msg)
+        finally:
+            # El proceso terminó: nadie va a responder a lo que sigue pendiente
+            self.fail_pending(f"Servidor {self.name} terminó sin responder")
 
-        self.writer.write(data)
-        self.writer.flush()
+    def fail_pending(self, reason):
+        for fut in self.pending.values():
+            if not fut.done():
+                fut.set_exception(RuntimeError(reason))
+        self.pending.clear()
 
-        loop = asyncio.get_event_loop()
-        fut = loop.create_future()
-        self.pending[_id] = fut
+    async def notify(self, method, params=None):
+        """Notificación JSON-RPC (sin id, sin respuesta)."""
+        msg = {"jsonrpc": "2.0", "method": method, "params": params or {}}
+        self._log("send", {"type": "jsonrpc", "msg": msg})
+        self.writer.write(dumps_line(msg))
+        await self.writer.drain()
 
+    async def close(self, timeout=2, kill=False):
+        """Cierra stdin y espera la salida; si no sale a tiempo, terminate y luego kill.
+        Con `kill=True` (proceso colgado) va directo al kill."""
+        if self.proc is None or self.proc.returncode is not None:
+            return
         try:
-            resp = await asyncio.wait_for(fut, timeout=timeout)
-        except asyncio.TimeoutError:
-            raise RuntimeError(f"⏳ Timeout esperando respuesta de {self.name} (>{timeout}s)")
+            self.writer.close()
+        except Exception:
+            pass
+        for stop in ((self.proc.kill,) if kill else (None, self.proc.terminate, self.proc.kill)):
+            try:
+                if stop is not None:
+                    stop()
+                await asyncio.wait_for(self.proc.wait(), timeout)
+                break
+            except ProcessLookupError:
+                break
+            except asyncio.TimeoutError:
+                continue
+        # Si quedó algún hijo del servidor con el stderr heredado, el EOF no llega nunca
+        if self.stderr_task is not None and not self.stderr_task.done():
+            try:
+                await asyncio.wait_for(asyncio.shield(self.stderr_task), 0.2)
+            except asyncio.TimeoutError:
+                self.stderr_task.cancel()
+
+    def _dispatch(self, msg):
+        if isinstance(msg, list):  # respuesta a un batch
+            for m in msg:
+                self._dispatch(m)
+            # Los ids del batch que no vinieron en su respuesta ya no van a llegar: fallan ahora
+            got = {m.get("id") for m in msg if isinstance(m, dict)}
+            for ids in self.batches.values():
+                if got.intersection(ids):
+                    self._fail_batch(ids, {"error": "sin respuesta en el batch"})
+                    break
+            return
+        if isinstance(msg, dict) and msg.get("id") is None and "error" in msg and self.batches:
+            # Error para el batch completo (p.ej. -32600): no trae id, se asigna al batch más viejo
+            self._fail_batch(next(iter(self.batches.values())), msg)
+            return
+        if isinstance(msg, dict) and "id" in msg and ("result" in msg or "error" in msg):
+            fut = self.pending.pop(msg["id"], None)
+            if fut is None:
+                self.stats["late"] += 1  # respuesta a un request ya vencido o cancelado
+            elif not fut.done():
+                fut.set_result(msg)
+        elif isinstance(msg, dict) and "method" in msg and "id" not in msg and self.on_notification:
+            self.on_notification(msg)
+
+    def _fail_batch(self, ids, resp):
+        for _id in ids:
+            fut = self.pending.pop(_id, None)
+            if fut is not None and not fut.done():
+                fut.set_result(resp)
+
+    async def _acquire(self, n):
+        """Reserva `n` lugares de la ventana (FIFO). Devuelve los ms que esperó en cola."""
+        if not self.waiting and self.inflight + n <= self.max_inflight:
+            self.inflight += n
+            return 0.0
+        t0 = time.perf_counter()
+        entry = [n, asyncio.get_running_loop().create_future()]
+        self.waiting.append(entry)
+        self.stats["queued"] += 1
+        try:
+            await entry[1]
+        except asyncio.CancelledError:
+            if entry[1].done() and not entry[1].cancelled():
+                self._release(n)  # el lugar llegó junto con la cancelación: devolverlo
+            else:
+                try:
+                    self.waiting.remove(entry)
+                except ValueError:
+                    pass
+            raise
+        waited = (time.perf_counter() - t0) * 1000
+        self.stats["queue_ms_total"] += waited
+        self.stats["queue_ms_max"] = max(self.stats["queue_ms_max"], waited)
+        return waited
+
+    def _release(self, n):
+        self.inflight -= n
+        while self.waiting and self.inflight + self.waiting[0][0] <= self.max_inflight:
+            slots, fut = self.waiting.popleft()
+            if fut.done():  # su llamada se canceló mientras esperaba
+                continue
+            self.inflight += slots
+            fut.set_result(None)
+
+    def _cancel_request(self, _id, reason):
+        """`$/cancelRequest` al servidor: que no gaste un worker en una respuesta que nadie espera."""
+        self.stats["timeouts" if reason == "timeout" else "cancelled"] += 1
+        if self.proc is None or self.proc.returncode is not None or self.writer.is_closing():
+            return
+        msg = {"jsonrpc": "2.0", "method": "$/cancelRequest", "params": {"id": _id}}
+        self._log("send", {"type": "cancel", "reason": reason, "msg": msg})
+        try:
+            self.writer.write(dumps_line(msg))  # sin drain: puede ejecutarse en medio de una cancelación
+        except Exception:
+            pass
+
+    def queue_stats(self):
+        calls = self.stats["calls"]
+        return {"inflight": self.inflight, "max_inflight": self.max_inflight, "waiting": len(self.waiting),
+                "pending": len(self.pending), **self.stats,
+                "queue_ms_avg": round(self.stats["queue_ms_total"] / calls, 3) if calls else 0.0}
+
+    async def call(self, method, params=None, timeout=10):
+        if self.read_task is None or self.read_task.done():
+            raise RuntimeError(f"Servidor {self.name} no está en ejecución")
+        quiet = method == "ping"  # los health checks periódicos no ensucian consola ni log
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout  # el timeout cubre la espera en cola y la respuesta
+        slots = 0 if quiet else 1         # ni hacen cola: un ping atascado detrás de llamadas lentas
+        waited = 0.0                      # daría por colgado a un servidor que solo está ocupado
+        if slots:
+            try:
+                waited = await asyncio.wait_for(self._acquire(slots), timeout)
+            except asyncio.TimeoutError:
+                self.stats["timeouts"] += 1
+                raise RuntimeError(f"⏳ Timeout en la cola de {self.name}: "
+                                   f"{self.inflight} requests en vuelo (>{timeout}s)")
+            self.stats["calls"] += 1
+            if METRICS_ENABLED:
+                METRICS.queue_wait.observe((self.name,), waited / 1000)
+        try:
+            _id = self.next_id  # IDs monótonos por servidor
+            self.next_id += 1
+            req = {"jsonrpc": "2.0", "id": _id, "method": method, "params": params or {}}
+            data = dumps_line(req)
+
+            # Registrar el future antes de escribir: el servidor puede responder de inmediato
+            fut = loop.create_future()
+            self.pending[_id] = fut
+            if quiet:
+                self.pinging.add(_id)
+            else:
+                self._log("send", {"type": "jsonrpc", "msg": req, **({"queue_ms": round(waited, 3)} if waited else {})})
+            if self.echo and not quiet:
+                print(f"[{self.name}] ➡️ Enviando: {req}", file=sys.stderr)
+
+            t0 = time.perf_counter()
+            outcome = "ok"
+            try:
+                self.writer.write(data)
+                await self.writer.drain()
+                resp = await asyncio.wait_for(fut, timeout=deadline - loop.time())
+                if "error" in resp:
+                    outcome = "error"
+            except asyncio.TimeoutError:
+                outcome = "timeout"
+                if not quiet:
+                    self._cancel_request(_id, "timeout")
+                raise RuntimeError(f"⏳ Timeout esperando respuesta de {self.name} (>{timeout}s)")
+            except asyncio.CancelledError:
+                outcome = "cancelled"
+                self._cancel_request(_id, "cancelled")
+                raise
+            except (BrokenPipeError, ConnectionResetError):
+                outcome = "unavailable"
+                raise RuntimeError(f"Servidor {self.name} cerró la conexión")
+            except RuntimeError:
+                outcome = "unavailable"  # fail_pending: el proceso murió con la llamada en vuelo
+                raise
+            finally:
+                self.pending.pop(_id, None)
+                self.pinging.discard(_id)
+                if METRICS_ENABLED and not quiet:
+                    METRICS.record_request(self.name, "stdio", method, outcome, time.perf_counter() - t0)
+        finally:
+            if slots:
+                self._release(slots)
 
         if "error" in resp:
             raise RuntimeError(f"MCP error: {resp['error']}")
         return resp["result"]
 
+    async def call_batch(self, calls, timeout=30):
+        """Envía [(method, params), ...] como un único frame JSON-RPC batch.
 
-# 🚀 Cliente HTTP para servidores remotos
+        Devuelve una lista alineada con `calls`: el `result` de cada request,
+        o un RuntimeError en su posición si ese request falló.
+        """
+        if not calls:
+            return []
+        if self.read_task is None or self.read_task.done():
+            raise RuntimeError(f"Servidor {self.name} no está en ejecución")
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        # Un batch ocupa un lugar por request (como mucho la ventana entera, si no nunca entraría)
+        slots = min(len(calls), self.max_inflight)
+        try:
+            waited = await asyncio.wait_for(self._acquire(slots), timeout)
+        except asyncio.TimeoutError:
+            self.stats["timeouts"] += 1
+            raise RuntimeError(f"⏳ Timeout en la cola de {self.name}: "
+                               f"{self.inflight} requests en vuelo (>{timeout}s)")
+        self.stats["calls"] += 1
+        if METRICS_ENABLED:
+            METRICS.queue_wait.observe((self.name,), waited / 1000)
+        try:
+            reqs, futs = [], []
+            for method, params in calls:
+                _id = self.next_id
+                self.next_id += 1
+                reqs.append({"jsonrpc": "2.0", "id": _id, "method": method, "params": params or {}})
+                futs.append(loop.create_future())
+                self.pending[_id] = futs[-1]
+            self.batches[reqs[0]["id"]] = [r["id"] for r in reqs]
+            self._log("send", {"type": "jsonrpc-batch", "msg": reqs, **({"queue_ms": round(waited, 3)} if waited else {})})
+            if self.echo:
+                print(f"[{self.name}] ➡️ Enviando batch de {len(reqs)} requests", file=sys.stderr)
+
+            t0 = time.perf_counter()
+            outcome = "ok"
+            try:
+                self.writer.write(dumps_line(reqs))
+                await self.writer.drain()
+                resps = await asyncio.wait_for(asyncio.gather(*futs), timeout=deadline - loop.time())
+            except asyncio.TimeoutError:
+                outcome = "timeout"
+                for req, fut in zip(reqs, futs):
+                    if not fut.done():
+                        self._cancel_request(req["id"], "timeout")
+                raise RuntimeError(f"⏳ Timeout esperando batch de {self.name} (>{timeout}s)")
+            except asyncio.CancelledError:
+                outcome = "cancelled"
+                for req, fut in zip(reqs, futs):
+                    if not fut.done():
+                        self._cancel_request(req["id"], "cancelled")
+                raise
+            except (BrokenPipeError, ConnectionResetError):
+                outcome = "unavailable"
+                raise RuntimeError(f"Servidor {self.name} cerró la conexión")
+            except RuntimeError:
+                outcome = "unavailable"
+                raise
+            finally:
+                self.batches.pop(reqs[0]["id"], None)
+                for req in reqs:
+                    self.pending.pop(req["id"], None)
+                if METRICS_ENABLED:
+                    METRICS.record_request(self.name, "stdio", "batch", outcome, time.perf_counter() - t0, n=len(reqs))
+        finally:
+            self._release(slots)
+        if "error" in resps[0] and resps[0].get("id") is None and "jsonrpc" in resps[0]:
+            # el servidor rechazó el batch completo (como en MCPHttpClient.call_batch)
+            raise RuntimeError(f"MCP error: {resps[0]['error']}")
+        return [_result_or_error(r) for r in resps]
+
+
+# 🚀 Cliente HTTP para servidores remotos (pool keep-alive, no bloquea el loop)
 class MCPHttpClient:
-    def __init__(self, name, url):
+    def __init__(self, name, url, max_connections=8, echo=True):
         self.name = name
         self.url = url
-        self.log_path = LOG_DIR / f"mcp-{time.strftime('%Y%m%d')}.jsonl"
+        self.echo = echo
+        self.next_id = 1
+        self.pool = HTTPConnectionPool(url, max_connections=max_connections)
+        self.logger = get_logger("mcp")
 
     def _log(self, direction, payload):
-        entry = {
-            "ts": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
-            "server": self.name,
-            "direction": direction,
-            **payload
-        }
-        with self.log_path.open("a", encoding="utf-8") as f:
-            f.write(jdump(entry) + "\n")
+        self.logger.log({"ts": utc_ts(), "server": self.name, "direction": direction, **payload})
 
     async def start(self):
         return {"ok": True, "msg": f"Cliente HTTP {self.name} listo en {self.url}"}
 
     async def call(self, method, params=None, timeout=15):
-        req = {"jsonrpc": "2.0", "id": int(time.time_ns()), "method": method, "params": params or {}}
+        _id = self.next_id
+        self.next_id += 1
+        req = {"jsonrpc": "2.0", "id": _id, "method": method, "params": params or {}}
         self._log("send", {"type": "jsonrpc", "msg": req})
-        print(f"[{self.name}] ➡️ POST {self.url} {req}", file=sys.stderr)
+        if self.echo:
+            print(f"[{self.name}] ➡️ POST {self.url} {req}", file=sys.stderr)
+        t0 = time.perf_counter()
+        outcome = "ok"
         try:
-            r = requests.post(self.url, json=req, timeout=timeout)
-            r.raise_for_status()
-            msg = r.json()
-            self._log("recv", {"type": "jsonrpc", "msg": msg})
+            body = await self.pool.post(dumps(req), timeout=timeout)
+            msg = loads(body)
+            if isinstance(msg, dict) and "error" in msg:
+                outcome = "error"
+        except asyncio.TimeoutError:
+            outcome = "timeout"
+            raise RuntimeError(f"⏳ Timeout esperando respuesta de {self.name} (>{timeout}s)")
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            raise
+        except Exception as e:
+            outcome = "unavailable"
+            raise RuntimeError(f"Error llamando a {self.name}: {e}")
+        finally:
+            if METRICS_ENABLED:
+                METRICS.record_request(self.name, "http", method, outcome, time.perf_counter() - t0)
+        self._log("recv", {"type": "jsonrpc", "msg": msg})
+        if self.echo:
             print(f"[{self.name}] ⬅️ Recibido: {msg}", file=sys.stderr)
-            if "error" in msg:
-                raise RuntimeError(f"MCP error: {msg['error']}")
-            return msg["result"]
+        if "error" in msg:
+            raise RuntimeError(f"MCP error: {msg['error']}")
+        return msg["result"]
+
+    async def call_batch(self, calls, timeout=30):
+        """Igual que MCPProcessClient.call_batch, en un solo POST."""
+        if not calls:
+            return []
+        reqs = []
+        for method, params in calls:
+            reqs.append({"jsonrpc": "2.0", "id": self.next_id, "method": method, "params": params or {}})
+            self.next_id += 1
+        self._log("send", {"type": "jsonrpc-batch", "msg": reqs})
+        t0 = time.perf_counter()
+        outcome = "ok"
+        try:
+            body = await self.pool.post(dumps(reqs), timeout=timeout)
+            msg = loads(body)
+        except asyncio.TimeoutError:
+            outcome = "timeout"
+            raise RuntimeError(f"⏳ Timeout esperando batch de {self.name} (>{timeout}s)")
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            raise
         except Exception as e:
+            outcome = "unavailable"
             raise RuntimeError(f"Error llamando a {self.name}: {e}")
+        finally:
+            if METRICS_ENABLED:
+                METRICS.record_request(self.name, "http", "batch", outcome, time.perf_counter() - t0, n=len(reqs))
+        self._log("recv", {"type": "jsonrpc-batch", "msg": msg})
+        if isinstance(msg, dict):  # el servidor rechazó el batch completo
+            raise RuntimeError(f"MCP error: {msg.get('error', msg)}")
+        by_id = {m.get("id"): m for m in msg if isinstance(m, dict)}
+        missing = {"error": "sin respuesta en el batch"}
+        return [_result_or_error(by_id.get(r["id"], missing)) for r in reqs]
+
+    async def close(self):
+        await self.pool.close()
 
 
 class MCPClientManager:
-    def __init__(self, cfg):
+    def __init__(self, cfg, cache=None):
         self.cfg = cfg
-        self.clients = {}
+        self.clients = {}  # servidor -> cliente listo; lo mantienen los supervisores
+        self.supervisors = {s["name"]: ServerSupervisor(s, self._make_client, self._on_change)
+                            for s in cfg.get("servers", [])}
+        # Caché de resultados de tools cacheables; se arma con las annotations de cada tools/list
+        self.cache = cache if cache is not None else ResultCache()
+        self.cache_extra = {s["name"]: s.get("cacheable_tools", []) for s in cfg.get("servers", [])}
+        self._bg = []
+        self.listeners = []  # callback(name, cliente o None) cuando un servidor queda listo / cae
+        self._register_gauges()
+
+    def _register_gauges(self):
+        # Se evalúan al leer las métricas, no en cada llamada
+        def queue(field):
+            return lambda: {(n,): q[field] for n, s in self.status().items() if (q := s["queue"])}
+        METRICS.gauge("mcp_inflight_requests", "Requests en vuelo por servidor stdio", ("server",), queue("inflight"))
+        METRICS.gauge("mcp_queue_waiting", "Llamadas esperando lugar en la ventana", ("server",), queue("waiting"))
+        METRICS.gauge("mcp_server_up", "1 si el servidor está listo", ("server",),
+                      lambda: {(n,): int(s["state"] == "ready") for n, s in self.status().items()})
+        METRICS.gauge("mcp_server_restarts", "Reinicios del servidor desde que arrancó el host", ("server",),
+                      lambda: {(n,): s["restarts"] for n, s in self.status().items()})
+        METRICS.gauge("mcp_result_cache", "Caché de resultados de tools del host", ("stat",),
+                      lambda: {(k,): v for k, v in self.cache.stats().items()})
+
+    def _make_client(self, s):
+        if "command" in s:  # stdio
+            return MCPProcessClient(s["name"], s["command"], echo=s.get("echo", True),
+                                    max_inflight=s.get("max_inflight", MAX_INFLIGHT))
+        if "url" in s:  # http
+            return MCPHttpClient(s["name"], s["url"], s.get("max_connections", 8), echo=s.get("echo", True))
+        raise RuntimeError("Config inválida: falta 'command' o 'url'")
+
+    def _on_change(self, name, client):
+        if client is None:
+            self.clients.pop(name, None)
+        else:
+            self.clients[name] = client
+        for cb in self.listeners:
+            cb(name, client)
 
-    async def start_all(self):
+    async def start_all(self, wait_ready=False):
+        """Lanza todos los servidores en paralelo; el `initialize` sigue en segundo plano.
+
+        Solo se espera a que los procesos obligatorios estén lanzados (un comando inexistente
+        falla aquí, como antes); la primera llamada a un servidor espera a que termine su
+        handshake. Con `wait_ready=True` se espera también el handshake de los obligatorios.
+        Los `optional` no frenan el arranque aunque fallen, y los `"lazy": true` se lanzan
+        recién en su primer uso.
+        """
+        await start_metrics_server()  # solo si MCP_METRICS_PORT está definido
+        required = []
         for s in self.cfg["servers"]:
-            try:
-                if "command" in s:  # stdio
-                    client = MCPProcessClient(s["name"], s["command"])
-                    await client.start()
-                elif "url" in s:  # http
-                    client = MCPHttpClient(s["name"], s["url"])
-                    await client.start()
-                else:
-                    raise RuntimeError("Config inválida: falta 'command' o 'url'")
-                self.clients[s["name"]] = client
-            except Exception as e:
-                if s.get("optional"):
-                    continue
-                raise RuntimeError(f"No se pudo iniciar el servidor {s['name']}: {e}")
+            sup = self.supervisors[s["name"]]
+            if s.get("lazy"):
+                continue
+            self._bg.append(asyncio.ensure_future(self._start_quietly(sup)))
+            # HTTP no tiene proceso que lanzar: nada que esperar antes del primer prompt
+            if not s.get("optional") and "command" in s:
+                required.append(sup)
+        wait = (lambda sup: sup.ensure()) if wait_ready else (lambda sup: sup.spawned())
+        results = await asyncio.gather(*(wait(sup) for sup in required), return_exceptions=True)
+        for r in results:
+            if isinstance(r, Exception):
+                raise r
+
+    async def _start_quietly(self, sup):
+        try:
+            await sup.ensure()
+        except Exception:
+            pass  # queda en backoff/failed y la llamada que lo use recibe el error
+
+    def server_names(self):
+        return list(self.supervisors)
+
+    def server_info(self, name):
+        sup = self.supervisors.get(name)
+        return sup.info if sup else None
 
-    async def call(self, server, method, params):
-        if server not in self.clients:
+    def status(self):
+        return {name: sup.status() for name, sup in self.supervisors.items()}
+
+    async def close(self):
+        for t in self._bg:
+            t.cancel()
+        await asyncio.gather(*(sup.close() for sup in self.supervisors.values()), return_exceptions=True)
+
+    async def _client(self, server):
+        sup = self.supervisors.get(server)
+        if sup is None:
             raise RuntimeError(f"Server not available: {server}")
-        return await self.clients[server].call(method, params)
+        return await sup.ensure()
+
+    async def _call(self, server, method, params, timeout=None):
+        client = await self._client(server)
+        if timeout is None:
+            return await client.call(method, params)
+        return await client.call(method, params, timeout=timeout)
+
+    async def call(self, server, method, params, timeout=None):
+        if not METRICS_ENABLED:
+            return await self._routed(server, method, params, timeout)
+        tool = params.get("name") if method == "tools/call" and isinstance(params, dict) else None
+        t0 = time.perf_counter()
+        try:
+            result = await self._routed(server, method, params, timeout)
+        except BaseException as e:
+            METRICS.record_call(server, tool or method, outcome_of(e), time.perf_counter() - t0)
+            raise
+        METRICS.record_call(server, tool or method, "ok", time.perf_counter() - t0)
+        return result
+
+    async def metrics(self):
+        """Resumen de métricas del proceso (misma forma que DaemonClient.metrics)."""
+        return METRICS.snapshot()
+
+    async def _routed(self, server, method, params, timeout):
+        if method == "tools/call" and isinstance(params, dict) and params.get("name"):
+            return await self.cache.call(server, params["name"], params.get("arguments") or {},
+                                         lambda: self._call(server, method, params, timeout))
+        result = await self._call(server, method, params, timeout)
+        if method == "tools/list" and isinstance(result, dict):
+            self.cache.register_tools(server, result.get("tools", []), self.cache_extra.get(server, ()))
+        return result
+
+    async def call_batch(self, server, calls):
+        """calls = [(method, params), ...]; ver MCPProcessClient.call_batch."""
+        client = await self._client(server)
+        return await client.call_batch(calls)
@@ -0,0 +1,128 @@
+import os, json, uuid
+from pathlib import Path
+from .log_writer import save_llm_log, LOG_DIR, _env_int
+from .tool_executor import tool_call_fields
+
+# Memoria de conversación con presupuesto de tokens.
+# - El historial completo se guarda, pero al modelo solo se envía la ventana más reciente
+#   que cabe en `budget` tokens (más el system prompt).
+# - Los resultados de tools grandes (read_file de 1 MiB, list_dir enormes...) se recortan al
+#   guardarse: cabeza + cola y una nota de cuánto se omitió.
+# - En el log "llm" solo va lo nuevo de cada turno, con `conversation` y `seq`, para poder
+#   reconstruir la transcripción completa con `load_transcript()`.
+
+CONTEXT_TOKENS = _env_int("MCP_CONTEXT_TOKENS", 16000)
+TOOL_RESULT_TOKENS = _env_int("MCP_TOOL_RESULT_TOKENS", 2000)
+CHARS_PER_TOKEN = 4  # estimación gruesa; no hace falta un tokenizer para decidir qué recortar
+
+def estimate_tokens(msg):
+    n = len(msg.get("content") or "")
+    for tc in msg.get("tool_calls") or []:
+        n += len(tc["function"]["name"]) + len(tc["function"]["arguments"] or "")
+    return n // CHARS_PER_TOKEN + 4  # + rol y separadores
+
+def truncate_text(text, max_tokens):
+    """Cabeza y cola de `text` dentro de `max_tokens`; el medio se reemplaza por una nota."""
+    limit = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= limit:
+        return text
+    head, tail = int(limit * 0.7), int(limit * 0.25)
+    omitted = len(text) - head - tail
+    return (f"{text[:head]}\n…[{omitted} caracteres omitidos del resultado; "
+            f"pide un rango con offset/cursor si hace falta]…\n{text[-tail:]}")
+
+def _plain(msg):
+    # Los tool_calls del SDK pasan a dict: serializables en el log y medibles
+    if not msg.get("tool_calls"):
+        return dict(msg)
+    out = dict(msg)
+    out["tool_calls"] = [{"id": tid, "type": ttype, "function": {"name": name, "arguments": args}}
+                         for tid, ttype, name, args in map(tool_call_fields, msg["tool_calls"])]
+    return out
+
+class ConversationMemory:
+    def __init__(self, system_prompt, budget=None, tool_result_tokens=None, conversation_id=None):
+        self.system = {"role": "system", "content": system_prompt}
+        self.budget = budget or CONTEXT_TOKENS
+        self.tool_result_tokens = tool_result_tokens or TOOL_RESULT_TOKENS
+        self.id = conversation_id or uuid.uuid4().hex[:12]
+        self.messages = []   # historial completo (sin el system prompt)
+        self.tokens = []     # tokens estimados por mensaje, en paralelo a `messages`
+        self.seq = 0
+        self.logged = 0      # cuántos mensajes de `messages` ya están en el log
+        self.last_window = None
+        self.log("start", {"system": system_prompt, "budget": self.budget})
+
+    def add(self, msg):
+        msg = _plain(msg)
+        if msg.get("role") == "tool" and isinstance(msg.get("content"), str):
+            msg["content"] = truncate_text(msg["content"], self.tool_result_tokens)
+        self.messages.append(msg)
+        self.tokens.append(estimate_tokens(msg))
+        return msg
+
+    def extend(self, msgs):
+        for m in msgs:
+            self.add(m)
+
+    def _turn_starts(self):
+        # Un assistant con tool_calls y sus respuestas "tool" van juntos o no van:
+        # la API rechaza un "tool" sin el assistant que lo pidió.
+        return [i for i, m in enumerate(self.messages) if m.get("role") != "tool"]
+
+    def window(self):
+        """Mensajes a enviar: system + el sufijo más largo del historial que cabe en el presupuesto.
+        El último bloque (el mensaje del usuario en curso) va siempre."""
+        used = estimate_tokens(self.system)
+        start = len(self.messages)
+        for i in reversed(self._turn_starts()):
+            cost = sum(self.tokens[i:start])
+            if used + cost > self.budget and start < len(self.messages):
+                break
+            used += cost
+            start = i
+        dropped = start
+        out = [self.system]
+        if dropped:
+            out.append({"role": "system", "content": f"({dropped} mensajes anteriores omitidos por límite de contexto)"})
+        out.extend(self.messages[start:])
+        self.last_window = {"messages": len(out), "tokens": used, "dropped": dropped}
+        return out
+
+    def log(self, direction, payload):
+        self.seq += 1
+        save_llm_log(direction, {"conversation": self.id, "seq": self.seq, **payload})
+
+    def log_send(self):
+        """Registra solo los mensajes nuevos desde el último envío (y el tamaño de la ventana)."""
+        new = self.messages[self.logged:]
+        self.logged = len(self.messages)
+        self.log("send", {"messages": new, "window": self.last_window})
+
+    def flush(self):
+        # Al salir: lo que quedó sin enviar (normalmente la última respuesta del asistente)
+        if self.logged < len(self.messages):
+            new = self.messages[self.logged:]
+            self.logged = len(self.messages)
+            self.log("history", {"messages": new})
+
+def load_transcript(conversation_id, log_dir=None):
+    """Reconstruye los mensajes de una conversación desde los logs llm-*.jsonl (system incluido)."""
+    log_dir = Path(log_dir or os.getenv("MCP_LOG_DIR", str(LOG_DIR)))
+    records = []
+    for path in sorted(log_dir.glob("llm-*.jsonl")):
+        with path.open(encoding="utf-8") as f:
+            for line in f:
+                if f'"{conversation_id}"' not in line:
+                    continue
+                rec = json.loads(line)
+                if rec.get("conversation") == conversation_id:
+                    records.append(rec)
+    records.sort(key=lambda r: r["seq"])
+    messages = []
+    for rec in records:
+        if rec["direction"] == "start":
+            messages.append({"role": "system", "content": rec["system"]})
+        elif rec["direction"] in ("send", "history"):
+            messages.extend(rec["messages"])
+    return messages
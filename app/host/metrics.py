@@ -0,0 +1,220 @@
+import os, sys, time, asyncio
+from bisect import bisect_left
+
+# Métricas del host en memoria: contadores e histogramas de latencia por servidor, tool y
+# resultado, sin dependencias. Se leen con /stats (TUI), en el sidebar de Streamlit o en
+# formato de texto Prometheus en http://127.0.0.1:$MCP_METRICS_PORT/metrics.
+# Registrar una llamada es un par de búsquedas en dict y un bisect: ver tools/bench_suite.py
+# (caso metrics/record_call) para el costo por llamada.
+
+ENABLED = os.getenv("MCP_METRICS", "1").lower() not in ("0", "false", "no")
+METRICS_PORT = int(os.getenv("MCP_METRICS_PORT", 0))   # 0: sin endpoint HTTP
+# Límites de los buckets en segundos: de 0.5 ms (hit de caché) a 30 s (timeouts largos)
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+class _Hist:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self, n):
+        self.counts = [0] * (n + 1)  # el último es +Inf
+        self.sum = 0.0
+        self.count = 0
+
+class Counter:
+    def __init__(self, name, help, labels, source=None):
+        self.name, self.help, self.labels = name, help, labels
+        self.values = {}
+        self.source = source  # Histogram del que se toman los conteos, en lugar de contar dos veces
+
+    def inc(self, key, n=1):
+        self.values[key] = self.values.get(key, 0) + n
+
+    def items(self):
+        if self.source is not None:
+            return [(k, h.count) for k, h in list(self.source.values.items())]
+        return list(self.values.items())
+
+    def render(self, out):
+        out.append(f"# HELP {self.name} {self.help}\n# TYPE {self.name} counter")
+        for key, v in self.items():
+            out.append(f"{self.name}{{{_labels(self.labels, key)}}} {v}")
+
+class Histogram:
+    def __init__(self, name, help, labels, buckets=BUCKETS):
+        self.name, self.help, self.labels, self.buckets = name, help, labels, buckets
+        self.values = {}
+
+    def observe(self, key, seconds):
+        h = self.values.get(key)
+        if h is None:
+            h = self.values[key] = _Hist(len(self.buckets))
+        h.counts[bisect_left(self.buckets, seconds)] += 1
+        h.sum += seconds
+        h.count += 1
+
+    def quantile(self, key, q):
+        h = self.values.get(key)
+        return _quantile(h, self.buckets, q) if h is not None else None
+
+    def render(self, out):
+        out.append(f"# HELP {self.name} {self.help}\n# TYPE {self.name} histogram")
+        for key, h in list(self.values.items()):
+            labels = _labels(self.labels, key)
+            sep = "," if labels else ""
+            acc = 0
+            for le, c in zip(self.buckets, h.counts):
+                acc += c
+                out.append(f'{self.name}_bucket{{{labels}{sep}le="{le}"}} {acc}')
+            out.append(f'{self.name}_bucket{{{labels}{sep}le="+Inf"}} {h.count}')
+            out.append(f"{self.name}_sum{{{labels}}} {h.sum:.6f}")
+            out.append(f"{self.name}_count{{{labels}}} {h.count}")
+
+def _quantile(h, buckets, q):
+    """Estimación por interpolación dentro del bucket, como histogram_quantile de Prometheus."""
+    if not h.count:
+        return None
+    rank, seen, lower = q * h.count, 0, 0.0
+    for i, c in enumerate(h.counts):
+        if c and seen + c >= rank:
+            upper = buckets[i] if i < len(buckets) else buckets[-1]
+            return lower + (upper - lower) * (rank - seen) / c
+        seen += c
+        if i < len(buckets):
+            lower = buckets[i]
+    return buckets[-1]
+
+def _escape(v):
+    return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(names, key):
+    return ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, key))
+
+class Registry:
+    def __init__(self):
+        self.latency = Histogram("mcp_call_duration_seconds", "Latencia de MCPClientManager.call (incluye caché)",
+                                 ("server", "tool", "outcome"))
+        self.calls = Counter("mcp_calls_total", "Llamadas MCPClientManager.call por servidor, tool y resultado",
+                             ("server", "tool", "outcome"), source=self.latency)
+        self.requests = Counter("mcp_transport_requests_total", "Requests JSON-RPC enviados por el transporte",
+                                ("server", "transport", "method", "outcome"))
+        self.rtt = Histogram("mcp_transport_duration_seconds", "Ida y vuelta JSON-RPC en el transporte",
+                             ("server", "transport", "method"))
+        self.queue_wait = Histogram("mcp_queue_wait_seconds", "Espera en la ventana de requests en vuelo (stdio)",
+                                    ("server",))
+        self.gauges = {}   # nombre -> (help, labels, fn() -> {clave: valor}); se evalúan al leer
+        self.started = time.time()
+
+    def record_call(self, server, tool, outcome, seconds):
+        self.latency.observe((server, tool, outcome), seconds)  # mcp_calls_total sale de su conteo
+
+    def record_request(self, server, transport, method, outcome, seconds, n=1):
+        self.requests.inc((server, transport, method, outcome), n)
+        self.rtt.observe((server, transport, method), seconds)
+
+    def gauge(self, name, help, labels, fn):
+        self.gauges[name] = (help, labels, fn)
+
+    def render(self):
+        """Formato de texto de Prometheus (version 0.0.4)."""
+        out = []
+        for m in (self.calls, self.latency, self.requests, self.rtt, self.queue_wait):
+            m.render(out)
+        for name, (help, labels, fn) in list(self.gauges.items()):
+            out.append(f"# HELP {name} {help}\n# TYPE {name} gauge")
+            try:
+                values = fn()
+            except Exception:
+                continue
+            for key, v in values.items():
+                out.append(f"{name}{{{_labels(labels, key)}}} {v}")
+        return "\n".join(out) + "\n"
+
+    def summary(self):
+        """Filas por (servidor, tool) para /stats: llamadas, errores, latencias en ms."""
+        rows = {}
+        for (server, tool, outcome), n in self.calls.items():
+            r = rows.setdefault((server, tool), {"server": server, "tool": tool, "calls": 0, "errors": 0,
+                                                 "sum": 0.0, "outcomes": {}})
+            r["calls"] += n
+            r["outcomes"][outcome] = n
+            if outcome != "ok":
+                r["errors"] += n
+            h = self.latency.values.get((server, tool, outcome))
+            r["sum"] += h.sum if h else 0.0
+        uptime = max(time.time() - self.started, 1e-9)
+        out = []
+        for (server, tool), r in sorted(rows.items()):
+            p50 = self._merged_quantile(server, tool, r["outcomes"], 0.5)
+            p95 = self._merged_quantile(server, tool, r["outcomes"], 0.95)
+            out.append({"server": server, "tool": tool, "calls": r["calls"], "errors": r["errors"],
+                        "error_rate": round(r["errors"] / r["calls"], 3),
+                        "avg_ms": round(r["sum"] / r["calls"] * 1000, 2),
+                        "p50_ms": round(p50 * 1000, 2) if p50 is not None else None,
+                        "p95_ms": round(p95 * 1000, 2) if p95 is not None else None,
+                        "per_min": round(r["calls"] / uptime * 60, 2), "outcomes": r["outcomes"]})
+        return out
+
+    def _merged_quantile(self, server, tool, outcomes, q):
+        # Cuantil sobre todos los resultados de la tool: se suman sus buckets
+        merged = _Hist(len(BUCKETS))
+        for outcome in outcomes:
+            h = self.latency.values.get((server, tool, outcome))
+            if h:
+                merged.counts = [a + b for a, b in zip(merged.counts, h.counts)]
+                merged.count += h.count
+        return _quantile(merged, BUCKETS, q)
+
+    def snapshot(self):
+        gauges = {}
+        for name, (_, labels, fn) in list(self.gauges.items()):
+            try:
+                gauges[name] = [dict(zip(labels, k), value=v) for k, v in fn().items()]
+            except Exception:
+                pass
+        return {"uptime_s": round(time.time() - self.started, 1), "tools": self.summary(), "gauges": gauges}
+
+METRICS = Registry()
+
+def outcome_of(exc):
+    """Clasifica el error de una llamada para la etiqueta `outcome`."""
+    if exc is None:
+        return "ok"
+    if isinstance(exc, asyncio.CancelledError):
+        return "cancelled"
+    msg = str(exc)
+    if msg.startswith("⏳"):
+        return "timeout"
+    if msg.startswith("MCP error"):
+        return "error"
+    return "unavailable"  # servidor caído, reiniciando, conexión cerrada...
+
+_server = None
+
+async def start_metrics_server(port=METRICS_PORT, host="127.0.0.1"):
+    """Endpoint GET /metrics en texto Prometheus (una vez por proceso; solo localhost)."""
+    global _server
+    if _server is not None or not port:
+        return _server
+    async def handle(reader, writer):
+        try:
+            request = await asyncio.wait_for(reader.readline(), 5)
+            while (await asyncio.wait_for(reader.readline(), 5)) not in (b"\r\n", b"\n", b""):
+                pass  # cabeceras: no se usan
+            path = request.split(b" ")[1] if request.count(b" ") >= 2 else b"/"
+            if path.split(b"?")[0] == b"/metrics":
+                body, status = METRICS.render().encode("utf-8"), b"200 OK"
+            else:
+                body, status = b"Not Found\n", b"404 Not Found"
+            writer.write(b"HTTP/1.1 " + status + b"\r\nContent-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                         + f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body)
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+    try:
+        _server = await asyncio.start_server(handle, host, port)
+        print(f"📈 Métricas en http://{host}:{port}/metrics", file=sys.stderr)
+    except OSError as e:  # p.ej. otro proceso del host ya usa el puerto
+        print(f"⚠️ No se pudo abrir el puerto de métricas {port}: {e}", file=sys.stderr)
+    return _server
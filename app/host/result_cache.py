@@ -0,0 +1,166 @@
+import os, json, time, asyncio
+from collections import OrderedDict
+from .log_writer import get_logger, utc_ts, _env_int
+from .tool_executor import MUTATING_TOOLS, _overlaps
+
+# Caché de resultados de tools en el host (por encima de MCPClientManager.call).
+# - Solo se cachean tools que se declaran cacheables: annotations readOnlyHint + idempotentHint
+#   en su tools/list (o "cacheable_tools" en la entrada del servidor en servers.config.json).
+# - Clave: servidor, tool y argumentos canónicos (claves ordenadas, "path" absoluto).
+# - LRU acotado por entradas y por bytes, con TTL.
+# - Una tool que muta (annotations readOnlyHint=false, o MUTATING_TOOLS) invalida las entradas
+#   cuyo "path" se solapa con el suyo: write_file en repo/a.txt invalida read_file de repo/a.txt,
+#   list_dir de repo y git/status de repo. Sin path conocido, se vacía todo.
+
+CACHE_TTL = float(os.getenv("MCP_RESULT_CACHE_TTL", 30))
+CACHE_ENTRIES = _env_int("MCP_RESULT_CACHE_ENTRIES", 512)
+CACHE_BYTES = _env_int("MCP_RESULT_CACHE_MB", 64) * 1024 * 1024
+STATS_EVERY = 50  # cada cuántas consultas se escribe un resumen de hit rate en el log
+
+def _path_of(arguments):
+    path = arguments.get("path") if isinstance(arguments, dict) else None
+    if not isinstance(path, str) or not path:
+        return None
+    return os.path.normcase(os.path.abspath(path))
+
+def cache_key(server, tool, arguments):
+    args = dict(arguments) if isinstance(arguments, dict) else {}
+    if isinstance(args.get("path"), str) and args["path"]:
+        args["path"] = os.path.normcase(os.path.abspath(args["path"]))  # "./a.txt" y "a.txt" son lo mismo
+    return (server, tool, json.dumps(args, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str))
+
+class _Entry:
+    __slots__ = ("value", "path", "size", "expires")
+
+    def __init__(self, value, path, size, expires):
+        self.value = value
+        self.path = path
+        self.size = size
+        self.expires = expires
+
+class ResultCache:
+    def __init__(self, ttl=CACHE_TTL, max_entries=CACHE_ENTRIES, max_bytes=CACHE_BYTES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.cacheable = {}   # servidor -> set(tools)
+        self.mutating = {}    # servidor -> set(tools)
+        self.inflight = {}    # clave -> [tarea, llamadas esperando]: las idénticas simultáneas comparten la tarea
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+        self.generation = 0   # sube con cada mutación: lo leído antes de ella no se guarda
+        self.logger = get_logger("mcp")
+
+    def register_tools(self, server, tools, extra_cacheable=()):
+        """Toma las annotations del tools/list del servidor."""
+        cacheable, mutating = set(extra_cacheable), set()
+        for t in tools:
+            if not isinstance(t, dict) or not t.get("name"):
+                continue
+            ann = t.get("annotations") or {}
+            if ann.get("readOnlyHint") and ann.get("idempotentHint"):
+                cacheable.add(t["name"])
+            elif ann.get("readOnlyHint") is False:
+                mutating.add(t["name"])
+        self.cacheable[server] = cacheable
+        self.mutating[server] = mutating
+
+    def is_cacheable(self, server, tool):
+        return self.ttl > 0 and tool in self.cacheable.get(server, ())
+
+    def is_mutating(self, server, tool):
+        return tool in MUTATING_TOOLS or tool in self.mutating.get(server, ())
+
+    async def call(self, server, tool, arguments, fetch):
+        """Resultado de `fetch()` (una corrutina que hace el tools/call), pasando por la caché."""
+        if self.is_mutating(server, tool):
+            try:
+                return await fetch()
+            finally:
+                # También si falló: la mutación pudo quedar a medias
+                self.invalidate(_path_of(arguments), reason=f"{server}:{tool}")
+        if not self.is_cacheable(server, tool):
+            return await fetch()
+
+        key = cache_key(server, tool, arguments)
+        e = self.entries.get(key)
+        if e is not None and e.expires > time.monotonic():
+            self.entries.move_to_end(key)
+            self._count(True, server, tool)
+            return e.value
+        # La búsqueda en curso corre en su propia tarea: si se cancela quien la empezó, las demás
+        # llamadas que la comparten siguen esperándola. Solo se cancela cuando nadie la espera.
+        pending = self.inflight.get(key)
+        if pending is None:
+            self._count(False, server, tool)
+            task = asyncio.ensure_future(self._fill(key, fetch, self.generation, _path_of(arguments)))
+            pending = self.inflight[key] = [task, 0]
+        else:
+            self._count(True, server, tool)
+        pending[1] += 1
+        try:
+            return await asyncio.shield(pending[0])
+        finally:
+            pending[1] -= 1
+            if not pending[1] and not pending[0].done():
+                if self.inflight.get(key) is pending:
+                    del self.inflight[key]  # una llamada nueva no se engancha a la tarea que se cancela
+                pending[0].cancel()
+
+    async def _fill(self, key, fetch, gen, path):
+        try:
+            value = await fetch()
+        finally:
+            if self.inflight.get(key, (None,))[0] is asyncio.current_task():
+                del self.inflight[key]
+        if gen == self.generation:
+            self._store(key, value, path)
+        return value
+
+    def _store(self, key, value, path):
+        try:
+            size = len(json.dumps(value, ensure_ascii=False, default=str))
+        except Exception:
+            return
+        if size > self.max_bytes // 4:  # un resultado enorme desplazaría toda la caché
+            return
+        old = self.entries.pop(key, None)
+        if old is not None:
+            self.bytes -= old.size
+        self.entries[key] = _Entry(value, path, size, time.monotonic() + self.ttl)
+        self.bytes += size
+        while self.entries and (len(self.entries) > self.max_entries or self.bytes > self.max_bytes):
+            _, ev = self.entries.popitem(last=False)
+            self.bytes -= ev.size
+            self.evictions += 1
+
+    def invalidate(self, path=None, reason=None):
+        self.generation += 1
+        if path is None:
+            dropped = list(self.entries)
+        else:
+            # Entradas sin path (p.ej. analyze de un snippet) no dependen del disco
+            dropped = [k for k, e in self.entries.items() if e.path is not None and _overlaps(e.path, path)]
+        for k in dropped:
+            self.bytes -= self.entries.pop(k).size
+        self.invalidations += len(dropped)
+        if dropped:
+            self.logger.log({"ts": utc_ts(), "direction": "cache", "event": "invalidate",
+                             "reason": reason, "path": path, "dropped": len(dropped)})
+
+    def _count(self, hit, server, tool):
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+        self.logger.log({"ts": utc_ts(), "server": server, "direction": "cache",
+                         "event": "hit" if hit else "miss", "tool": tool})
+        if (self.hits + self.misses) % STATS_EVERY == 0:
+            self.logger.log({"ts": utc_ts(), "direction": "cache", "event": "stats", **self.stats()})
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": round(self.hits / total, 3) if total else 0.0,
+                "entries": len(self.entries), "bytes": self.bytes, "evictions": self.evictions,
+                "invalidations": self.invalidations}
@@ -0,0 +1,207 @@
+import os, time, asyncio
+from .log_writer import get_logger, utc_ts, _env_int
+
+# Supervisor por servidor MCP: arranque con handshake `initialize`, health check con `ping`
+# y reinicio con backoff exponencial cuando el proceso muere o deja de responder.
+
+PING_INTERVAL = float(os.getenv("MCP_PING_INTERVAL", 15))
+PING_TIMEOUT = float(os.getenv("MCP_PING_TIMEOUT", 5))
+PING_FAILURES = 2            # pings fallidos seguidos para dar al servidor por colgado
+INIT_TIMEOUT = float(os.getenv("MCP_INIT_TIMEOUT", 20))
+BACKOFF_MIN, BACKOFF_MAX = 0.5, 30.0
+MAX_FAILURES = _env_int("MCP_MAX_RESTARTS", 5)   # arranques fallidos seguidos antes de rendirse
+PROTOCOL_VERSION = "2024-08-01"
+
+def _busy(client):
+    """¿Tiene requests en vuelo o respondió algo hace poco? Los servidores que atienden de a un
+    request (filesystem, git, local sin --concurrent) no contestan un ping encolado detrás de
+    un analyze_path o un list_dir grande; eso no es estar colgado. Un servidor colgado de verdad
+    deja de estar ocupado cuando esos requests vencen, y ahí los pings vuelven a contar."""
+    if getattr(client, "pending", None):
+        return True
+    return time.monotonic() - getattr(client, "last_recv", 0.0) < PING_INTERVAL
+
+class ServerSupervisor:
+    """Estados: stopped -> starting -> ready; ante una caída -> backoff -> starting...;
+    tras MAX_FAILURES arranques fallidos seguidos -> failed: ya no se reintenta solo, pero
+    una llamada que llegue pasados BACKOFF_MAX segundos vuelve a intentarlo.
+
+    `ensure()` devuelve el cliente listo, arrancándolo si hace falta; varias llamadas
+    simultáneas comparten el mismo arranque. Durante el backoff falla enseguida en lugar
+    de dejar que la llamada espere a un timeout.
+    """
+
+    def __init__(self, spec, make_client, on_change=None):
+        self.spec = spec
+        self.name = spec["name"]
+        self.make_client = make_client
+        self.on_change = on_change   # callback(name, client o None) al quedar listo / caer
+        self.client = None
+        self.info = None             # resultado de initialize
+        self.state = "stopped"
+        self.last_error = None
+        self.failures = 0
+        self.restarts = 0
+        self.backoff = BACKOFF_MIN
+        self.retry_at = 0.0
+        self.start_ms = None
+        self._starting = None
+        self._launching = None           # cliente a medio arrancar (para cerrarlo si nos cierran)
+        self._spawned = asyncio.Event()  # el proceso se lanzó (o el arranque ya falló)
+        self._tasks = []
+        self._closing = False
+        self.logger = get_logger("mcp")
+
+    def _log(self, event, **data):
+        self.logger.log({"ts": utc_ts(), "server": self.name, "direction": "lifecycle", "event": event, **data})
+
+    async def ensure(self):
+        if self.state == "ready" and self.client is not None:
+            return self.client
+        if self._starting is None:
+            wait = self.retry_at - time.monotonic()
+            if self.state == "failed" and wait > 0:
+                raise RuntimeError(f"Servidor {self.name} no disponible: {self.last_error}")
+            if self.state == "backoff" and wait > 0:
+                raise RuntimeError(f"Servidor {self.name} caído, reintento en {wait:.1f}s: {self.last_error}")
+            self._starting = asyncio.ensure_future(self._start())
+        return await asyncio.shield(self._starting)
+
+    async def _start(self):
+        t0 = time.perf_counter()
+        self.state = "starting"
+        client = None
+        try:
+            client = self._launching = self.make_client(self.spec)
+            await client.start()
+            self._spawned.set()
+            try:
+                self.info = await client.call("initialize", {
+                    "protocolVersion": PROTOCOL_VERSION,
+                    "clientInfo": {"name": "mcp-host"},
+                    "capabilities": {}}, timeout=INIT_TIMEOUT)
+            except RuntimeError as e:
+                # Un servidor que no implementa initialize igual sirve tools/call
+                if "MCP error" not in str(e):
+                    raise
+                self.info = None
+            if hasattr(client, "notify"):
+                await client.notify("notifications/initialized")
+        except Exception as e:
+            if client is not None and hasattr(client, "close"):
+                await client.close()
+            self._failed_start(str(e))
+            self._spawned.set()
+            raise RuntimeError(f"No se pudo iniciar el servidor {self.name}: {e}")
+        finally:
+            self._starting = None
+            self._launching = None
+        self.client = client
+        self.state = "ready"
+        self.failures = 0
+        self.start_ms = round((time.perf_counter() - t0) * 1000, 1)
+        self._log("ready", start_ms=self.start_ms, restarts=self.restarts)
+        if self.on_change:
+            self.on_change(self.name, client)
+        if getattr(client, "read_task", None) is not None:  # stdio: vigilar el proceso
+            self._tasks = [t for t in self._tasks if not t.done()] + [
+                asyncio.ensure_future(self._watch(client)), asyncio.ensure_future(self._health(client))]
+        return client
+
+    def _failed_start(self, error):
+        self.last_error = error
+        self.failures += 1
+        if self.failures >= MAX_FAILURES:
+            self.state = "failed"
+            self.retry_at = time.monotonic() + BACKOFF_MAX
+            self._log("failed", error=error, failures=self.failures)
+            return
+        self.state = "backoff"
+        self.retry_at = time.monotonic() + self.backoff
+        self._log("start_error", error=error, retry_in=self.backoff)
+        self.backoff = min(self.backoff * 2, BACKOFF_MAX)
+        if not self._closing:
+            self._tasks.append(asyncio.ensure_future(self._restart_later(self.retry_at)))
+
+    async def spawned(self):
+        """Espera a que el proceso esté lanzado, sin esperar al handshake."""
+        await self._spawned.wait()
+        if self.client is None and self._starting is None and self.state in ("backoff", "failed"):
+            raise RuntimeError(f"No se pudo iniciar el servidor {self.name}: {self.last_error}")
+
+    async def _watch(self, client):
+        # El lector termina cuando el servidor cierra stdout: murió o lo cerramos nosotros
+        await asyncio.wait([client.read_task])
+        if self.client is client and not self._closing:
+            await self._crashed(client, "el proceso terminó")
+
+    async def _health(self, client):
+        misses = 0
+        while self.client is client and not self._closing:
+            await asyncio.sleep(PING_INTERVAL)
+            if self.client is not client:
+                return
+            try:
+                await client.call("ping", {}, timeout=PING_TIMEOUT)
+                alive = True
+            except Exception as e:
+                # Un error JSON-RPC (p.ej. -32601 si no implementa ping) es una respuesta: está vivo
+                alive = "MCP error" in str(e)
+                reason = e
+                if not alive and _busy(client):
+                    continue  # ocupado, no colgado: el ping espera detrás de un request largo
+            if alive:
+                misses = 0
+                self.backoff = BACKOFF_MIN  # estable: el próximo reinicio vuelve a empezar rápido
+            else:
+                misses += 1
+                if misses >= PING_FAILURES:
+                    await self._crashed(client, f"sin respuesta a ping: {reason}", hung=True)
+                    return
+
+    async def _crashed(self, client, reason, hung=False):
+        if self.client is not client:
+            return
+        # Primero sacarlo de servicio (sin await de por medio): nada más se le envía
+        self.client = None
+        self.state = "backoff"
+        self.restarts += 1
+        self.retry_at = time.monotonic() + self.backoff
+        retry_in = self.backoff
+        self.backoff = min(self.backoff * 2, BACKOFF_MAX)
+        if self.on_change:
+            self.on_change(self.name, None)
+        # Las llamadas en vuelo fallan ya, no al vencer su timeout
+        client.fail_pending(f"Servidor {self.name} se reinicia: {reason}")
+        await client.close(kill=hung)  # colgado: no va a atender ni el cierre de stdin ni SIGTERM
+        code = client.proc.returncode if client.proc else None
+        self.last_error = f"{reason} (código {code})" if code is not None else reason
+        self._log("crashed", reason=self.last_error, restarts=self.restarts, retry_in=retry_in)
+        if not self._closing:
+            self._tasks.append(asyncio.ensure_future(self._restart_later(self.retry_at)))
+
+    async def _restart_later(self, at):
+        await asyncio.sleep(max(0.0, at - time.monotonic()))
+        if self._closing or self.state not in ("backoff",) or self._starting is not None:
+            return
+        try:
+            await self.ensure()
+        except Exception:
+            pass  # _failed_start ya registró el error y programó el siguiente intento
+
+    def status(self):
+        queue = getattr(self.client, "queue_stats", None)
+        return {"state": self.state, "restarts": self.restarts, "start_ms": self.start_ms,
+                "last_error": self.last_error, "queue": queue() if queue else None}
+
+    async def close(self):
+        self._closing = True
+        for t in self._tasks:
+            t.cancel()
+        if self._starting is not None:
+            self._starting.cancel()
+        for client in (self.client, self._launching):
+            if client is not None and hasattr(client, "close"):
+                await client.close()
+        self.client = None
+        self.state = "stopped"
@@ -0,0 +1,138 @@
+import os, re, time, asyncio, fnmatch
+
+# Catálogo de tools a partir de `tools/list` de cada servidor iniciado.
+# En lugar de un único `mcp_call` con todas las tools descritas en texto, el modelo recibe una
+# función OpenAI por tool con el schema real de sus argumentos: menos tokens por turno y
+# llamadas que ya llegan con el servidor, la tool y los argumentos correctos.
+
+CATALOG_TTL = float(os.getenv("MCP_TOOLS_TTL", 300))
+DESC_MAX = 120   # caracteres de descripción por tool (solo la primera oración)
+PROP_DESC_MAX = 60
+_BAD_CHARS = re.compile(r"[^A-Za-z0-9_-]")
+
+def tool_schema(tool):
+    # El servidor local usa "inputSchema" (MCP); filesystem y git, "input_schema"
+    schema = tool.get("inputSchema") or tool.get("input_schema") or {}
+    return schema if isinstance(schema, dict) else {}
+
+def _short(text, limit, first_sentence=False):
+    text = " ".join(str(text).split())
+    if first_sentence:
+        text = text.split(". ", 1)[0]
+    return text if len(text) <= limit else text[:limit - 1].rstrip() + "…"
+
+def compact_schema(schema):
+    """Copia del JSON Schema sin lo que no aporta al modelo: títulos, ejemplos, descripciones largas."""
+    if not isinstance(schema, dict):
+        return schema
+    out = {}
+    for k, v in schema.items():
+        if k in ("title", "examples", "$schema"):
+            continue
+        if k == "description":
+            out[k] = _short(v, PROP_DESC_MAX)
+        elif k == "properties" and isinstance(v, dict):
+            out[k] = {name: compact_schema(p) for name, p in v.items()}
+        elif k == "items":
+            out[k] = compact_schema(v)
+        else:
+            out[k] = v
+    return out
+
+def function_name(server, tool, taken):
+    # Nombres OpenAI: ^[A-Za-z0-9_-]{1,64}$. "filesystem/read_file" -> "filesystem_read_file";
+    # si otro servidor ya usó ese nombre se antepone el servidor.
+    name = _BAD_CHARS.sub("_", tool)[:64]
+    if name in taken:
+        name = _BAD_CHARS.sub("_", f"{server}__{tool}")[:64]
+    n = 2
+    base = name
+    while name in taken:
+        suffix = f"_{n}"
+        name = base[:64 - len(suffix)] + suffix
+        n += 1
+    return name
+
+class ToolCatalog:
+    """`tools/list` por servidor (tras el `initialize` del supervisor), con caché de `ttl` segundos.
+
+    - `openai_tools()` devuelve una función por tool (y `mcp_call` si no hay ninguna).
+    - `resolve(nombre_función)` -> (servidor, tool) para el executor.
+    - Si un servidor falla al refrescar se conserva su última lista conocida.
+    - `"expose": ["git/status", "git/log", ...]` (globs) en la entrada del servidor en
+      servers.config.json limita qué tools se ofrecen al modelo; sin él van todas.
+    """
+
+    def __init__(self, mgr, ttl=CATALOG_TTL, timeout=10):
+        self.mgr = mgr
+        self.ttl = ttl
+        self.timeout = timeout
+        self.servers = {}     # servidor -> {"info", "tools", "at"}
+        self.functions = []
+        self.routes = {}      # nombre de función -> (servidor, tool)
+        self._lock = asyncio.Lock()
+
+    def stale(self):
+        now = time.monotonic()
+        names = self.mgr.server_names()
+        return any(n not in self.servers or now - self.servers[n]["at"] > self.ttl for n in names)
+
+    async def _load(self, name):
+        entry = self.servers.get(name)
+        try:
+            # El supervisor ya hizo initialize al arrancar el servidor (o lo hace ahora, si es lazy)
+            listed = await self.mgr.call(name, "tools/list", {}, timeout=self.timeout)
+            tools = listed.get("tools", []) if isinstance(listed, dict) else []
+            self.servers[name] = {"info": self.mgr.server_info(name), "tools": tools, "at": time.monotonic()}
+        except Exception as e:
+            if entry is None:
+                self.servers[name] = {"info": None, "tools": [], "at": time.monotonic(), "error": str(e)}
+            else:
+                entry["at"], entry["error"] = time.monotonic(), str(e)
+
+    async def refresh(self, force=False):
+        async with self._lock:  # una sola recarga aunque varios turnos la pidan a la vez
+            if not force and not self.stale():
+                return
+            now = time.monotonic()
+            todo = [n for n in self.mgr.server_names()
+                    if force or n not in self.servers or now - self.servers[n]["at"] > self.ttl]
+            await asyncio.gather(*(self._load(n) for n in todo))
+            self._build()
+
+    def _build(self):
+        functions, routes = [], {}
+        expose = {s["name"]: s.get("expose") for s in self.mgr.cfg.get("servers", [])}
+        for server in self.mgr.server_names():  # orden de servers.config.json: nombres estables
+            for tool in self.servers.get(server, {}).get("tools", []):
+                if not isinstance(tool, dict) or not tool.get("name"):
+                    continue
+                patterns = expose.get(server)
+                if patterns and not any(fnmatch.fnmatchcase(tool["name"], p) for p in patterns):
+                    continue
+                fn = function_name(server, tool["name"], routes)
+                routes[fn] = (server, tool["name"])
+                params = compact_schema(tool_schema(tool))
+                params.setdefault("type", "object")
+                params.setdefault("properties", {})
+                functions.append({"type": "function", "function": {
+                    "name": fn,
+                    "description": _short(tool.get("description", ""), DESC_MAX, first_sentence=True),
+                    "parameters": params}})
+        self.functions, self.routes = functions, routes
+
+    async def openai_tools(self):
+        await self.refresh()
+        if not self.functions:
+            from .tool_router import OPENAI_TOOLS  # ningún servidor respondió tools/list
+            return OPENAI_TOOLS
+        return self.functions
+
+    def resolve(self, fn):
+        return self.routes.get(fn)
+
+    def summary(self):
+        """[(servidor, tool, función, descripción)] para /tools en las UIs."""
+        by_route = {v: k for k, v in self.routes.items()}
+        return [(s, t.get("name"), by_route.get((s, t.get("name"))), t.get("description", ""))
+                for s, e in self.servers.items() for t in e.get("tools", []) if isinstance(t, dict)]
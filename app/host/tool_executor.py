@@ -0,0 +1,111 @@
+import os, json, asyncio
+
+# Tools que modifican estado; su argumento "path" delimita el archivo o repo que tocan
+MUTATING_TOOLS = {"filesystem/write_file", "filesystem/delete_file", "git/init", "git/commit"}
+
+def tool_call_fields(tc):
+    """(id, type, name, arguments) de un tool_call, venga como objeto del SDK o como dict."""
+    if isinstance(tc, dict):
+        fn = tc.get("function") or {}
+        return tc.get("id"), tc.get("type", "function"), fn.get("name"), fn.get("arguments")
+    return tc.id, tc.type, tc.function.name, tc.function.arguments
+
+def _resource(params):
+    path = (params.get("arguments") or {}).get("path") if isinstance(params, dict) else None
+    if not isinstance(path, str) or not path:
+        return None
+    return os.path.normcase(os.path.abspath(path))
+
+def _overlaps(a, b):
+    # Mismo path, o uno contiene al otro (archivo dentro de un repo, repo dentro de un dir)
+    return a == b or a.startswith(b.rstrip(os.sep) + os.sep) or b.startswith(a.rstrip(os.sep) + os.sep)
+
+def _conflicts(a, b):
+    if not (a.mutating or b.mutating):
+        return False
+    # Una mutación sin path conocido se ordena respecto a todo
+    if (a.mutating and a.resource is None) or (b.mutating and b.resource is None):
+        return True
+    if a.resource is None or b.resource is None:
+        return False
+    return _overlaps(a.resource, b.resource)
+
+def _tool_msg(tool_call_id, name, content):
+    return {"role": "tool", "tool_call_id": tool_call_id, "name": name, "content": content}
+
+class _Entry:
+    def __init__(self, task, resource, mutating):
+        self.task = task
+        self.resource = resource
+        self.mutating = mutating
+
+class ToolCallExecutor:
+    """Ejecuta los tool_calls de un turno en paralelo con asyncio.gather.
+
+    - Como máximo `per_server_limit` llamadas simultáneas por servidor
+      (o `max_concurrency` de su entrada en servers.config.json).
+    - Una llamada que muta un path espera a las anteriores que tocan ese path o uno
+      que lo contiene/contenido, y viceversa: write_file -> git/commit conserva su orden.
+    - `gather()` devuelve los mensajes "tool" en el orden en que se enviaron los tool_calls.
+    - Con `catalog`, las funciones por tool (`filesystem_read_file`...) se traducen a un
+      `tools/call` a su servidor; `mcp_call` sigue aceptándose.
+    """
+
+    def __init__(self, mgr, per_server_limit=4, catalog=None):
+        self.mgr = mgr
+        self.catalog = catalog  # ToolCatalog: funciones por tool además de mcp_call
+        self.limits = {s["name"]: asyncio.Semaphore(s.get("max_concurrency", per_server_limit))
+                       for s in mgr.cfg.get("servers", [])}
+        self.per_server_limit = per_server_limit
+        self.entries = []
+
+    def submit(self, tc):
+        tid, ttype, fn, raw_args = tool_call_fields(tc)
+        if ttype != "function":
+            return None
+        route = self.catalog.resolve(fn) if self.catalog and fn != "mcp_call" else None
+        if fn != "mcp_call" and route is None:
+            return self._done(_tool_msg(tid, fn, f"Unsupported tool {fn}"))
+        try:
+            args = json.loads(raw_args or "{}")
+            if route is not None:
+                args = {"server": route[0], "method": "tools/call", "params": {"name": route[1], "arguments": args}}
+            params = args.get("params", {}) or {}
+        except Exception as e:
+            return self._done(_tool_msg(tid, fn, json.dumps({"ok": False, "error": f"Argumentos inválidos: {e}"}, ensure_ascii=False)))
+
+        entry = _Entry(None, _resource(params), isinstance(params, dict) and params.get("name") in MUTATING_TOOLS)
+        deps = [e.task for e in self.entries if _conflicts(entry, e)]
+        entry.task = asyncio.ensure_future(self._run(tid, fn, args, deps))
+        self.entries.append(entry)
+        return entry.task
+
+    def _done(self, msg):
+        fut = asyncio.get_running_loop().create_future()
+        fut.set_result(msg)
+        self.entries.append(_Entry(fut, None, False))
+        return fut
+
+    async def _run(self, tid, fn, args, deps):
+        if deps:
+            await asyncio.gather(*deps, return_exceptions=True)
+        server = args.get("server")
+        sem = self.limits.get(server)
+        if sem is None:
+            sem = self.limits[server] = asyncio.Semaphore(self.per_server_limit)
+        try:
+            async with sem:
+                result = await self.mgr.call(args["server"], args["method"], args.get("params", {}))
+            content = {"ok": True, "result": result}
+        except Exception as e:
+            content = {"ok": False, "error": str(e)}
+        return _tool_msg(tid, fn, json.dumps(content, ensure_ascii=False))
+
+    async def gather(self):
+        return list(await asyncio.gather(*(e.task for e in self.entries)))
+
+async def execute_tool_calls(mgr, tool_calls, per_server_limit=4, catalog=None):
+    ex = ToolCallExecutor(mgr, per_server_limit, catalog)
+    for tc in tool_calls:
+        ex.submit(tc)
+    return await ex.gather()
@@ -13,6 +13,7 @@ class McpCallArgs(BaseModel):
         )
     )
 
+# Respaldo cuando ningún servidor responde tools/list; lo normal es el catálogo (tool_catalog.py)
 OPENAI_TOOLS = [
     {
         "type": "function",
@@ -20,6 +21,9 @@ OPENAI_TOOLS = [
             "name": "mcp_call",
             "description": (
                 "Llama a un servidor MCP.\n\n"
+                "🧮 Complexity tools (local-complexity):\n"
+                "- code/complexity/analyze: argumentos = { 'code': str }\n"
+                "- code/complexity/analyze_path: argumentos = { 'path': str }\n\n"
                 "📂 Filesystem tools:\n"
                 "- filesystem/write_file: argumentos = { 'path': str, 'content': str }\n"
                 "- filesystem/read_file: argumentos = { 'path': str }\n"
@@ -28,7 +32,11 @@ OPENAI_TOOLS = [
                 "🌿 Git tools:\n"
                 "- git/init: argumentos = { 'path': str }\n"
                 "- git/status: argumentos = { 'path': str }\n"
-                "- git/commit: argumentos = { 'path': str, 'message': str }\n\n"
+                "- git/commit: argumentos = { 'path': str, 'message': str }\n"
+                "- git/read_file: argumentos = { 'path': str, 'file': str, 'rev'?: str }\n"
+                "- git/log: argumentos = { 'path': str, 'limit'?: int, 'paths'?: [str], 'stat'?: bool, 'cursor'?: str }\n"
+                "- git/diff: argumentos = { 'path': str, 'base'?: str, 'target'?: str, 'staged'?: bool, 'paths'?: [str], 'stat'?: bool, 'cursor'?: str }\n"
+                "- git/show: argumentos = { 'path': str, 'rev'?: str, 'paths'?: [str], 'stat'?: bool, 'cursor'?: str }\n\n"
                 "🔐 RSA tools (remote-utils):\n"
                 "- rsa/generate_keys: argumentos = { 'rango_inferior': int, 'rango_superior': int }\n"
                 "- rsa/encrypt: argumentos = { 'mensaje': int, 'e': int, 'n': int }\n"
@@ -42,7 +50,7 @@ OPENAI_TOOLS = [
                 "properties": {
                     "server": {
                         "type": "string",
-                        "enum": ["filesystem", "git", "remote-utils"]
+                        "enum": ["local-complexity", "filesystem", "git", "remote-utils"]
                     },
                     "method": {
                         "type": "string",
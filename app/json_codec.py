@@ -0,0 +1,56 @@
+# app/json_codec.py
+# Codec JSON compartido por el host y los servidores MCP para el framing por STDIO/HTTP.
+# Usa orjson si está instalado y si no, la librería estándar; en ambos casos trabaja en
+# bytes UTF-8 compactos, que es lo que viaja por los pipes y sockets (sin pasar por str).
+# MCP_JSON_BACKEND=json fuerza la librería estándar (diagnóstico / comparación).
+import os, json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if os.getenv("MCP_JSON_BACKEND", "").lower() == "json":
+    orjson = None
+
+BACKEND = "orjson" if orjson else "json"
+
+def _std_dumps(obj) -> bytes:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+if orjson:
+    _OPTS = orjson.OPT_NON_STR_KEYS
+
+    def dumps(obj) -> bytes:
+        """Serializa a bytes UTF-8 compactos."""
+        try:
+            return orjson.dumps(obj, option=_OPTS)
+        except TypeError:
+            # orjson rechaza lo que la stdlib acepta (enteros de más de 64 bits, subclases raras)
+            return _std_dumps(obj)
+
+    def dumps_line(obj) -> bytes:
+        """Un frame JSON-RPC: el objeto serializado terminado en "\\n"."""
+        try:
+            return orjson.dumps(obj, option=_OPTS | orjson.OPT_APPEND_NEWLINE)
+        except TypeError:
+            return _std_dumps(obj) + b"\n"
+
+    def loads(data):
+        """Acepta bytes, bytearray, memoryview o str."""
+        return orjson.loads(data)
+else:
+    dumps = _std_dumps
+
+    def dumps_line(obj) -> bytes:
+        """Un frame JSON-RPC: el objeto serializado terminado en "\\n"."""
+        return _std_dumps(obj) + b"\n"
+
+    def loads(data):
+        """Acepta bytes, bytearray o str."""
+        if isinstance(data, memoryview):
+            data = bytes(data)
+        return json.loads(data)
+
+def dumps_str(obj) -> str:
+    return dumps(obj).decode("utf-8")
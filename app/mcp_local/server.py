@@ -1,52 +1,367 @@
-import sys, json, ast
-from typing import Dict, Any
+import sys, os, ast, time, heapq, queue, signal, fnmatch, argparse, hashlib, threading, multiprocessing
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Callable, Dict, Any, Iterator, List, Optional
 
-def jprint(obj): 
-    sys.stdout.write(json.dumps(obj, ensure_ascii=False) + "\n"); sys.stdout.flush()
+# Permite importar app.* al ejecutarse como script (python app/mcp_local/server.py)
+ROOT = Path(__file__).resolve().parents[2]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
 
-def ok(id, result): jprint({"jsonrpc":"2.0","id":id,"result":result})
-def err(id, code, message): jprint({"jsonrpc":"2.0","id":id,"error":{"code":code,"message":message}})
+from app.json_codec import dumps, dumps_line, loads
+
+# Versión del motor de análisis: forma parte de la clave de caché, así un cambio
+# en el algoritmo no sirve resultados viejos persistidos en disco.
+ENGINE_VERSION = "2"
+
+def jprint(obj):
+    sys.stdout.buffer.write(dumps_line(obj)); sys.stdout.buffer.flush()
+
+def ok(id, result): return {"jsonrpc":"2.0","id":id,"result":result}
+def err(id, code, message): return {"jsonrpc":"2.0","id":id,"error":{"code":code,"message":message}}
+
+# Nodos que suman un camino de decisión (BoolOp suma len(values)-1)
+_DECISION_NODES = (ast.If, ast.For, ast.While, ast.With, ast.Try, ast.IfExp, ast.Match, ast.ExceptHandler)
+_FUNCTION_NODES = (ast.FunctionDef, ast.AsyncFunctionDef)
+
+def _risk(value: float) -> str:
+    return "low" if value <= 5 else ("medium" if value <=10 else "high")
+
+class _Scope:
+    __slots__ = ("node", "kind", "qualname", "depth", "decisions", "methods", "direct_methods")
+
+    def __init__(self, node: ast.AST, kind: str, qualname: str, depth: int):
+        self.node = node
+        self.kind = kind
+        self.qualname = qualname
+        self.depth = depth
+        self.decisions = 0       # puntos de decisión en todo el subárbol (incluye scopes anidados)
+        self.methods: List[int] = []
+        self.direct_methods = {id(m) for m in node.body if isinstance(m, _FUNCTION_NODES)} if kind == "class" else ()
+
+    @property
+    def complexity(self) -> int:
+        return 1 + self.decisions
+
+    @property
+    def complexity_avg(self) -> float:
+        return sum(self.methods)/len(self.methods) if self.methods else 1
+
+class ComplexityVisitor(ast.NodeVisitor):
+    """Calcula en un solo recorrido la complejidad de cada función, método, función
+    anidada y clase. La complejidad de una función incluye la de lo anidado en ella
+    (igual que un ast.walk sobre la función); la de una clase es el promedio de sus métodos."""
+
+    def __init__(self):
+        self.stack: List[_Scope] = []
+        self.scopes: List[_Scope] = []   # en orden de aparición en el código
+        self.total = 0                   # puntos de decisión de todo lo visitado
+        self._methods: Dict[type, Any] = {}
+
+    def visit(self, node: ast.AST):
+        # Despacho cacheado por tipo: NodeVisitor.visit hace un getattr por nodo
+        meth = self._methods.get(type(node))
+        if meth is None:
+            meth = self._methods[type(node)] = getattr(self, "visit_" + type(node).__name__, self.generic_visit)
+        meth(node)
+
+    def generic_visit(self, node: ast.AST):
+        for field in node._fields:
+            value = getattr(node, field, None)
+            if type(value) is list:
+                for item in value:
+                    if isinstance(item, ast.AST):
+                        self.visit(item)
+            elif isinstance(value, ast.AST):
+                self.visit(value)
+
+    def _decision(self, node: ast.AST, n: int = 1):
+        self.total += n
+        if self.stack:
+            self.stack[-1].decisions += n
+        self.generic_visit(node)
+
+    def visit_BoolOp(self, node: ast.BoolOp):
+        self._decision(node, max(0, len(node.values)-1))
+
+    visit_If = visit_For = visit_While = visit_With = visit_Try = visit_IfExp = visit_Match = \
+        visit_ExceptHandler = _decision
+
+    def _scope(self, node: ast.AST, kind: str):
+        parent = self.stack[-1] if self.stack else None
+        if kind == "function" and parent is not None and id(node) in parent.direct_methods:
+            kind = "method"
+        qualname = f"{parent.qualname}.{node.name}" if parent else node.name
+        scope = _Scope(node, kind, qualname, len(self.stack))
+        self.scopes.append(scope)
+        self.stack.append(scope)
+        self.generic_visit(node)
+        self.stack.pop()
+        if parent is not None:
+            parent.decisions += scope.decisions
+            if kind == "method":
+                parent.methods.append(scope.complexity)
+
+    def visit_FunctionDef(self, node: ast.AST):
+        self._scope(node, "function")
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_ClassDef(self, node: ast.ClassDef):
+        self._scope(node, "class")
 
 def cyclomatic_complexity(node: ast.AST) -> int:
-    count = 1
-    for n in ast.walk(node):
-        if isinstance(n, (ast.If, ast.For, ast.While, ast.With, ast.Try, ast.IfExp, ast.Match)):
-            count += 1
-        elif isinstance(n, ast.BoolOp):
-            count += max(0, len(n.values)-1)
-        elif isinstance(n, ast.ExceptHandler):
-            count += 1
-    return count
+    v = ComplexityVisitor()
+    v.visit(node)
+    return 1 + v.total
 
 def analyze_code(src: str) -> Dict[str, Any]:
     tree = ast.parse(src)
-    report = []
-    for n in tree.body:
-        if isinstance(n, (ast.FunctionDef, ast.AsyncFunctionDef)):
-            comp = cyclomatic_complexity(n)
-            report.append({
-                "name": n.name,
-                "lineno": n.lineno,
-                "complexity": comp,
-                "risk": "low" if comp <= 5 else ("medium" if comp <=10 else "high")
-            })
-        elif isinstance(n, ast.ClassDef):
-            methods = [m for m in n.body if isinstance(m, (ast.FunctionDef, ast.AsyncFunctionDef))]
-            if methods:
-                avg = sum(cyclomatic_complexity(m) for m in methods)/len(methods)
-            else:
-                avg = 1
-            report.append({
-                "name": f"class {n.name}",
-                "lineno": n.lineno,
-                "complexity_avg": round(avg,2),
-                "risk": "low" if avg <= 5 else ("medium" if avg <=10 else "high")
-            })
-    return {"summary": report, "total_items": len(report)}
+    v = ComplexityVisitor()
+    v.visit(tree)
+    top = {id(n) for n in tree.body}
+    report, scopes = [], []
+    for sc in v.scopes:
+        if sc.kind == "class":
+            avg = sc.complexity_avg
+            item = {"name": f"class {sc.node.name}", "lineno": sc.node.lineno,
+                    "complexity_avg": round(avg,2), "risk": _risk(avg)}
+            scopes.append({"name": sc.qualname, "kind": "class", "lineno": sc.node.lineno, "depth": sc.depth,
+                           "complexity_avg": round(avg,2), "risk": _risk(avg)})
+        else:
+            comp = sc.complexity
+            item = {"name": sc.node.name, "lineno": sc.node.lineno, "complexity": comp, "risk": _risk(comp)}
+            scopes.append({"name": sc.qualname, "kind": sc.kind, "lineno": sc.node.lineno, "depth": sc.depth,
+                           "complexity": comp, "risk": _risk(comp)})
+        if id(sc.node) in top:
+            report.append(item)
+    # `summary` conserva el formato histórico (solo nivel superior); `scopes` lista todo
+    return {"summary": report, "total_items": len(report), "scopes": scopes}
+
+class ResultCache:
+    """Caché LRU de resultados de analyze_code, direccionada por sha256 del código.
+
+    Acotada por `max_bytes` (tamaño del resultado serializado). Si `persist_dir` está
+    definido, cada resultado se guarda también en disco y sobrevive a reinicios.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, persist_dir: Optional[str] = None):
+        self.max_bytes = max_bytes
+        self.persist_dir = Path(persist_dir) if persist_dir else None
+        self.entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.bytes = 0
+        self.hits = self.misses = self.evictions = self.disk_hits = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(src: str) -> str:
+        return hashlib.sha256(f"{ENGINE_VERSION}\0{src}".encode("utf-8")).hexdigest()
+
+    def _disk_path(self, key: str) -> Path:
+        return self.persist_dir / key[:2] / f"{key}.json"
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            hit = self.entries.get(key)
+            if hit is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return hit[0]
+        if self.persist_dir:
+            try:
+                raw = self._disk_path(key).read_bytes()
+                result = loads(raw)
+            except (OSError, ValueError):
+                result = None
+            if result is not None:
+                self._insert(key, result, len(raw))
+                with self._lock:
+                    self.hits += 1
+                    self.disk_hits += 1
+                return result
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, result: Dict[str, Any]):
+        raw = dumps(result)
+        self._insert(key, result, len(raw))
+        if self.persist_dir:
+            path = self._disk_path(key)
+            try:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                tmp = path.with_suffix(f".{os.getpid()}.tmp")
+                tmp.write_bytes(raw)
+                os.replace(tmp, path)
+            except OSError:
+                pass  # la caché en disco es best-effort
+
+    def _insert(self, key: str, result: Dict[str, Any], size: int):
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[1]
+            self.entries[key] = (result, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, freed) = self.entries.popitem(last=False)
+                self.bytes -= freed
+                self.evictions += 1
 
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": True,
+                "entries": len(self.entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "persist_dir": str(self.persist_dir) if self.persist_dir else None,
+            }
+
+# Caché del proceso servidor; main() la configura (los procesos del pool no la usan)
+CACHE: Optional[ResultCache] = None
+
+# --- Análisis de un árbol de directorios (code/complexity/analyze_path) ---
+
+DEFAULT_EXCLUDE = [".git", ".hg", ".svn", "__pycache__", ".venv", "venv", "node_modules", ".tox", ".mypy_cache"]
+WORKERS = os.cpu_count() or 1
+_path_pool: Optional[ProcessPoolExecutor] = None
+_path_pool_lock = threading.Lock()
+
+def new_process_pool(workers: int) -> ProcessPoolExecutor:
+    # Sin fork: el hilo lector puede estar bloqueado en stdin.readline() con el lock del buffer
+    # tomado, y un hijo forkeado en ese momento se cuelga al cerrar su stdin.
+    method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(method))
+
+def _get_path_pool() -> ProcessPoolExecutor:
+    global _path_pool
+    with _path_pool_lock:
+        if _path_pool is None:
+            _path_pool = new_process_pool(WORKERS)
+        return _path_pool
+
+def _matches(rel: str, name: str, patterns: List[str]) -> bool:
+    return any(fnmatch.fnmatch(rel, p) or fnmatch.fnmatch(name, p) for p in patterns)
+
+def iter_source_files(root: str, include: List[str], exclude: List[str]) -> Iterator[tuple]:
+    """Recorre `root` de forma perezosa (os.scandir + pila), sin materializar la lista de archivos."""
+    stack = [root]
+    while stack:
+        current = stack.pop()
+        try:
+            it = os.scandir(current)
+        except OSError:
+            continue
+        with it:
+            for entry in it:
+                rel = os.path.relpath(entry.path, root).replace(os.sep, "/")
+                if _matches(rel, entry.name, exclude):
+                    continue
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file() and _matches(rel, entry.name, include):
+                        yield entry.path, rel
+                except OSError:
+                    continue
+
+def _analyze_file(path: str, rel: str, max_bytes: int) -> Dict[str, Any]:
+    # Corre en el pool: lee y analiza un archivo (bytes: ast.parse respeta el encoding declarado)
+    try:
+        if os.path.getsize(path) > max_bytes:
+            return {"path": rel, "skipped": f"más de {max_bytes} bytes"}
+        with open(path, "rb") as f:
+            res = analyze_code(f.read())
+        return {"path": rel, "summary": res["summary"], "scopes": res["scopes"]}
+    except Exception as e:
+        return {"path": rel, "error": f"{type(e).__name__}: {e}"}
+
+def analyze_path(args: Dict[str, Any], emit: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    """Analiza todos los archivos de un árbol en paralelo (pool de procesos).
+
+    Cada resultado por archivo se emite como notificación (si hay `emit`) y se descarta:
+    en memoria solo quedan los agregados, el top-N de funciones y una ventana acotada de trabajos.
+    """
+    root = args.get("path")
+    if not isinstance(root, str) or not os.path.isdir(root):
+        raise ValueError("arguments.path must be an existing directory")
+    include = args.get("include") or ["*.py"]
+    exclude = args.get("exclude", DEFAULT_EXCLUDE)
+    top_n = int(args.get("top", 20))
+    max_bytes = int(args.get("max_file_bytes", 2 * 1024 * 1024))
+    stream = bool(args.get("stream", True)) and emit is not None
+
+    pool = _get_path_pool()
+    window = WORKERS * 4
+    in_flight = set()
+    worst: List[tuple] = []
+    histogram = {"low": 0, "medium": 0, "high": 0}
+    totals = {"files_analyzed": 0, "files_failed": 0, "files_skipped": 0, "functions": 0, "classes": 0}
+    errors: List[Dict[str, str]] = []
+    seq = 0
+    t0 = time.perf_counter()
+
+    def collect(fut: Future):
+        nonlocal seq
+        res = fut.result()
+        if stream:
+            emit(res)
+        if "skipped" in res:
+            totals["files_skipped"] += 1
+            return
+        if "error" in res:
+            totals["files_failed"] += 1
+            if len(errors) < 50:
+                errors.append(res)
+            return
+        totals["files_analyzed"] += 1
+        for sc in res["scopes"]:
+            if sc["kind"] == "class":
+                totals["classes"] += 1
+                continue
+            totals["functions"] += 1
+            histogram[sc["risk"]] += 1
+            seq += 1
+            item = (sc["complexity"], seq, {"path": res["path"], **sc})
+            if len(worst) < top_n:
+                heapq.heappush(worst, item)
+            elif top_n > 0 and item[0] > worst[0][0]:
+                heapq.heapreplace(worst, item)
+
+    for path, rel in iter_source_files(root, include, exclude):
+        if len(in_flight) >= window:
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for fut in done:
+                collect(fut)
+        in_flight.add(pool.submit(_analyze_file, path, rel, max_bytes))
+    for fut in in_flight:
+        collect(fut)
+
+    return {
+        "root": os.path.abspath(root),
+        **totals,
+        "risk_histogram": histogram,
+        "worst": [item for _, _, item in sorted(worst, key=lambda t: (-t[0], t[1]))],
+        "errors": errors,
+        "elapsed_s": round(time.perf_counter() - t0, 3),
+    }
+
+# annotations (MCP): readOnlyHint + idempotentHint = el host puede cachear el resultado.
+# analyze_path no es idempotente para el host: un resultado cacheado no re-emite las notificaciones por archivo.
 TOOLS = [{
     "name": "code/complexity/analyze",
     "description": "Analiza complejidad ciclomática de un string de código Python.",
+    "annotations": {"readOnlyHint":True, "idempotentHint":True},
     "inputSchema": {
         "type":"object",
         "properties": {
@@ -54,42 +369,297 @@ TOOLS = [{
         },
         "required": ["code"]
     }
+}, {
+    "name": "code/complexity/analyze_path",
+    "description": ("Analiza todos los archivos Python bajo un directorio, en paralelo. "
+                    "Emite una notificación 'notifications/complexity/file' por archivo y "
+                    "devuelve un resumen agregado (peores funciones, histograma de riesgo)."),
+    "annotations": {"readOnlyHint":True, "idempotentHint":False},
+    "inputSchema": {
+        "type":"object",
+        "properties": {
+            "path": {"type":"string", "description":"Directorio raíz"},
+            "include": {"type":"array", "items":{"type":"string"}, "description":"Globs a incluir (por defecto *.py)"},
+            "exclude": {"type":"array", "items":{"type":"string"}, "description":"Globs a excluir (dirs o archivos)"},
+            "top": {"type":"integer", "description":"Cuántas de las peores funciones devolver (20)"},
+            "max_file_bytes": {"type":"integer", "description":"Omitir archivos más grandes que esto"},
+            "stream": {"type":"boolean", "description":"Emitir resultados por archivo (true)"}
+        },
+        "required": ["path"]
+    }
+}, {
+    "name": "code/complexity/cache_stats",
+    "description": "Estadísticas de la caché de resultados (hits, misses, evictions, hit_rate).",
+    "annotations": {"readOnlyHint":True, "idempotentHint":False},
+    "inputSchema": {"type":"object", "properties": {}}
 }]
 
-def handle_tools_call(params):
+def _analyze_source(params) -> str:
+    code = params.get("arguments", {}).get("code","")
+    if not isinstance(code, str) or not code.strip():
+        raise ValueError("arguments.code must be non-empty string")
+    return code
+
+def handle_tools_call(params, cache: Optional[ResultCache] = None, emit=None):
     tool = params.get("name")
     if tool == "code/complexity/analyze":
-        code = params.get("arguments", {}).get("code","")
-        if not isinstance(code, str) or not code.strip():
-            raise ValueError("arguments.code must be non-empty string")
-        return analyze_code(code)
+        code = _analyze_source(params)
+        if cache is None:
+            return analyze_code(code)
+        key = cache.key(code)
+        res = cache.get(key)
+        if res is None:
+            res = analyze_code(code)
+            cache.put(key, res)
+        return res
+    if tool == "code/complexity/analyze_path":
+        return analyze_path(params.get("arguments", {}), emit)
+    if tool == "code/complexity/cache_stats":
+        return cache.stats() if cache else {"enabled": False}
     raise ValueError(f"Unknown tool {tool}")
 
-def main():
-    while True:
-        line = sys.stdin.readline()
-        if not line:
-            break
+def handle_request(req, cache: Optional[ResultCache] = None, emit=None):
+    """Procesa un request JSON-RPC; devuelve la respuesta, o None si es una notificación (sin id).
+
+    `emit(obj)` escribe mensajes intermedios (notificaciones de progreso) antes de la respuesta.
+    """
+    if not isinstance(req, dict):
+        return err(None, -32600, "Invalid Request")
+    rid = req.get("id")
+    method = req.get("method")
+    params = req.get("params", {})
+
+    try:
+        if method == "initialize":
+            resp = ok(rid, {"protocolVersion":"2024-08-01","server":"local-complexity"})
+        elif method == "ping":
+            resp = ok(rid, {})  # health check del supervisor del host
+        elif method == "tools/list":
+            resp = ok(rid, {"tools": TOOLS})
+        elif method == "tools/call":
+            notify = None
+            if emit is not None and "id" in req:
+                notify = lambda data: emit({"jsonrpc":"2.0","method":"notifications/complexity/file",
+                                            "params":{"requestId": rid, **data}})
+            res = handle_tools_call(params, cache, notify)
+            resp = ok(rid, {"content": res})
+        else:
+            resp = err(rid, -32601, f"Method not found: {method}")
+    except Exception as e:
+        resp = err(rid, -32000, str(e))
+    return resp if "id" in req else None
+
+def handle_message(msg, cache: Optional[ResultCache] = None, emit=None):
+    """Un frame puede ser un request o un batch (array); el batch se responde con un array."""
+    if isinstance(msg, list):
+        if not msg:
+            return err(None, -32600, "Invalid Request: empty batch")
+        out = [r for r in (handle_request(m, cache, emit) for m in msg) if r is not None]
+        return out or None
+    return handle_request(msg, cache, emit)
+
+def _work(req) -> Optional[bytes]:
+    # Corre en un proceso del pool: devuelve la respuesta ya serializada (menos pickling de vuelta)
+    resp = handle_request(req)
+    return None if resp is None else dumps(resp)
+
+def _work_analyze(req):
+    # Igual que _work, pero devuelve también el resultado para la caché del proceso padre
+    resp = handle_request(req)
+    if resp is None or "result" not in resp:
+        return (None if resp is None else dumps(resp)), None
+    return dumps(resp), resp["result"]["content"]
+
+def _done(value) -> Future:
+    fut = Future()
+    fut.set_result(value)
+    return fut
+
+class ConcurrentServer:
+    """Modo concurrente: el lector despacha `tools/call` a un pool de procesos y las
+    respuestas se escriben según terminan (fuera de orden, emparejadas por `id`)
+    a través de un único hilo escritor."""
+
+    def __init__(self, workers: int, cache: Optional[ResultCache] = None):
+        self.pool = new_process_pool(workers)
+        self.threads = ThreadPoolExecutor(max_workers=2)  # analyze_path: orquesta su propio pool
+        self.cache = cache
+        self.running: dict = {}  # id -> Future de los tools/call en curso, para $/cancelRequest
+        self.out: "queue.Queue[Optional[bytes]]" = queue.Queue()
+        self.writer = threading.Thread(target=self._write_loop, daemon=True)
+        self.writer.start()
+
+    def _write_loop(self):
+        while True:
+            lines = [self.out.get()]
+            while lines[-1] is not None:
+                try:
+                    lines.append(self.out.get_nowait())
+                except queue.Empty:
+                    break
+            done = lines[-1] is None
+            lines = [l for l in lines if l is not None]
+            if lines:
+                sys.stdout.buffer.write(b"\n".join(lines) + b"\n"); sys.stdout.buffer.flush()
+            if done:
+                return
+
+    def _inline(self, req) -> Future:
+        resp = handle_request(req, self.cache)
+        return _done(None if resp is None else dumps(resp))
+
+    def _streaming(self, req) -> Optional[bytes]:
+        # Las notificaciones por archivo pasan por el mismo escritor, antes de la respuesta final
+        emit = lambda obj: self.out.put(dumps(obj))
+        resp = handle_request(req, self.cache, emit)
+        return None if resp is None else dumps(resp)
+
+    def _submit(self, req) -> Future:
+        if not (isinstance(req, dict) and req.get("method") == "tools/call"):
+            return self._inline(req)  # initialize / ping / tools/list / errores: baratos, se resuelven en el lector
+        params = req.get("params") or {}
+        name = params.get("name") if isinstance(params, dict) else None
+        if name == "code/complexity/cache_stats":
+            return self._inline(req)
+        if name == "code/complexity/analyze_path":
+            return self.threads.submit(self._streaming, req)
+        if self.cache is None or name != "code/complexity/analyze":
+            return self.pool.submit(_work, req)
+        # La caché vive en este proceso: hits sin pasar por el pool, misses se guardan al volver
         try:
-            req = json.loads(line)
+            key = self.cache.key(_analyze_source(params))
         except Exception:
-            continue
-        rid = req.get("id")
-        method = req.get("method")
-        params = req.get("params", {})
+            return self._inline(req)
+        res = self.cache.get(key)
+        if res is not None:
+            return _done(dumps(ok(req["id"], {"content": res})) if "id" in req else None)
+        out = Future()
+        def fill(f):
+            if f.cancelled():  # $/cancelRequest antes de que un worker lo tomara
+                out.cancel()
+                return
+            try:
+                line, content = f.result()
+            except Exception as e:
+                out.set_exception(e)
+                return
+            if content is not None:
+                self.cache.put(key, content)
+            out.set_result(line)
+        inner = self.pool.submit(_work_analyze, req)
+        out.inner = inner  # lo que hay que cancelar es el trabajo en el pool
+        inner.add_done_callback(fill)
+        return out
+
+    def _cancel(self, rid):
+        # Solo se puede cancelar lo que sigue en cola; lo que ya corre en un worker termina
+        # y su respuesta se descarta en el cliente
+        fut = self.running.get(rid)
+        if fut is not None:
+            getattr(fut, "inner", fut).cancel()
 
+    @staticmethod
+    def _line(fut: Future, req) -> Optional[bytes]:
+        if fut.cancelled():
+            return dumps(err(req.get("id"), -32800, "Request cancelled")) if "id" in req else None
         try:
-            if method == "initialize":
-                ok(rid, {"protocolVersion":"2024-08-01","server":"local-complexity"})
-            elif method == "tools/list":
-                ok(rid, {"tools": TOOLS})
-            elif method == "tools/call":
-                res = handle_tools_call(params)
-                ok(rid, {"content": res})
-            else:
-                err(rid, -32601, f"Method not found: {method}")
-        except Exception as e:
-            err(rid, -32000, str(e))
+            return fut.result()
+        except Exception as e:  # p.ej. BrokenProcessPool
+            if isinstance(req, dict) and "id" in req:
+                return dumps(err(req.get("id"), -32000, str(e)))
+            return None
+
+    def dispatch(self, msg):
+        if isinstance(msg, list) and msg:
+            futs = [self._submit(m) for m in msg]
+            remaining = [len(futs)]
+            lock = threading.Lock()
+            def on_done(_):
+                with lock:
+                    remaining[0] -= 1
+                    if remaining[0]:
+                        return
+                lines = [l for l in (self._line(f, m) for f, m in zip(futs, msg)) if l is not None]
+                if lines:
+                    self.out.put(b"[" + b",".join(lines) + b"]")
+            for f in futs:
+                f.add_done_callback(on_done)
+            return
+        if not isinstance(msg, dict):
+            resp = handle_message(msg, self.cache)
+            if resp is not None:
+                self.out.put(dumps(resp))
+            return
+        if msg.get("method") == "$/cancelRequest":
+            self._cancel((msg.get("params") or {}).get("id"))
+            return
+        fut = self._submit(msg)
+        rid = msg.get("id")
+        if rid is not None and not fut.done():
+            self.running[rid] = fut
+        def on_single(f):
+            self.running.pop(rid, None)
+            line = self._line(f, msg)
+            if line is not None:
+                self.out.put(line)
+        fut.add_done_callback(on_single)
+
+    def close(self, cancel: bool = False):
+        # cancel=True (SIGTERM): descarta lo encolado y solo espera a lo que ya corre
+        self.threads.shutdown(wait=True, cancel_futures=cancel)
+        self.pool.shutdown(wait=True, cancel_futures=cancel)
+        self.out.put(None)
+        self.writer.join()
+
+def _on_sigterm(signum, frame):
+    # Convierte SIGTERM en SystemExit para que main() cierre los pools: sus procesos
+    # (y el forkserver) heredan stdout/stderr, y si quedan huérfanos el cliente nunca ve EOF.
+    raise SystemExit(128 + signum)
+
+def main():
+    ap = argparse.ArgumentParser(description="Servidor MCP local (complejidad ciclomática) por STDIO")
+    ap.add_argument("--concurrent", action="store_true",
+                    help="Procesa tools/call en un pool de procesos y responde fuera de orden")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                    help="Procesos del pool en modo concurrente (por defecto, núcleos disponibles)")
+    ap.add_argument("--cache-mb", type=float, default=float(os.getenv("MCP_COMPLEXITY_CACHE_MB", 64)),
+                    help="Memoria máxima de la caché de resultados en MB (0 la desactiva)")
+    ap.add_argument("--cache-dir", default=os.getenv("MCP_COMPLEXITY_CACHE_DIR"),
+                    help="Directorio para persistir la caché entre reinicios")
+    args = ap.parse_args()
+    global CACHE, WORKERS, _path_pool
+    WORKERS = max(1, args.workers)
+    if args.cache_mb > 0:
+        CACHE = ResultCache(int(args.cache_mb * 1024 * 1024), args.cache_dir)
+    server = ConcurrentServer(args.workers, CACHE) if args.concurrent else None
+    if server:
+        _path_pool = server.pool  # analyze_path comparte el pool del modo concurrente
+    signal.signal(signal.SIGTERM, _on_sigterm)
+
+    terminated = False
+    try:
+        while True:
+            line = sys.stdin.buffer.readline()
+            if not line:
+                break
+            try:
+                msg = loads(line)
+            except Exception:
+                continue
+            if server:
+                server.dispatch(msg)
+                continue
+            resp = handle_message(msg, CACHE, jprint)
+            if resp is not None:
+                jprint(resp)
+    except (SystemExit, KeyboardInterrupt):
+        terminated = True
+        raise
+    finally:
+        if server:
+            server.close(cancel=terminated)
+        elif _path_pool is not None:
+            _path_pool.shutdown(wait=True, cancel_futures=terminated)
 
 if __name__ == "__main__":
     main()
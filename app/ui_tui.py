@@ -1,39 +1,33 @@
-import sys, asyncio
+# 🔧 Nota: en Windows el loop por defecto (Proactor) es el único que soporta
+# asyncio.create_subprocess_exec; no forzar WindowsSelectorEventLoopPolicy.
 
-# 🔧 Fix: usar loop compatible con subprocess en Windows
-if sys.platform.startswith("win"):
-    asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
-
-import os, json, asyncio, time
-from pathlib import Path
+import os, time, asyncio
 from dotenv import load_dotenv
-from openai import OpenAI
-from app.host.mcp_client import MCPClientManager
-from app.host.tool_router import OPENAI_TOOLS
+from openai import OpenAI, AsyncOpenAI
+from app.host.daemon import open_manager
+from app.host.tool_catalog import ToolCatalog
+from app.host.tool_executor import execute_tool_calls, ToolCallExecutor
+from app.host.llm_stream import STREAM, stream_chat
+from app.host.memory import ConversationMemory
 from rich.console import Console
 from rich.panel import Panel
 from rich.markdown import Markdown
 from rich.table import Table
+from rich.live import Live
 
 load_dotenv()
 
 MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
 client = OpenAI()
+aclient = AsyncOpenAI()
 console = Console()
 
-def save_llm_log(direction, payload):
-    Path("logs").mkdir(exist_ok=True, parents=True)
-    with open(Path("logs")/f"llm-{time.strftime('%Y%m%d')}.jsonl","a",encoding="utf-8") as f:
-        rec = {"ts": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
-               "direction": direction, **payload}
-        f.write(json.dumps(rec, ensure_ascii=False) + "\n")
-
 async def start_manager():
     import json
     cfg = json.load(open("app/host/servers.config.json","r",encoding="utf-8"))
-    mgr = MCPClientManager(cfg)
-    await mgr.start_all()
-    return mgr
+    # Con el daemon corriendo (python -m app.host.daemon) se comparten sus servidores;
+    # si no, este proceso lanza los suyos
+    return await open_manager(cfg, session="tui")
 
 def header():
     t = Table.grid(expand=True)
@@ -41,84 +35,145 @@ def header():
     t.add_row("[bold]Proyecto MCP – Terminal UI[/bold]", f"[dim]Modelo:[/dim] {MODEL}")
     return Panel(t, style="cyan", padding=(1,2))
 
+class StreamPanel:
+    """Panel "Asistente" que se va llenando con el stream. Re-parsear el Markdown en cada token
+    sería cuadrático, así que el render se limita a ~15 actualizaciones por segundo."""
+
+    def __init__(self, live):
+        self.live = live
+        self.parts = []
+        self.last = 0.0
+
+    def __call__(self, text):
+        self.parts.append(text)
+        now = time.monotonic()
+        if now - self.last >= 1 / 15:
+            self.last = now
+            self.flush()
+
+    def flush(self):
+        self.live.update(Panel(Markdown("".join(self.parts) or "_(sin contenido)_"), title="Asistente"))
+
+async def stream_reply(memory, **kwargs):
+    with Live(Panel("[dim]…[/dim]", title="Asistente"), console=console, refresh_per_second=15) as live:
+        panel = StreamPanel(live)
+        msg = await stream_chat(aclient, log=memory.log, on_text=panel, **kwargs)
+        if msg["content"] or not msg.get("tool_calls"):
+            panel.flush()
+        else:
+            live.update(Panel("[dim]Invocando herramientas MCP...[/dim]", style="blue"))
+    return msg
+
+async def stream_turn(mgr, memory, catalog):
+    # Cada tool_call se envía al executor en cuanto sus argumentos están completos
+    ex = ToolCallExecutor(mgr, catalog=catalog)
+    tools = await catalog.openai_tools()
+    messages = memory.window()
+    memory.log_send()
+    msg = await stream_reply(memory, on_tool_call=ex.submit, model=MODEL, messages=messages,
+                             tools=tools, tool_choice="auto", temperature=0.2)
+    if msg.get("tool_calls"):
+        tool_msgs = await ex.gather()
+        memory.add(msg)
+        memory.extend(tool_msgs)
+        messages = memory.window()
+        memory.log_send()
+        msg = await stream_reply(memory, model=MODEL, messages=messages, temperature=0.2)
+    memory.add({"role":"assistant","content":msg["content"]})
+
 async def chat_loop():
     mgr = await start_manager()
-    messages = [{
-        "role": "system",
-        "content": ("You are an MCP-capable assistant. "
-                    "If a user asks to read/write files, analyze code, or run repo actions, "
-                    "use the 'mcp_call' tool with the appropriate server and method.")
-    }]
+    catalog = ToolCatalog(mgr)
+    memory = ConversationMemory("You are an MCP-capable assistant. "
+                                "If a user asks to read/write files, analyze code, or run repo actions, "
+                                "use the MCP tools provided (one function per tool).")
 
     console.print(header())
-    console.print(Panel("Comandos: [bold]/exit[/bold] salir · [bold]/tools[/bold] listar herramientas.", style="green"))
+    if getattr(mgr, "session", None):
+        console.print(f"[dim]Servidores MCP del daemon · sesión {mgr.session}[/dim]")
+    console.print(Panel("Comandos: [bold]/exit[/bold] salir · [bold]/tools[/bold] listar herramientas · [bold]/servers[/bold] estado de servidores · [bold]/stats[/bold] métricas.", style="green"))
 
     while True:
         user = console.input("[bold magenta]Tú >[/bold magenta] ").strip()
         if user.lower() in ("exit","/exit","quit"): 
             console.print("[dim]Saliendo...[/dim]")
+            memory.flush()
+            await mgr.close()
             break
+        if user.lower() in ("/servers","servers"):
+            t = Table(show_header=True, header_style="bold")
+            t.add_column("Servidor"); t.add_column("Estado"); t.add_column("Arranque (ms)", justify="right")
+            t.add_column("Reinicios", justify="right"); t.add_column("En vuelo / cola", justify="right")
+            t.add_column("Último error", overflow="fold")
+            for name, st in mgr.status().items():
+                q = st["queue"]
+                queue = f"{q['inflight']}/{q['max_inflight']} · máx {q['queue_ms_max']:.0f} ms" if q else "-"
+                t.add_row(name, st["state"], str(st["start_ms"] or "-"), str(st["restarts"]), queue, st["last_error"] or "")
+            console.print(Panel(t, title="Servidores MCP"))
+            continue
+        if user.lower() in ("/stats","stats"):
+            snap = await mgr.metrics()
+            t = Table(show_header=True, header_style="bold")
+            for col in ("Servidor", "Tool"):
+                t.add_column(col)
+            for col in ("Llamadas", "Errores", "avg ms", "p50 ms", "p95 ms", "/min"):
+                t.add_column(col, justify="right")
+            for r in snap["tools"]:
+                errors = f"{r['errors']} ({r['error_rate']:.0%})" if r["errors"] else "0"
+                t.add_row(r["server"], r["tool"], str(r["calls"]), errors, f"{r['avg_ms']:.1f}",
+                          f"{r['p50_ms']:.1f}", f"{r['p95_ms']:.1f}", f"{r['per_min']:.1f}")
+            inflight = ", ".join(f"{g['server']}={g['value']}" for g in snap["gauges"].get("mcp_inflight_requests", []))
+            console.print(Panel(t, title=f"Métricas · {snap['uptime_s']:.0f}s", subtitle=f"en vuelo: {inflight or '-'}"))
+            continue
         if user.lower() in ("/tools","tools"):
-            tools = await mgr.call("local-complexity", "tools/list", {})
-            console.print(Panel(Markdown(f"### Tools Locales\n```json\n{json.dumps(tools, indent=2, ensure_ascii=False)}\n```"), title="tools/list"))
+            await catalog.refresh(force=True)
+            t = Table(show_header=True, header_style="bold")
+            t.add_column("Servidor"); t.add_column("Tool"); t.add_column("Función"); t.add_column("Descripción", overflow="fold")
+            for srv, tool, fn, desc in catalog.summary():
+                t.add_row(srv, tool, fn or "[dim](oculta)[/dim]", desc)
+            console.print(Panel(t, title="tools/list"))
             continue
 
-        messages.append({"role":"user","content":user})
+        memory.add({"role":"user","content":user})
+
+        if STREAM:
+            await stream_turn(mgr, memory, catalog)
+            continue
 
-        save_llm_log("send", {"messages": messages})
+        messages = memory.window()
+        memory.log_send()
         r = client.chat.completions.create(
             model=MODEL,
             messages=messages,
-            tools=OPENAI_TOOLS,
+            tools=await catalog.openai_tools(),
             tool_choice="auto",
             temperature=0.2
         )
-        save_llm_log("recv", {"raw": r.model_dump()})
+        memory.log("recv", {"raw": r.model_dump()})
         msg = r.choices[0].message
 
-        tool_msgs = []
         if msg.tool_calls:
             console.print(Panel("[dim]Invocando herramientas MCP...[/dim]", style="blue"))
-            for tc in msg.tool_calls:
-                if tc.type != "function": continue
-                fn = tc.function.name
-                args = json.loads(tc.function.arguments or "{}")
-                if fn != "mcp_call":
-                    tool_msgs.append({"role": "tool", "tool_call_id": tc.id,
-                                      "name": fn, "content": f"Unsupported tool {fn}"})
-                    continue
-                try:
-                    result = await mgr.call(args["server"], args["method"], args.get("params", {}))
-                    tool_msgs.append({
-                        "role": "tool",
-                        "tool_call_id": tc.id,
-                        "name": "mcp_call",
-                        "content": json.dumps({"ok": True, "result": result}, ensure_ascii=False)
-                    })
-                except Exception as e:
-                    tool_msgs.append({
-                        "role": "tool",
-                        "tool_call_id": tc.id,
-                        "name": "mcp_call",
-                        "content": json.dumps({"ok": False, "error": str(e)}, ensure_ascii=False)
-                    })
-
-            messages.append({"role":"assistant","content":msg.content or "", "tool_calls": msg.tool_calls})
-            messages.extend(tool_msgs)
-
-            save_llm_log("send", {"messages": messages[-12:]})
+            # Todas las tool_calls del turno en paralelo; respuestas en el orden original
+            tool_msgs = await execute_tool_calls(mgr, msg.tool_calls, catalog=catalog)
+
+            memory.add({"role":"assistant","content":msg.content or "", "tool_calls": msg.tool_calls})
+            memory.extend(tool_msgs)
+
+            messages = memory.window()
+            memory.log_send()
             r2 = client.chat.completions.create(
                 model=MODEL,
                 messages=messages,
                 temperature=0.2
             )
-            save_llm_log("recv", {"raw": r2.model_dump()})
+            memory.log("recv", {"raw": r2.model_dump()})
             final_text = r2.choices[0].message.content
             console.print(Panel(Markdown(final_text or "_(sin contenido)_"), title="Asistente"))
-            messages.append({"role":"assistant","content":final_text})
+            memory.add({"role":"assistant","content":final_text})
         else:
             console.print(Panel(Markdown(msg.content or "_(sin contenido)_"), title="Asistente"))
-            messages.append({"role":"assistant","content":msg.content})
+            memory.add({"role":"assistant","content":msg.content})
 
 if __name__ == "__main__":
     asyncio.run(chat_loop())
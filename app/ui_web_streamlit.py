@@ -8,157 +8,198 @@ ROOT = Path(__file__).resolve().parents[1]
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
-# En Windows, usa loop compatible con subprocess
-if sys.platform.startswith("win"):
-    asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+# En Windows, el loop por defecto (Proactor) es el que soporta subprocess asyncio
 # --- FIN FIX ---
 
 
-import os, json, asyncio, time
-import sys, asyncio
-from pathlib import Path
+import os, json, threading, queue
 import streamlit as st
 from dotenv import load_dotenv
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI
 from app.host.mcp_client import MCPClientManager
-from app.host.tool_router import OPENAI_TOOLS
+from app.host.daemon import DaemonClient, daemon_available
+from app.host.tool_catalog import ToolCatalog
+from app.host.tool_executor import execute_tool_calls, ToolCallExecutor
+from app.host.llm_stream import STREAM, stream_chat
+from app.host.memory import ConversationMemory
 
 load_dotenv()
 MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
 
+@st.cache_resource(show_spinner=False)
+def get_loop():
+    # Loop de larga vida en un hilo: los pipes de los servidores pertenecen a él
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    return loop
+
+def run_async(coro):
+    return asyncio.run_coroutine_threadsafe(coro, get_loop()).result()
+
 @st.cache_resource(show_spinner=False)
 def get_clients():
     # Inicia el MCP manager una sola vez
     cfg = json.load(open("app/host/servers.config.json","r",encoding="utf-8"))
     mgr = MCPClientManager(cfg)
-    asyncio.run(mgr.start_all())
+    run_async(mgr.start_all())
     return mgr
 
+def get_session_manager(session):
+    """Con daemon (python -m app.host.daemon): una conexión propia por sesión del navegador, así
+    el daemon reparte los servidores en forma equitativa entre usuarios. Sin daemon: el manager
+    compartido de este proceso."""
+    if "mgr" not in st.session_state:
+        if daemon_available():
+            client = DaemonClient(session=f"web-{session}")
+            run_async(client.start_all())
+            st.session_state.mgr = client
+        else:
+            st.session_state.mgr = get_clients()
+        # El catálogo va con el manager; se refresca solo según MCP_TOOLS_TTL
+        st.session_state.catalog = ToolCatalog(st.session_state.mgr)
+    return st.session_state.mgr, st.session_state.catalog
+
 @st.cache_resource(show_spinner=False)
 def get_openai():
     return OpenAI()
 
-def save_llm_log(direction, payload):
-    Path("logs").mkdir(exist_ok=True, parents=True)
-    with open(Path("logs")/f"llm-{time.strftime('%Y%m%d')}.jsonl","a",encoding="utf-8") as f:
-        rec = {
-            "ts": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
-            "direction": direction,
-            **payload
-        }
-        # cualquier objeto raro se convierte a string automáticamente
-        f.write(json.dumps(rec, ensure_ascii=False, default=str) + "\n")
-
+@st.cache_resource(show_spinner=False)
+def get_async_openai():
+    # Se usa solo desde el loop de get_loop(), igual que los clientes MCP
+    return AsyncOpenAI()
+
+_END = object()
+
+def stream_to_ui(coro_fn):
+    """Corre `coro_fn(on_text)` en el loop de fondo y entrega el texto como generador
+    para `st.write_stream`. El resultado de la corrutina queda en `.future`."""
+    q = queue.Queue()
+    async def runner():
+        try:
+            return await coro_fn(q.put)
+        finally:
+            q.put(_END)
+    fut = asyncio.run_coroutine_threadsafe(runner(), get_loop())
+    def gen():
+        while True:
+            item = q.get()
+            if item is _END:
+                break
+            yield item
+    gen.future = fut
+    return gen
+
+async def streamed_turn(mgr, catalog, aclient, memory, on_text):
+    """Primera respuesta en stream; las tool_calls se ejecutan en cuanto se completan y, si hubo,
+    el cierre también se transmite por `on_text`. Los mensajes nuevos quedan en `memory`."""
+    ex = ToolCallExecutor(mgr, catalog=catalog)
+    tools = await catalog.openai_tools()
+    messages = memory.window()
+    memory.log_send()
+    msg = await stream_chat(aclient, log=memory.log, on_text=on_text, on_tool_call=ex.submit, model=MODEL,
+                            messages=messages, tools=tools, tool_choice="auto", temperature=0.2)
+    memory.add(msg)
+    if not msg.get("tool_calls"):
+        return
+    memory.extend(await ex.gather())
+    if msg["content"]:
+        on_text("\n\n")
+    messages = memory.window()
+    memory.log_send()
+    final = await stream_chat(aclient, log=memory.log, on_text=on_text, model=MODEL, messages=messages, temperature=0.2)
+    memory.add({"role":"assistant","content":final["content"]})
 
 st.set_page_config(page_title="MCP Web Chat", layout="wide")
 st.title(" MCP Web Chat (Streamlit)")
 st.caption(f"Modelo: {MODEL}")
 
-if "messages" not in st.session_state:
-    st.session_state.messages = [{
-        "role":"system",
-        "content":("You are an MCP-capable assistant. "
-                   "If a user asks to read/write files, analyze code, or run repo actions, "
-                   "use the 'mcp_call' tool with the appropriate server and method.")
-    }]
+if "memory" not in st.session_state:
+    # Una conversación (id propio en los logs) por sesión del navegador
+    st.session_state.memory = ConversationMemory("You are an MCP-capable assistant. "
+                                                 "If a user asks to read/write files, analyze code, or run repo actions, "
+                                                 "use the MCP tools provided (one function per tool).")
+memory = st.session_state.memory
 
-mgr = get_clients()
+mgr, catalog = get_session_manager(memory.id)
 client = get_openai()
 
 with st.sidebar:
     st.subheader("Herramientas MCP")
-    if st.button("Listar tools (local-complexity)"):
-        res = asyncio.run(mgr.call("local-complexity","tools/list",{}))
-        st.code(json.dumps(res, indent=2, ensure_ascii=False), language="json")
+    if st.button("Listar tools"):
+        run_async(catalog.refresh(force=True))
+        st.dataframe([{"servidor": srv, "tool": tool, "función": fn} for srv, tool, fn, _ in catalog.summary()],
+                     hide_index=True)
+    st.caption("Servidores")
+    st.dataframe([{"servidor": name, "estado": s["state"], "reinicios": s["restarts"], "arranque_ms": s["start_ms"],
+                   "en_vuelo": s["queue"]["inflight"] if s["queue"] else None,
+                   "cola_max_ms": round(s["queue"]["queue_ms_max"]) if s["queue"] else None}
+                  for name, s in mgr.status().items()], hide_index=True)
     st.divider()
+    with st.expander("Métricas"):
+        snap = run_async(mgr.metrics())
+        st.caption(f"Desde hace {snap['uptime_s']:.0f}s")
+        st.dataframe([{k: r[k] for k in ("server", "tool", "calls", "errors", "p50_ms", "p95_ms")} for r in snap["tools"]],
+                     hide_index=True)
+    if isinstance(mgr, DaemonClient):
+        st.caption(f"Servidores del daemon · sesión `{mgr.session}`")
     st.write("Logs en `logs/`")
+    st.caption(f"Conversación `{memory.id}` · {len(memory.messages)} mensajes")
 
 # Mostrar historial
-for m in st.session_state.messages:
-    if m["role"] != "system":
-        st.chat_message(m["role"]).write(m["content"])
+for m in memory.messages:
+    st.chat_message(m["role"]).write(m["content"])
 
 prompt = st.chat_input("Escribe tu mensaje…")
 if prompt:
-    st.session_state.messages.append({"role":"user","content":prompt})
+    memory.add({"role":"user","content":prompt})
     st.chat_message("user").write(prompt)
 
+if prompt and STREAM:
+    aclient = get_async_openai()
+    gen = stream_to_ui(lambda on_text: streamed_turn(mgr, catalog, aclient, memory, on_text))
+    with st.chat_message("assistant"):
+        st.write_stream(gen())
+    gen.future.result()
+elif prompt:
     # Turno 1 (permite tool-calls)
-    save_llm_log("send", {"messages": st.session_state.messages})
+    messages = memory.window()
+    memory.log_send()
     r = client.chat.completions.create(
         model=MODEL,
-        messages=st.session_state.messages,
-        tools=OPENAI_TOOLS,
+        messages=messages,
+        tools=run_async(catalog.openai_tools()),
         tool_choice="auto",
         temperature=0.2
     )
-    save_llm_log("recv", {"raw": r.model_dump()})
+    memory.log("recv", {"raw": r.model_dump()})
     msg = r.choices[0].message
 
-    tool_msgs = []
     if msg.tool_calls:
         with st.status("Invocando herramientas MCP…", expanded=False):
-            for tc in msg.tool_calls:
-                if tc.type != "function": continue
-                fn = tc.function.name
-                args = json.loads(tc.function.arguments or "{}")
-                if fn != "mcp_call":
-                    tool_msgs.append({
-                        "role":"tool",
-                        "tool_call_id":tc.id,
-                        "name":fn,
-                        "content":"Unsupported tool"
-                    })
-                    continue
-                try:
-                    # Siempre reenviar name y arguments correctamente
-                    tool_params = args.get("params", {})
-                    if "name" not in tool_params and "arguments" not in tool_params:
-                        # Si el modelo mandó mal (plano), lo corregimos:
-                        if "server" in args and "method" in args:
-                            # ya es un mcp_call, no tocamos
-                            pass
-                        else:
-                            raise RuntimeError(f"Formato inválido de tool_call: {args}")
-
-                    result = asyncio.run(
-                        mgr.call(args["server"], "tools/call", tool_params)
-                    )
-                    
-                    tool_msgs.append({
-                        "role":"tool",
-                        "tool_call_id":tc.id,
-                        "name":"mcp_call",
-                        "content": json.dumps({"ok":True,"result":result}, ensure_ascii=False)
-                    })
-                except Exception as e:
-                    tool_msgs.append({
-                        "role":"tool",
-                        "tool_call_id":tc.id,
-                        "name":"mcp_call",
-                        "content": json.dumps({"ok":False,"error":str(e)}, ensure_ascii=False)
-                    })
-
-        st.session_state.messages.append({
+            # Todas las tool_calls del turno en paralelo; respuestas en el orden original
+            tool_msgs = run_async(execute_tool_calls(mgr, msg.tool_calls, catalog=catalog))
+
+        memory.add({
             "role":"assistant",
             "content":msg.content or "",
             "tool_calls": msg.tool_calls
         })
-        st.session_state.messages.extend(tool_msgs)
+        memory.extend(tool_msgs)
 
         # Turno 2 (cierre)
-        save_llm_log("send", {"messages": st.session_state.messages[-12:]})
+        messages = memory.window()
+        memory.log_send()
         r2 = client.chat.completions.create(
             model=MODEL,
-            messages=st.session_state.messages,
+            messages=messages,
             temperature=0.2
         )
-        save_llm_log("recv", {"raw": r2.model_dump()})
+        memory.log("recv", {"raw": r2.model_dump()})
         final_text = r2.choices[0].message.content or "_(sin contenido)_"
         st.chat_message("assistant").write(final_text)
-        st.session_state.messages.append({"role":"assistant","content":final_text})
+        memory.add({"role":"assistant","content":final_text})
     else:
         # Respuesta directa
         final_text = msg.content or "_(sin contenido)_"
         st.chat_message("assistant").write(final_text)
-        st.session_state.messages.append({"role":"assistant","content":final_text})
+        memory.add({"role":"assistant","content":final_text})
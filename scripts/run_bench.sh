@@ -0,0 +1 @@
+python tools/bench_suite.py "$@"
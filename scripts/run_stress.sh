@@ -0,0 +1 @@
+python tools/stress_stdio_client.py --calls 5000 --rounds 3
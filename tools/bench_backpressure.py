@@ -0,0 +1,122 @@
+import argparse, asyncio, json, sys, time
+from pathlib import Path
+
+# Permite importar app.* al ejecutar como script
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from app.host.mcp_client import MCPProcessClient
+
+# Tres escenarios de MCPProcessClient contra servidores stdio:
+# 1. stderr: un servidor que escribe mucho a stderr. Sin leerlo, asyncio lo acumula en memoria
+#    hasta 2 x STREAM_LIMIT (128 MiB); ahí deja de leer el pipe y el servidor se bloquea.
+# 2. cancelación: llamadas que vencen con el servidor ocupado; con $/cancelRequest el trabajo
+#    encolado se descarta y una llamada nueva no espera detrás de él.
+# 3. ventana: miles de llamadas simultáneas con max_inflight acotado contra sin límite.
+
+LOCAL = [sys.executable, "-u", str(ROOT / "app" / "mcp_local" / "server.py")]
+
+# Servidor mínimo que escribe `n` bytes a stderr antes de cada respuesta
+CHATTY = r'''
+import sys, json
+n = int(sys.argv[1])
+for line in sys.stdin:
+    req = json.loads(line)
+    sys.stderr.write(("log " * (n // 4))[:n - 1] + "\n"); sys.stderr.flush()
+    if "id" in req:
+        print(json.dumps({"jsonrpc": "2.0", "id": req["id"], "result": {}}), flush=True)
+'''
+
+def slow_code(n):
+    # analyze de un archivo grande: algunas decenas de ms por llamada
+    return "\n".join(f"def f{i}(x):\n    if x > {i}:\n        return {i}\n    return 0\n" for i in range(n))
+
+async def chatty(calls, stderr_bytes, drain):
+    c = MCPProcessClient("chatty", [sys.executable, "-c", CHATTY, str(stderr_bytes)], echo=False)
+    await c.start()
+    if not drain:
+        c.stderr_task.cancel()  # como antes: stderr=PIPE sin nadie que lo lea
+    t0 = time.perf_counter()
+    done = 0
+    try:
+        for _ in range(calls):
+            await c.call("tools/list", {}, timeout=2)
+            done += 1
+        error = None
+    except RuntimeError as e:
+        error = str(e)
+    elapsed = time.perf_counter() - t0
+    buffered = len(c.proc.stderr._buffer)
+    await c.close(kill=True)
+    return {"drain": drain, "completed": done, "of": calls, "elapsed_s": round(elapsed, 3), "error": error,
+            "stderr_buffered_mb": round(buffered / 2**20, 1), "stderr_lines": c.stats["stderr_lines"]}
+
+async def cancellation(calls, size, timeout, send_cancel):
+    c = MCPProcessClient("local", LOCAL + ["--concurrent", "--workers", "1", "--cache-mb", "0"], echo=False)
+    await c.start()
+    await c.call("tools/list", {})
+    if not send_cancel:
+        c._cancel_request = lambda _id, reason: None  # como antes: el vencido sigue en el servidor
+    code = slow_code(size)
+    args = lambda i: {"name": "code/complexity/analyze", "arguments": {"code": code + f"\n# {i}"}}
+    t0 = time.perf_counter()
+    one = time.perf_counter()
+    await c.call("tools/call", args(-1), timeout=60)
+    one = time.perf_counter() - one
+    results = await asyncio.gather(*(c.call("tools/call", args(i), timeout=timeout) for i in range(calls)),
+                                   return_exceptions=True)
+    expired = sum(isinstance(r, Exception) for r in results)
+    t1 = time.perf_counter()
+    await c.call("tools/call", {"name": "code/complexity/analyze", "arguments": {"code": "def g(): pass"}}, timeout=60)
+    fresh = time.perf_counter() - t1
+    stats = c.queue_stats()
+    await c.close()
+    return {"cancel": send_cancel, "one_call_ms": round(one * 1000, 1), "expired": expired, "of": calls,
+            "fresh_call_after_ms": round(fresh * 1000, 1), "pending_after": stats["pending"],
+            "late_responses": stats["late"], "total_s": round(time.perf_counter() - t0, 2)}
+
+async def window(calls, max_inflight):
+    c = MCPProcessClient("local", LOCAL, echo=False, max_inflight=max_inflight)
+    await c.start()
+    await c.call("tools/list", {})
+    lat = []
+    async def one(i):
+        t = time.perf_counter()
+        await c.call("tools/call", {"name": "code/complexity/analyze",
+                                    "arguments": {"code": f"def f{i}(x):\n    return x\n"}}, timeout=120)
+        lat.append(time.perf_counter() - t)
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(calls)))
+    elapsed = time.perf_counter() - t0
+    # Una llamada "interactiva" mientras hay otra ráfaga en curso
+    burst = asyncio.ensure_future(asyncio.gather(*(one(i) for i in range(calls))))
+    await asyncio.sleep(0.05)
+    t = time.perf_counter()
+    await c.call("ping", {}, timeout=60)
+    ping_ms = (time.perf_counter() - t) * 1000
+    await burst
+    stats = c.queue_stats()
+    lat.sort()
+    await c.close()
+    return {"max_inflight": max_inflight, "elapsed_s": round(elapsed, 3),
+            "req_per_s": round(calls / elapsed, 1), "p50_ms": round(lat[len(lat) // 2] * 1000, 1),
+            "p99_ms": round(lat[int(len(lat) * 0.99)] * 1000, 1), "ping_during_burst_ms": round(ping_ms, 1),
+            "queued": stats["queued"], "queue_ms_avg": stats["queue_ms_avg"],
+            "queue_ms_max": round(stats["queue_ms_max"], 1), "pending_after": stats["pending"]}
+
+async def main():
+    ap = argparse.ArgumentParser(description="Backpressure, cancelación y stderr en MCPProcessClient")
+    ap.add_argument("--calls", type=int, default=2000, help="Llamadas simultáneas en la prueba de ventana")
+    ap.add_argument("--window", type=int, default=16)
+    args = ap.parse_args()
+    report = {
+        "stderr": [await chatty(2200, 64 * 1024, drain=False), await chatty(2200, 64 * 1024, drain=True)],
+        "cancel": [await cancellation(20, 400, 0.2, send_cancel=False),
+                   await cancellation(20, 400, 0.2, send_cancel=True)],
+        "window": [await window(args.calls, 10 ** 9), await window(args.calls, args.window)],
+    }
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,113 @@
+import ast, argparse, json, random, sys, time
+from pathlib import Path
+
+# Permite importar app.* al ejecutar como script
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from app.mcp_local.server import ComplexityVisitor, analyze_code
+
+# Compara el motor de un solo recorrido (ComplexityVisitor) contra la implementación
+# anterior basada en ast.walk por función, sobre módulos grandes generados, y verifica
+# que el `summary` de nivel superior sea idéntico.
+
+def legacy_cc(node):
+    count = 1
+    for n in ast.walk(node):
+        if isinstance(n, (ast.If, ast.For, ast.While, ast.With, ast.Try, ast.IfExp, ast.Match)):
+            count += 1
+        elif isinstance(n, ast.BoolOp):
+            count += max(0, len(n.values)-1)
+        elif isinstance(n, ast.ExceptHandler):
+            count += 1
+    return count
+
+def legacy_summary(tree):
+    report = []
+    for n in tree.body:
+        if isinstance(n, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            comp = legacy_cc(n)
+            report.append({"name": n.name, "lineno": n.lineno, "complexity": comp,
+                           "risk": "low" if comp <= 5 else ("medium" if comp <=10 else "high")})
+        elif isinstance(n, ast.ClassDef):
+            methods = [m for m in n.body if isinstance(m, (ast.FunctionDef, ast.AsyncFunctionDef))]
+            avg = sum(legacy_cc(m) for m in methods)/len(methods) if methods else 1
+            report.append({"name": f"class {n.name}", "lineno": n.lineno, "complexity_avg": round(avg,2),
+                           "risk": "low" if avg <= 5 else ("medium" if avg <=10 else "high")})
+    return report
+
+def legacy_all_scopes(tree):
+    # Lo que costaría obtener una entrada por scope con el enfoque anterior: un ast.walk por scope
+    return [legacy_cc(n) for n in ast.walk(tree) if isinstance(n, (ast.FunctionDef, ast.AsyncFunctionDef))]
+
+def body(rng, depth, indent):
+    pad = " " * indent
+    out = []
+    for k in range(rng.randint(2, 5)):
+        r = rng.random()
+        if r < 0.25:
+            out.append(f"{pad}if x > {k} and y < {k} or z:\n{pad}    x += 1\n{pad}else:\n{pad}    x -= 1\n")
+        elif r < 0.45:
+            out.append(f"{pad}for i{k} in range(x):\n{pad}    x = x + i{k} if i{k} % 2 else x\n")
+        elif r < 0.6:
+            out.append(f"{pad}try:\n{pad}    x = int(x)\n{pad}except ValueError:\n{pad}    x = 0\n")
+        elif r < 0.75:
+            out.append(f"{pad}while x > {k}:\n{pad}    x -= 1\n")
+        elif depth < 3:
+            out.append(f"{pad}def nested{depth}_{k}(x, y=None, z=None):\n{body(rng, depth + 1, indent + 4)}")
+        else:
+            out.append(f"{pad}x = [v for v in range({k}) if v]\n")
+    out.append(f"{pad}return x\n")
+    return "".join(out)
+
+def gen_module(n_items, seed=0):
+    rng = random.Random(seed)
+    parts = []
+    for i in range(n_items):
+        if rng.random() < 0.3:
+            methods = "".join(f"    def m{j}(self, x, y=None, z=None):\n{body(rng, 1, 8)}" for j in range(rng.randint(1, 6)))
+            parts.append(f"class C{i}:\n{methods}")
+        else:
+            parts.append(f"def f{i}(x, y=None, z=None):\n{body(rng, 0, 4)}")
+    return "\n".join(parts)
+
+def timeit(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000.0
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark del motor de complejidad (single-pass vs ast.walk)")
+    ap.add_argument("--sizes", default="100,500,2000", help="Cantidad de funciones/clases de nivel superior")
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    results = []
+    for n in (int(x) for x in args.sizes.split(",")):
+        src = gen_module(n)
+        tree = ast.parse(src)
+        new = analyze_code(src)
+        assert new["summary"] == legacy_summary(tree), f"summary distinto para n={n}"
+
+        def single_pass():
+            ComplexityVisitor().visit(tree)
+        row = {
+            "items": n,
+            "lines": src.count("\n"),
+            "scopes": len(new["scopes"]),
+            "parse_ms": round(timeit(lambda: ast.parse(src), args.repeat), 2),
+            "legacy_top_level_ms": round(timeit(lambda: legacy_summary(tree), args.repeat), 2),
+            "legacy_all_scopes_ms": round(timeit(lambda: legacy_all_scopes(tree), args.repeat), 2),
+            "single_pass_ms": round(timeit(single_pass, args.repeat), 2),
+        }
+        row["speedup_vs_top_level"] = round(row["legacy_top_level_ms"] / row["single_pass_ms"], 2)
+        row["speedup_vs_all_scopes"] = round(row["legacy_all_scopes_ms"] / row["single_pass_ms"], 2)
+        results.append(row)
+    print(json.dumps({"summary_identical": True, "results": results}, indent=2))
+
+if __name__ == "__main__":
+    main()
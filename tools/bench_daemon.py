@@ -0,0 +1,112 @@
+import argparse, asyncio, json, os, sys, tempfile, time
+from pathlib import Path
+
+# Permite importar app.* al ejecutar como script
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from app.host.mcp_client import MCPClientManager, STREAM_LIMIT
+from app.host.daemon import HostDaemon, DaemonClient
+
+# Daemon compartido contra un manager por UI:
+# 1. procesos y memoria de los servidores con N UIs conectadas.
+# 2. equidad: una sesión lanza una ráfaga de llamadas y otra hace llamadas sueltas; se mide
+#    la latencia de la segunda con un manager compartido (FIFO, como Streamlit hasta ahora)
+#    y a través del daemon (round-robin por sesión).
+
+def stdio_cfg():
+    cfg = json.load(open(ROOT / "app" / "host" / "servers.config.json", encoding="utf-8"))
+    return {"servers": [dict(s, echo=False, command=[sys.executable if c == "python" else c for c in s["command"]])
+                        for s in cfg["servers"] if "command" in s]}
+
+def rss_mb(pids):
+    total = 0
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/status") as f:
+                total += next(int(l.split()[1]) for l in f if l.startswith("VmRSS:"))
+        except (OSError, StopIteration):
+            pass
+    return round(total / 1024, 1)
+
+def server_pids(mgr):
+    return [c.proc.pid for c in mgr.clients.values() if getattr(c, "proc", None)]
+
+async def start_daemon(cfg, path):
+    mgr = MCPClientManager(cfg)
+    await mgr.start_all(wait_ready=True)
+    daemon = HostDaemon(mgr)
+    server = await asyncio.start_unix_server(daemon.handle, path=path, limit=STREAM_LIMIT)
+    return mgr, daemon, server
+
+async def footprint(cfg, uis):
+    mgrs = [MCPClientManager(cfg) for _ in range(uis)]
+    await asyncio.gather(*(m.start_all(wait_ready=True) for m in mgrs))
+    pids = [p for m in mgrs for p in server_pids(m)]
+    own = {"processes": len(pids), "rss_mb": rss_mb(pids)}
+    await asyncio.gather(*(m.close() for m in mgrs))
+
+    path = os.path.join(tempfile.mkdtemp(), "bench.sock")
+    mgr, daemon, server = await start_daemon(cfg, path)
+    clients = [DaemonClient(path, session=f"ui{i}") for i in range(uis)]
+    await asyncio.gather(*(c.start_all() for c in clients))
+    pids = server_pids(mgr)
+    shared = {"processes": len(pids), "rss_mb": rss_mb(pids), "sessions": len(daemon.sessions)}
+    await asyncio.gather(*(c.close() for c in clients))
+    server.close()
+    await mgr.close()
+    return {"uis": uis, "manager_per_ui": own, "daemon": shared}
+
+def analyze(i, size=40):
+    code = "\n".join(f"def f{j}(x):\n    if x > {j}:\n        return 1\n    return 0\n" for j in range(size))
+    return {"name": "code/complexity/analyze", "arguments": {"code": code + f"\n# {i}"}}
+
+async def fairness(burst, probes, via_daemon):
+    cfg = {"servers": [s for s in stdio_cfg()["servers"] if s["name"] == "local-complexity"]}
+    cfg["servers"][0]["max_inflight"] = 4
+    if via_daemon:
+        path = os.path.join(tempfile.mkdtemp(), "bench.sock")
+        mgr, daemon, server = await start_daemon(cfg, path)
+        heavy, light = DaemonClient(path, session="rafaga"), DaemonClient(path, session="interactiva")
+        await heavy.start_all()
+        await light.start_all()
+    else:
+        mgr = MCPClientManager(cfg)
+        await mgr.start_all(wait_ready=True)
+        heavy = light = mgr  # un único manager para todas las sesiones
+    await light.call("local-complexity", "tools/list", {})
+    flood = asyncio.ensure_future(asyncio.gather(
+        *(heavy.call("local-complexity", "tools/call", analyze(i), timeout=300) for i in range(burst))))
+    await asyncio.sleep(0.05)
+    lat = []
+    for i in range(probes):
+        t = time.perf_counter()
+        await light.call("local-complexity", "tools/call", analyze(-i, size=1), timeout=300)
+        lat.append((time.perf_counter() - t) * 1000)
+    t = time.perf_counter()
+    await flood
+    rest = time.perf_counter() - t
+    if via_daemon:
+        await heavy.close()
+        await light.close()
+        server.close()
+    await mgr.close()
+    lat.sort()
+    return {"via": "daemon (round-robin)" if via_daemon else "manager compartido (FIFO)",
+            "probe_p50_ms": round(lat[len(lat) // 2], 1), "probe_max_ms": round(lat[-1], 1),
+            "burst_left_after_probes_s": round(rest, 2)}
+
+async def main():
+    ap = argparse.ArgumentParser(description="Daemon MCP compartido contra un manager por UI")
+    ap.add_argument("--uis", type=int, default=4)
+    ap.add_argument("--burst", type=int, default=600)
+    ap.add_argument("--probes", type=int, default=20)
+    args = ap.parse_args()
+    report = {"footprint": await footprint(stdio_cfg(), args.uis),
+              "fairness": [await fairness(args.burst, args.probes, False),
+                           await fairness(args.burst, args.probes, True)]}
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+if __name__ == "__main__":
+    asyncio.run(main())
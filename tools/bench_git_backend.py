@@ -0,0 +1,88 @@
+import argparse, json, os, shutil, subprocess, sys, tempfile, time
+from pathlib import Path
+
+# Permite importar app.* al ejecutar como script
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from app.host import git_mcp
+
+# Compara el backend anterior de git_mcp (un `git` nuevo por llamada, status que re-escanea todo)
+# contra el de larga vida: status --porcelain=v2 en caché y lecturas por `cat-file --batch`,
+# sobre un repositorio generado con muchos archivos.
+
+def build_repo(root, n_files, per_dir=1000):
+    env = dict(os.environ, GIT_AUTHOR_NAME="bench", GIT_AUTHOR_EMAIL="bench@example.com",
+               GIT_COMMITTER_NAME="bench", GIT_COMMITTER_EMAIL="bench@example.com")
+    subprocess.run(["git", "init", "-q", root], check=True)
+    for i in range(n_files):
+        d = os.path.join(root, f"d{i // per_dir:04d}")
+        if i % per_dir == 0:
+            os.makedirs(d, exist_ok=True)
+        with open(os.path.join(d, f"f{i:06d}.txt"), "w") as f:
+            f.write(f"archivo {i}\n" * 4)
+    subprocess.run(["git", "-C", root, "add", "-A"], check=True)
+    subprocess.run(["git", "-C", root, "commit", "-q", "-m", "bench"], check=True, env=env)
+    return [f"d{i // per_dir:04d}/f{i:06d}.txt" for i in range(n_files)]
+
+def best_ms(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return round(best * 1000.0, 2)
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark del backend git de larga vida (status en caché, cat-file --batch)")
+    ap.add_argument("--files", type=int, default=100000)
+    ap.add_argument("--reads", type=int, default=500, help="Archivos leídos por revisión en la prueba de lectura")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--keep", action="store_true", help="No borrar el repo temporal")
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="bench_git_")
+    repo = os.path.join(tmp, "repo")
+    try:
+        t0 = time.perf_counter()
+        files = build_repo(repo, args.files)
+        setup_s = time.perf_counter() - t0
+        sample = files[:: max(1, len(files) // args.reads)][: args.reads]
+
+        git_mcp.STATUS_TTL = 2.0  # la caché de status es opcional (MCP_GIT_STATUS_TTL); se mide activada
+        status = lambda refresh=False: git_mcp.handle_call("git/status", {"path": repo, "refresh": refresh})
+        legacy = lambda: git_mcp.run_git_command(repo, ["status", "--short", "--branch"])
+        status(True)  # primera pasada: llena el untracked cache del índice
+        report = {
+            "files": args.files, "setup_s": round(setup_s, 1), "git": git_mcp._git_version(),
+            "status_legacy_short_ms": best_ms(legacy, args.repeat),
+            "status_v2_uncached_ms": best_ms(lambda: status(True), args.repeat),
+            "status_cached_ms": best_ms(status, args.repeat * 100),
+        }
+        # Tocar el índice invalida la caché: el siguiente status vuelve a escanear
+        def after_index_change():
+            os.utime(os.path.join(repo, ".git", "index"))
+            assert not status()["content"][1]["data"]["cached"]
+        report["status_after_index_change_ms"] = best_ms(after_index_change, args.repeat)
+        report["status_speedup_cached"] = round(report["status_legacy_short_ms"] / max(report["status_cached_ms"], 1e-3), 1)
+
+        def legacy_reads():
+            for f in sample:
+                git_mcp.run_git_command(repo, ["show", f"HEAD:{f}"])
+        def batch_reads():
+            for f in sample:
+                git_mcp.handle_call("git/read_file", {"path": repo, "file": f})
+        report["reads"] = len(sample)
+        report["read_legacy_show_ms"] = best_ms(legacy_reads, args.repeat)
+        report["read_cat_file_batch_ms"] = best_ms(batch_reads, args.repeat)
+        report["read_speedup"] = round(report["read_legacy_show_ms"] / report["read_cat_file_batch_ms"], 1)
+        print(json.dumps(report, indent=2))
+    finally:
+        for r in git_mcp._repos.values():
+            r.close()
+        if not args.keep:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
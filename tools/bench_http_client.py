@@ -0,0 +1,84 @@
+import asyncio, argparse, json, sys, threading, time
+from pathlib import Path
+
+# Permite importar app.* al ejecutar como script
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from app.host.mcp_client import MCPHttpClient
+from http_mcp_stub import make_server
+
+# Compara el cliente HTTP anterior (POST bloqueante dentro de async def, conexión nueva por
+# llamada) contra MCPHttpClient con pool keep-alive, usando tools/http_mcp_stub.py como servidor.
+
+SRC = "def f(x):\n    if x:\n        return 1\n    return 0\n"
+
+def blocking_post(url, req, timeout):
+    try:
+        import requests
+        r = requests.post(url, json=req, timeout=timeout)
+        r.raise_for_status()
+        return r.json()
+    except ImportError:
+        import urllib.request
+        data = json.dumps(req).encode("utf-8")
+        rq = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(rq, timeout=timeout) as r:
+            return json.loads(r.read())
+
+class LegacyHttpClient:
+    """Réplica del MCPHttpClient original: bloquea el loop y abre un socket por llamada."""
+    def __init__(self, url):
+        self.url = url
+
+    async def call(self, method, params=None, timeout=15):
+        req = {"jsonrpc": "2.0", "id": int(time.time_ns()), "method": method, "params": params or {}}
+        msg = blocking_post(self.url, req, timeout)
+        if "error" in msg:
+            raise RuntimeError(f"MCP error: {msg['error']}")
+        return msg["result"]
+
+async def drive(client, requests, concurrency):
+    lat = []
+    left = {"n": requests}
+    async def worker():
+        while left["n"] > 0:
+            left["n"] -= 1
+            t0 = time.perf_counter()
+            await client.call("tools/call", {"name": "code/complexity/analyze", "arguments": {"code": SRC}})
+            lat.append((time.perf_counter() - t0) * 1000.0)
+    t0 = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - t0
+    lat.sort()
+    pct = lambda p: round(lat[min(len(lat) - 1, int(p / 100.0 * len(lat)))], 3)
+    return {"requests": requests, "concurrency": concurrency, "elapsed_s": round(elapsed, 3),
+            "throughput_req_per_s": round(requests / max(elapsed, 1e-6), 2),
+            "latency_ms": {"p50": pct(50), "p90": pct(90), "p99": pct(99)}}
+
+async def main():
+    ap = argparse.ArgumentParser(description="Benchmark del transporte HTTP de MCP")
+    ap.add_argument("--requests", type=int, default=2000)
+    ap.add_argument("--concurrency", type=int, default=16)
+    ap.add_argument("--max-connections", type=int, default=8)
+    ap.add_argument("--delay-ms", type=float, default=2.0, help="Latencia simulada en el stub")
+    args = ap.parse_args()
+
+    srv = make_server(delay_ms=args.delay_ms)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{srv.server_address[1]}/"
+
+    legacy = await drive(LegacyHttpClient(url), args.requests, args.concurrency)
+    pooled_client = MCPHttpClient("bench", url, max_connections=args.max_connections, echo=False)
+    pooled_client._log = lambda *a, **k: None  # medir transporte, no el logging
+    pooled = await drive(pooled_client, args.requests, args.concurrency)
+    pooled["tcp_connections_opened"] = pooled_client.pool.opened
+    await pooled_client.close()
+    srv.shutdown()
+    print(json.dumps({"legacy_blocking": legacy, "pooled_async": pooled,
+                      "speedup": round(pooled["throughput_req_per_s"] / max(legacy["throughput_req_per_s"], 1e-6), 2)},
+                     indent=2))
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,87 @@
+import argparse, json, sys, time
+from pathlib import Path
+
+# Permite importar app.* al ejecutar como script
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from app.json_codec import _std_dumps
+from app.mcp_local.server import analyze_code
+from bench_complexity import gen_module
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Compara el framing anterior (json.dumps -> str -> encode, str de ida y vuelta), la librería
+# estándar en bytes (fallback de app/json_codec.py) y orjson, sobre payloads como los reales:
+# un read_file grande, un reporte de complejidad, un list_dir y un batch de requests.
+
+def payloads():
+    text = "".join(f"línea {i}: {'ñandú ' * (i % 12)}código\n" for i in range(20000))  # ~1 MB con no-ASCII
+    report = analyze_code(gen_module(200))
+    files = [f"archivo_{i:05d}.py" for i in range(5000)]
+    batch = [{"jsonrpc": "2.0", "id": i, "method": "tools/call",
+              "params": {"name": "code/complexity/analyze", "arguments": {"code": gen_module(2, seed=i)}}}
+             for i in range(100)]
+    return {
+        "read_file_1mb": {"jsonrpc": "2.0", "id": 1, "result": {"content": [{"type": "text", "text": text}]}},
+        "complexity_report": {"jsonrpc": "2.0", "id": 2, "result": {"content": report}},
+        "list_dir_5k": {"jsonrpc": "2.0", "id": 3, "result": {"content": [{"type": "json", "data": {"files": files}}]}},
+        "batch_100_requests": batch,
+    }
+
+CODECS = {
+    # Lo que hacían jdump/jprint/print(json.dumps(...)): str intermedio y readline en texto
+    "legacy_str": (lambda o: (json.dumps(o, ensure_ascii=False) + "\n").encode("utf-8"),
+                   lambda b: json.loads(b.decode("utf-8"))),
+    "stdlib_bytes": (lambda o: _std_dumps(o) + b"\n", json.loads),
+}
+if orjson:
+    CODECS["orjson"] = (lambda o: orjson.dumps(o, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_APPEND_NEWLINE),
+                        orjson.loads)
+
+def best_ms(fn, repeat, min_s=0.05):
+    n, t = 1, 0.0
+    while True:
+        t0 = time.perf_counter()
+        for _ in range(n):
+            fn()
+        t = time.perf_counter() - t0
+        if t >= min_s:
+            break
+        n *= 2
+    best = t / n
+    for _ in range(repeat - 1):
+        t0 = time.perf_counter()
+        for _ in range(n):
+            fn()
+        best = min(best, (time.perf_counter() - t0) / n)
+    return best * 1000.0
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark del codec JSON del framing MCP (stdlib vs orjson)")
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    results = []
+    for name, obj in payloads().items():
+        frames = {c: enc(obj) for c, (enc, _) in CODECS.items()}
+        for c, (enc, dec) in CODECS.items():
+            assert dec(frames[c]) == json.loads(frames["legacy_str"]), f"{c} no es equivalente en {name}"
+        row = {"payload": name, "frame_bytes": len(frames["stdlib_bytes"])}
+        for c, (enc, dec) in CODECS.items():
+            frame = frames[c]
+            row[f"{c}_encode_ms"] = round(best_ms(lambda: enc(obj), args.repeat), 3)
+            row[f"{c}_decode_ms"] = round(best_ms(lambda: dec(frame), args.repeat), 3)
+        if orjson:
+            row["orjson_speedup_encode"] = round(row["legacy_str_encode_ms"] / row["orjson_encode_ms"], 2)
+            row["orjson_speedup_decode"] = round(row["legacy_str_decode_ms"] / row["orjson_decode_ms"], 2)
+        results.append(row)
+    print(json.dumps({"orjson_available": orjson is not None,
+                      "orjson_version": getattr(orjson, "__version__", None), "results": results}, indent=2))
+
+if __name__ == "__main__":
+    main()
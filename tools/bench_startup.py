@@ -0,0 +1,112 @@
+import argparse, asyncio, json, os, signal, sys, time
+from pathlib import Path
+
+# Permite importar app.* al ejecutar como script
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from app.host import supervisor
+from app.host.mcp_client import MCPClientManager, MCPProcessClient
+
+# Arranque de los servidores stdio de servers.config.json:
+# - antes: start() de cada servidor uno tras otro, sin initialize; el primer tools/list
+#   paga la importación del intérprete de cada servidor.
+# - ahora: supervisor que lanza todos en paralelo y hace initialize en segundo plano.
+# Mide el tiempo hasta el primer prompt y hasta que todos responden tools/list, y la
+# recuperación tras matar un servidor con una llamada en vuelo.
+
+def stdio_servers():
+    cfg = json.load(open(ROOT / "app" / "host" / "servers.config.json", encoding="utf-8"))
+    servers = []
+    for s in cfg["servers"]:
+        if "command" not in s:
+            continue
+        cmd = [sys.executable if c == "python" else c for c in s["command"]]
+        servers.append(dict(s, command=cmd, echo=False))
+    return servers
+
+async def legacy_start(servers):
+    t0 = time.perf_counter()
+    clients = []
+    for s in servers:  # el start_all anterior: uno tras otro
+        c = MCPProcessClient(s["name"], s["command"], echo=False)
+        await c.start()
+        clients.append(c)
+    prompt = time.perf_counter() - t0
+    await asyncio.gather(*(c.call("tools/list", {}, timeout=30) for c in clients))
+    ready = time.perf_counter() - t0
+    await asyncio.gather(*(c.close() for c in clients))
+    return prompt, ready
+
+async def supervised_start(servers):
+    t0 = time.perf_counter()
+    mgr = MCPClientManager({"servers": servers})
+    await mgr.start_all()
+    prompt = time.perf_counter() - t0
+    used = [s for s in servers if not s.get("lazy")]
+    await asyncio.gather(*(mgr.call(s["name"], "tools/list", {}, timeout=30) for s in used))
+    ready = time.perf_counter() - t0
+    await mgr.close()
+    return prompt, ready
+
+async def crash_recovery(servers, hang=False):
+    s = dict(next(s for s in servers if s["name"] == "filesystem"), optional=False)
+    mgr = MCPClientManager({"servers": [s]})
+    await mgr.start_all(wait_ready=True)
+    client = mgr.clients["filesystem"]
+    # Se congela antes de la llamada para que no alcance a contestarla. Colgado: sigue vivo
+    # pero no responde (solo lo detecta el ping); si no, kill -9 con la llamada en vuelo.
+    os.kill(client.proc.pid, signal.SIGSTOP)
+    call = asyncio.ensure_future(mgr.call("filesystem", "tools/call", {
+        "name": "filesystem/list_dir", "arguments": {"path": str(ROOT)}}, timeout=30))
+    await asyncio.sleep(0.05)
+    t0 = time.perf_counter()
+    if not hang:
+        client.proc.kill()
+    try:
+        await call
+        failed = None
+    except RuntimeError:
+        failed = time.perf_counter() - t0
+    sup = mgr.supervisors["filesystem"]
+    while sup.restarts == 0 or sup.state != "ready":
+        await asyncio.sleep(0.01)
+    restarted = time.perf_counter() - t0
+    await mgr.call("filesystem", "tools/list", {})
+    status = {k: v for k, v in mgr.status()["filesystem"].items() if k != "queue"}
+    await mgr.close()
+    return failed, restarted, status
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark de arranque y reinicio de servidores MCP stdio")
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+    servers = stdio_servers()
+    print(f"Servidores stdio: {', '.join(s['name'] for s in servers)}")
+
+    for label, fn in (("antes (secuencial)", legacy_start), ("supervisor", supervised_start)):
+        runs = [asyncio.run(fn(servers)) for _ in range(args.repeat)]
+        prompt = min(r[0] for r in runs) * 1000
+        ready = min(r[1] for r in runs) * 1000
+        print(f"{label:>20}: primer prompt {prompt:8.1f} ms · todos responden tools/list {ready:8.1f} ms")
+
+    lazy = [dict(s, lazy=True) if s["name"] == "git" else s for s in servers]
+    runs = [asyncio.run(supervised_start(lazy)) for _ in range(args.repeat)]
+    print(f"{'supervisor, git lazy':>20}: primer prompt {min(r[0] for r in runs) * 1000:8.1f} ms · "
+          f"los no lazy responden tools/list {min(r[1] for r in runs) * 1000:8.1f} ms")
+
+    failed, restarted, status = asyncio.run(crash_recovery(servers))
+    print("\n💥 kill -9 de filesystem con una llamada en vuelo (timeout 30 s):")
+    print(f"  la llamada falló a los {failed * 1000:.1f} ms" if failed is not None else "  la llamada no falló")
+    print(f"  servidor listo de nuevo a los {restarted * 1000:.1f} ms (estado: {status})")
+
+    # Ping más frecuente para no esperar 2 x 15 s en el benchmark
+    supervisor.PING_INTERVAL, supervisor.PING_TIMEOUT = 0.25, 0.25
+    failed, restarted, status = asyncio.run(crash_recovery(servers, hang=True))
+    print(f"\n🧊 SIGSTOP de filesystem (colgado) con ping cada {supervisor.PING_INTERVAL}s:")
+    print(f"  la llamada falló a los {failed * 1000:.1f} ms" if failed is not None else "  la llamada no falló")
+    print(f"  servidor listo de nuevo a los {restarted * 1000:.1f} ms (estado: {status})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,395 @@
+import asyncio, argparse, json, os, platform, shutil, sys, tempfile, time
+from pathlib import Path
+
+# Permite importar app.* al ejecutar como script
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from app.json_codec import BACKEND, dumps_line, loads
+from bench_complexity import gen_module
+
+# Suite de micro/macro benchmarks con comparación contra un baseline versionado.
+#
+#   python tools/bench_suite.py                      # corre y compara con tools/bench_baseline.json
+#   python tools/bench_suite.py --update-baseline    # reescribe el baseline con esta corrida
+#   python tools/bench_suite.py --only git/ --tolerance 0.5
+#
+# Cada caso es una función `fn(n) -> segundos` que ejecuta n operaciones y devuelve solo el
+# tiempo medido (la preparación queda fuera). Se calibra n para que cada muestra dure al menos
+# --min-sample-ms y se toman --samples muestras; de cada corrida se usa la mediana. El baseline se
+# graba con varias corridas (--runs, 5 por defecto): guarda la mediana de las medianas y cuánto
+# variaron entre corridas (noise_pct). Sale con código 1 si la mediana de algún caso supera
+# baseline * (1 + max(tolerancia, noise_pct)); los casos "noisy" (subprocesos, IPC) usan el doble de tolerancia.
+
+BASELINE = Path(__file__).resolve().parent / "bench_baseline.json"
+FORMAT_VERSION = 1
+
+CASES = []
+
+def case(name, noisy=False):
+    def deco(fn):
+        CASES.append((name, fn, noisy))
+        return fn
+    return deco
+
+def clock(fn, n):
+    t0 = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return time.perf_counter() - t0
+
+# --- Framing JSON-RPC ---
+
+REQ = {"jsonrpc": "2.0", "id": 12345, "method": "tools/call",
+       "params": {"name": "code/complexity/analyze", "arguments": {"code": gen_module(3)}}}
+
+def _sample_response():
+    from app.mcp_local.server import analyze_code
+    return {"jsonrpc": "2.0", "id": 12345, "result": {"content": analyze_code(gen_module(40))}}
+
+RESP_LINE = dumps_line(_sample_response())
+
+@case("json/encode_request")
+def bench_json_encode(n):
+    return clock(lambda: dumps_line(REQ), n)
+
+@case("json/decode_response")
+def bench_json_decode(n):
+    return clock(lambda: loads(RESP_LINE), n)
+
+# --- Motor de complejidad ---
+
+SMALL_SRC, LARGE_SRC = gen_module(5), gen_module(100)
+
+@case("complexity/analyze_small")
+def bench_analyze_small(n):
+    from app.mcp_local.server import analyze_code
+    return clock(lambda: analyze_code(SMALL_SRC), n)
+
+@case("complexity/analyze_large")
+def bench_analyze_large(n):
+    from app.mcp_local.server import analyze_code
+    return clock(lambda: analyze_code(LARGE_SRC), n)
+
+# --- filesystem_mcp.handle_call ---
+
+def _fs_call(name, **args):
+    from app.host.filesystem_mcp import handle_call
+    return handle_call(name, args)
+
+@case("filesystem/write_file")
+def bench_fs_write(n):
+    path = os.path.join(WORK, "fs_write.txt")
+    return clock(lambda: _fs_call("filesystem/write_file", path=path, content="x" * 4096), n)
+
+@case("filesystem/read_file")
+def bench_fs_read(n):
+    path = os.path.join(WORK, "fs_read.txt")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("línea de prueba\n" * 2000)
+    return clock(lambda: _fs_call("filesystem/read_file", path=path), n)
+
+def _read_pages(path, **args):
+    """Sigue los next_cursor de read_file en modo bytes y junta los bytes de cada página."""
+    out = bytearray()
+    with open(path, "rb") as f:
+        while True:
+            r = _fs_call("filesystem/read_file", path=path, **args)["range"]
+            f.seek(r["offset"])
+            out += f.read(r["length"])
+            if not r["next_cursor"]:
+                return bytes(out)
+            args = {"cursor": r["next_cursor"], "max_bytes": args.get("max_bytes")}
+
+@case("filesystem/read_file_range")
+def bench_fs_read_range(n):
+    path = os.path.join(WORK, "fs_range.txt")
+    data = "línea ñandú €uro 😀\n".encode("utf-8") * 400
+    with open(path, "wb") as f:
+        f.write(data)
+    # Las páginas juntas tienen que ser exactamente la ventana pedida (también al cortar en UTF-8)
+    for offset, length, max_bytes in ((25, 25, 7), (3, 210, 10), (100, None, 333), (1, 3, 1)):
+        want = data[offset:] if length is None else data[offset:offset + length]
+        kw = {"offset": offset, "max_bytes": max_bytes} if length is None else \
+            {"offset": offset, "length": length, "max_bytes": max_bytes}
+        assert _read_pages(path, **kw) == want, f"páginas distintas de la ventana {offset}+{length}"
+    return clock(lambda: _read_pages(path, offset=1000, length=4096, max_bytes=1024), n)
+
+@case("filesystem/list_dir")
+def bench_fs_list(n):
+    d = os.path.join(WORK, "fs_list")
+    if not os.path.isdir(d):
+        os.makedirs(d)
+        for i in range(500):
+            open(os.path.join(d, f"f{i}.txt"), "w").close()
+    return clock(lambda: _fs_call("filesystem/list_dir", path=d), n)
+
+@case("filesystem/delete_file")
+def bench_fs_delete(n):
+    d = os.path.join(WORK, "fs_delete")
+    os.makedirs(d, exist_ok=True)
+    paths = [os.path.join(d, f"f{i}.txt") for i in range(n)]
+    for p in paths:
+        open(p, "w").close()
+    t0 = time.perf_counter()
+    for p in paths:
+        _fs_call("filesystem/delete_file", path=p)
+    return time.perf_counter() - t0
+
+# --- git_mcp.handle_call (cada operación lanza un subproceso git) ---
+
+def _git_call(name, **args):
+    from app.host.git_mcp import handle_call
+    return handle_call(name, args)
+
+@case("git/init", noisy=True)
+def bench_git_init(n):
+    base = tempfile.mkdtemp(dir=WORK)
+    paths = [os.path.join(base, f"r{i}") for i in range(n)]
+    t0 = time.perf_counter()
+    for p in paths:
+        _git_call("git/init", path=p)
+    elapsed = time.perf_counter() - t0
+    shutil.rmtree(base, ignore_errors=True)
+    return elapsed
+
+def _status_repo():
+    repo = os.path.join(WORK, "git_status")
+    if not os.path.isdir(repo):
+        _git_call("git/init", path=repo)
+        for i in range(200):
+            with open(os.path.join(repo, f"f{i}.txt"), "w") as f:
+                f.write(f"{i}\n")
+        _git_call("git/commit", path=repo, message="inicial")
+        for i in range(0, 200, 10):  # algunos cambios para que status tenga salida
+            with open(os.path.join(repo, f"f{i}.txt"), "a") as f:
+                f.write("cambio\n")
+    return repo
+
+@case("git/status", noisy=True)
+def bench_git_status(n):
+    repo = _status_repo()
+    return clock(lambda: _git_call("git/status", path=repo), n)
+
+@case("git/read_file", noisy=True)
+def bench_git_read_file(n):
+    # Lectura por el cat-file --batch de larga vida: una línea por el pipe, sin lanzar git
+    repo = _status_repo()
+    return clock(lambda: _git_call("git/read_file", path=repo, file="f7.txt"), n)
+
+@case("git/commit", noisy=True)
+def bench_git_commit(n):
+    repo = os.path.join(WORK, "git_commit")
+    if not os.path.isdir(repo):
+        _git_call("git/init", path=repo)
+    elapsed = 0.0
+    for i in range(n):
+        with open(os.path.join(repo, "cambios.txt"), "a") as f:
+            f.write(f"{time.time_ns()}\n")
+        t0 = time.perf_counter()
+        _git_call("git/commit", path=repo, message=f"commit {i}")
+        elapsed += time.perf_counter() - t0
+    return elapsed
+
+def _history_repo():
+    # 40 commits sobre 20 archivos: log con --stat, diff entre revisiones y show con varias páginas
+    repo = os.path.join(WORK, "git_history")
+    if not os.path.isdir(repo):
+        _git_call("git/init", path=repo)
+        for i in range(40):
+            with open(os.path.join(repo, f"h{i % 20}.txt"), "a") as f:
+                f.write("".join(f"linea {i} {j}\n" for j in range(50)))
+            _git_call("git/commit", path=repo, message=f"historia {i}")
+    return repo
+
+@case("git/log", noisy=True)
+def bench_git_log(n):
+    repo = _history_repo()
+    return clock(lambda: _git_call("git/log", path=repo, limit=20, stat=True), n)
+
+@case("git/diff", noisy=True)
+def bench_git_diff(n):
+    repo = _history_repo()
+    return clock(lambda: _git_call("git/diff", path=repo, base="HEAD~20", target="HEAD", max_bytes=16384), n)
+
+@case("git/show", noisy=True)
+def bench_git_show(n):
+    repo = _history_repo()
+    return clock(lambda: _git_call("git/show", path=repo, rev="HEAD~3"), n)
+
+# --- Ida y vuelta completa por el host: MCPClientManager -> stdio -> filesystem_mcp ---
+
+_stdio = {}
+
+def _stdio_manager():
+    if not _stdio:
+        from app.host.mcp_client import MCPClientManager
+        loop = asyncio.new_event_loop()
+        cfg = {"servers": [{"name": "filesystem", "transport": "stdio",
+                            # sin eco a stderr: mediría la consola, no el transporte
+                            "echo": False,
+                            "command": [sys.executable, "-u", str(ROOT / "app" / "host" / "filesystem_mcp.py")]}]}
+        mgr = MCPClientManager(cfg)
+        loop.run_until_complete(mgr.start_all())
+        path = os.path.join(WORK, "stdio_read.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("x" * 1024)
+        _stdio.update(loop=loop, mgr=mgr, path=path)
+    return _stdio
+
+@case("stdio/manager_call_roundtrip", noisy=True)
+def bench_stdio_roundtrip(n):
+    s = _stdio_manager()
+    params = {"name": "filesystem/read_file", "arguments": {"path": s["path"]}}
+    async def run():
+        t0 = time.perf_counter()
+        for _ in range(n):
+            await s["mgr"].call("filesystem", "tools/call", params)
+        return time.perf_counter() - t0
+    return s["loop"].run_until_complete(run())
+
+# --- Métricas del host ---
+
+@case("metrics/record_call")
+def bench_metrics_record(n):
+    # Lo que agrega cada llamada stdio con MCP_METRICS=1: espera en la ventana, request del
+    # transporte y llamada del manager. Presupuesto: < 2% de stdio/manager_call_roundtrip.
+    from app.host.metrics import Registry
+    m = Registry()
+    def one():
+        t = time.perf_counter()
+        m.queue_wait.observe(("filesystem",), 0.0)
+        m.record_request("filesystem", "stdio", "tools/call", "ok", time.perf_counter() - t)
+        m.record_call("filesystem", "filesystem/read_file", "ok", time.perf_counter() - t)
+    return clock(one, n)
+
+def _stdio_close():
+    if _stdio:
+        _stdio["loop"].run_until_complete(_stdio["mgr"].close())
+        _stdio["loop"].close()
+
+# --- Medición y comparación ---
+
+def measure(fn, samples, min_sample_s):
+    n = 1
+    while True:  # calibración: duplicar n hasta que una muestra dure lo suficiente
+        t = fn(n)
+        if t >= min_sample_s or n >= 1 << 20:
+            break
+        n = max(n * 2, int(n * min_sample_s / max(t, 1e-9) * 1.2))
+    per_op = sorted(fn(n) / n for _ in range(samples))
+    best, med = per_op[0], per_op[len(per_op) // 2]
+    return {
+        "ops_per_sample": n,
+        "us_per_op": round(best * 1e6, 3),
+        "median_us_per_op": round(med * 1e6, 3),
+        "ops_per_s": round(1.0 / best, 1),
+        "spread_pct": round(100.0 * (per_op[-1] - best) / best, 1),
+    }
+
+def measure_runs(fn, runs, samples, min_sample_s):
+    """Corre measure() `runs` veces. El valor del caso es la mediana de las medianas; noise_pct es
+    cuánto variaron esas medianas entre corridas y pasa a ser la tolerancia mínima del caso."""
+    rs = [measure(fn, samples, min_sample_s) for _ in range(runs)]
+    meds = sorted(r["median_us_per_op"] for r in rs)
+    mid = meds[len(meds) // 2]
+    res = dict(min(rs, key=lambda r: abs(r["median_us_per_op"] - mid)))
+    res.update(median_us_per_op=mid, us_per_op=min(r["us_per_op"] for r in rs), runs=runs,
+               noise_pct=round(100.0 * (meds[-1] - meds[0]) / mid, 1))
+    return res
+
+def compare(results, baseline, tolerance):
+    # Se comparan medianas: el mínimo de 7 muestras en una máquina de 1 CPU varía más que la mediana
+    rows, failed = [], False
+    for name, cur in results["cases"].items():
+        base = baseline.get("cases", {}).get(name)
+        if base is None:
+            rows.append({"case": name, "status": "new", "median_us_per_op": cur["median_us_per_op"]})
+            continue
+        tol = max(tolerance * (2 if cur.get("noisy") else 1), base.get("noise_pct", 0) / 100.0)
+        ratio = cur["median_us_per_op"] / base["median_us_per_op"]
+        status = "REGRESSION" if ratio > 1 + tol else ("faster" if ratio < 1 - tol else "ok")
+        failed = failed or status == "REGRESSION"
+        rows.append({"case": name, "status": status, "baseline_us": base["median_us_per_op"],
+                     "median_us_per_op": cur["median_us_per_op"], "ratio": round(ratio, 3),
+                     "tolerance": round(tol, 3)})
+    return rows, failed
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmarks del host y los servidores MCP, comparados contra un baseline")
+    ap.add_argument("--baseline", default=str(BASELINE))
+    ap.add_argument("--output", help="Además de imprimir, guarda los resultados en este JSON")
+    ap.add_argument("--update-baseline", action="store_true", help="Escribe los resultados como nuevo baseline")
+    ap.add_argument("--tolerance", type=float, default=0.3,
+                    help="Regresión si la mediana > baseline*(1+tol); el doble en casos noisy, y nunca menos que el noise_pct del caso")
+    ap.add_argument("--runs", type=int, help="Corridas por caso (mediana de medianas); por defecto 5 con --update-baseline y 1 al comparar")
+    ap.add_argument("--only", default="", help="Prefijos de casos separados por coma, ej: json/,git/")
+    ap.add_argument("--samples", type=int, default=7)
+    ap.add_argument("--min-sample-ms", type=float, default=50.0)
+    ap.add_argument("--retries", type=int, default=2, help="Re-mediciones de un caso que aparenta regresión")
+    args = ap.parse_args()
+
+    global WORK
+    WORK = tempfile.mkdtemp(prefix="mcp-bench-")
+    # Los logs del host van al temporal, y git necesita identidad para commitear
+    os.environ.setdefault("MCP_LOG_DIR", os.path.join(WORK, "logs"))
+    for var, val in (("GIT_AUTHOR_NAME", "bench"), ("GIT_AUTHOR_EMAIL", "bench@localhost"),
+                     ("GIT_COMMITTER_NAME", "bench"), ("GIT_COMMITTER_EMAIL", "bench@localhost")):
+        os.environ.setdefault(var, val)
+
+    baseline = None
+    if not args.update_baseline:
+        try:
+            baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            print(json.dumps({"error": f"No existe el baseline {args.baseline}; corre con --update-baseline"}, indent=2))
+            return 1
+
+    prefixes = [p for p in args.only.split(",") if p]
+    results = {"format_version": FORMAT_VERSION, "python": platform.python_version(),
+               "platform": platform.platform(), "machine": platform.machine(),
+               "cpus": os.cpu_count(), "json_backend": BACKEND, "cases": {}}
+    runs = max(1, args.runs or (5 if args.update_baseline else 1))
+    try:
+        for name, fn, noisy in CASES:
+            if prefixes and not any(name.startswith(p) for p in prefixes):
+                continue
+            res = measure_runs(fn, runs, args.samples, args.min_sample_ms / 1000.0)
+            if noisy:
+                res["noisy"] = True
+            # Una regresión aparente se vuelve a medir: descarta picos de carga ajenos a la máquina
+            for _ in range(args.retries if baseline else 0):
+                if not compare({"cases": {name: res}}, baseline, args.tolerance)[1]:
+                    break
+                again = measure_runs(fn, runs, args.samples, args.min_sample_ms / 1000.0)
+                if again["median_us_per_op"] < res["median_us_per_op"]:
+                    res.update(again)
+            results["cases"][name] = res
+            print(f"{name:34s} {res['median_us_per_op']:>12.3f} us/op (mediana)  min {res['us_per_op']:.3f}"
+                  f"  ±{res['spread_pct']}%  ruido entre corridas {res['noise_pct']}%", file=sys.stderr)
+    finally:
+        _stdio_close()
+        shutil.rmtree(WORK, ignore_errors=True)
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+    if args.update_baseline:
+        if prefixes and Path(args.baseline).exists():
+            # Con --only se actualizan solo esos casos; el resto del baseline se conserva
+            merged = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+            merged["cases"].update(results["cases"])
+            results = {**results, "cases": merged["cases"]}
+        Path(args.baseline).write_text(json.dumps(results, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+        print(json.dumps({"baseline_updated": args.baseline, "cases": len(results["cases"])}, indent=2))
+        return 0
+
+    rows, failed = compare(results, baseline, args.tolerance)
+    print(json.dumps({"baseline": args.baseline, "regressions": sum(r["status"] == "REGRESSION" for r in rows),
+                      "comparison": rows}, indent=2))
+    if failed:
+        print("❌ Regresión de rendimiento respecto al baseline", file=sys.stderr)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,71 @@
+import argparse, json, socket, sys, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+# Permite importar app.* al ejecutar como script
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from app.mcp_local.server import handle_message
+
+# Servidor JSON-RPC por HTTP que imita a un MCP remoto (p.ej. remote-utils) para benchmarks locales.
+# Expone las tools de app/mcp_local/server.py y admite keep-alive (HTTP/1.1).
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    delay_s = 0.0
+
+    def setup(self):
+        super().setup()
+        # Sin Nagle: cabeceras y cuerpo salen en escrituras separadas
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        try:
+            msg = json.loads(body)
+        except Exception as e:
+            return self._send({"jsonrpc": "2.0", "id": None, "error": {"code": -32700, "message": f"Parse error: {e}"}})
+        if self.delay_s:
+            time.sleep(self.delay_s)  # latencia de red/servidor simulada
+        resp = handle_message(msg)
+        if resp is None:  # solo notificaciones
+            self.send_response(204)
+            self.send_header("Content-Length", "0")
+            return self.end_headers()
+        self._send(resp)
+
+    def _send(self, obj):
+        data = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # El backlog por defecto (5) descarta SYNs cuando muchos clientes conectan a la vez,
+    # y cada reintento del kernel suma ~1 s de latencia
+    request_queue_size = 128
+
+def make_server(host="127.0.0.1", port=0, delay_ms=0.0):
+    handler = type("StubHandler", (Handler,), {"delay_s": delay_ms / 1000.0})
+    return StubServer((host, port), handler)
+
+def main():
+    ap = argparse.ArgumentParser(description="Servidor MCP JSON-RPC por HTTP (stand-in local)")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--delay-ms", type=float, default=0.0, help="Latencia artificial por petición")
+    args = ap.parse_args()
+    srv = make_server(args.host, args.port, args.delay_ms)
+    print(f"MCP HTTP stub en http://{args.host}:{srv.server_address[1]}/", file=sys.stderr)
+    srv.serve_forever()
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,12 @@
-import asyncio, json, time, argparse, random, shlex, sys, csv
+import asyncio, json, time, argparse, random, shlex, sys, csv, math, multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
+# Permite importar app.* al ejecutar como script (cliente HTTP con pool para --url)
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
 def rand_func_source(idx:int)->str:
     n_loops = random.randint(1,3)
     n_ifs = random.randint(1,3)
@@ -11,6 +17,91 @@ def rand_func_source(idx:int)->str:
         body.append(f"    if {random.randint(0,9)} < {random.randint(0,9)}:\n        x={random.randint(0,9)}\n    else:\n        x={random.randint(0,9)}\n")
     return "def f%d(x):\n%s    return x\n" % (idx, "".join(body))
 
+class LatencyHistogram:
+    """Histograma log-lineal estilo HDR sobre microsegundos enteros.
+
+    Valores < 2^sub_bits se guardan exactos; por encima, cada potencia de 2 se divide en
+    2^(sub_bits-1) sub-buckets lineales (error relativo < 2^-(sub_bits-1), ~0.8% con 8 bits).
+    Registrar es O(1); los percentiles salen de un único recorrido por buckets ordenados.
+    """
+    def __init__(self, sub_bits:int=8):
+        self.sub_bits = sub_bits
+        self.counts = {}
+        self.total = 0
+        self.sum_us = 0
+        self.min_us = None
+        self.max_us = 0
+
+    def _key(self, us:int)->int:
+        shift = us.bit_length() - self.sub_bits
+        if shift <= 0:
+            return us
+        return (shift << self.sub_bits) | (us >> shift)
+
+    def _value(self, key:int)->int:
+        if key < (1 << self.sub_bits):
+            return key
+        shift = key >> self.sub_bits
+        m = key & ((1 << self.sub_bits) - 1)
+        return ((m + 1) << shift) - 1  # cota superior del bucket (conservador)
+
+    def record(self, latency_ms:float):
+        us = max(0, int(latency_ms * 1000))
+        k = self._key(us)
+        self.counts[k] = self.counts.get(k, 0) + 1
+        self.total += 1
+        self.sum_us += us
+        self.max_us = max(self.max_us, us)
+        self.min_us = us if self.min_us is None else min(self.min_us, us)
+
+    def percentiles(self, ps)->dict:
+        out = {}
+        if not self.total:
+            return {p: 0 for p in ps}
+        targets = sorted((max(1, math.ceil(p / 100.0 * self.total)), p) for p in ps)
+        cum, i = 0, 0
+        for k in sorted(self.counts):
+            cum += self.counts[k]
+            while i < len(targets) and cum >= targets[i][0]:
+                out[targets[i][1]] = min(self._value(k), self.max_us) / 1000.0
+                i += 1
+        return out
+
+    def mean_ms(self)->float:
+        return self.sum_us / self.total / 1000.0 if self.total else 0
+
+    def merge(self, other:"LatencyHistogram"):
+        for k, c in other.counts.items():
+            self.counts[k] = self.counts.get(k, 0) + c
+        self.total += other.total
+        self.sum_us += other.sum_us
+        self.max_us = max(self.max_us, other.max_us)
+        if other.min_us is not None:
+            self.min_us = other.min_us if self.min_us is None else min(self.min_us, other.min_us)
+
+    def to_dict(self)->dict:
+        return {"sub_bits": self.sub_bits, "counts": self.counts, "total": self.total,
+                "sum_us": self.sum_us, "min_us": self.min_us, "max_us": self.max_us}
+
+    @classmethod
+    def from_dict(cls, d:dict)->"LatencyHistogram":
+        h = cls(d["sub_bits"])
+        h.counts = {int(k): c for k, c in d["counts"].items()}
+        h.total, h.sum_us, h.min_us, h.max_us = d["total"], d["sum_us"], d["min_us"], d["max_us"]
+        return h
+
+    def summary(self)->dict:
+        pc = self.percentiles([50, 90, 95, 99, 99.9])
+        return {
+            "avg": round(self.mean_ms(), 2),
+            "p50": round(pc[50], 2),
+            "p90": round(pc[90], 2),
+            "p95": round(pc[95], 2),
+            "p99": round(pc[99], 2),
+            "p999": round(pc[99.9], 2),
+            "max": round(self.max_us / 1000.0, 2),
+        }
+
 class MCPProc:
     def __init__(self, command:str):
         self.command = command
@@ -46,19 +137,43 @@ class MCPProc:
                 if fut and not fut.done():
                     fut.set_result(msg)
 
+    async def close(self):
+        self.proc.terminate()
+        await self.proc.wait()
+
     async def call(self, method, params):
         _id = self.next_id; self.next_id += 1
         req = {"jsonrpc":"2.0","id":_id,"method":method,"params":params}
-        self.writer.write((json.dumps(req) + "\n").encode())
-        await self.writer.drain()
-        fut = asyncio.get_event_loop().create_future()
+        # Registrar antes de escribir: con carga alta la respuesta puede llegar antes de drain()
+        fut = asyncio.get_running_loop().create_future()
         self.pending[_id] = fut
-        resp = await fut
+        try:
+            self.writer.write((json.dumps(req) + "\n").encode())
+            await self.writer.drain()
+            resp = await fut
+        finally:
+            self.pending.pop(_id, None)
         if "error" in resp:
             raise RuntimeError(resp["error"])
         return resp["result"]
 
-async def worker(mcp:MCPProc, method, tool_name, samples, total):
+class HttpTarget:
+    """Servidor MCP por HTTP, vía el MCPHttpClient del host (pool keep-alive)."""
+    def __init__(self, url:str, max_connections:int):
+        from app.host.mcp_client import MCPHttpClient
+        self.client = MCPHttpClient("load-test", url, max_connections=max_connections, echo=False)
+        self.client._log = lambda *a, **k: None  # medir el servidor, no el logging del host
+
+    async def start(self):
+        await self.client.call("initialize", {"protocolVersion":"2024-08-01"})
+
+    async def call(self, method, params):
+        return await self.client.call(method, params, timeout=3600)  # el timeout lo pone el modo de carga
+
+    async def close(self):
+        await self.client.close()
+
+async def worker(mcp:MCPProc, method, tool_name, samples, total, hist:LatencyHistogram):
     while True:
         if total["left"] <= 0: break
         total["left"] -= 1
@@ -73,29 +188,154 @@ async def worker(mcp:MCPProc, method, tool_name, samples, total):
             ok = False; err = str(e)[:200]
         t1 = time.perf_counter()
         samples.append({"ok": ok, "latency_ms": (t1-t0)*1000.0, "error": err})
+        if ok:
+            hist.record((t1-t0)*1000.0)
+
+# --- Modo open-loop: llegadas a tasa fija, independientes de lo que tarde el servidor ---
+
+class Window:
+    """Estadísticas de una ventana del perfil (un escalón, o un segundo de la rampa)."""
+    def __init__(self, idx:int, start_s:float, length_s:float):
+        self.idx = idx
+        self.start_s = start_s
+        self.length_s = length_s
+        self.sent = 0
+        self.completed = 0   # respuestas que llegaron dentro de la ventana (por reloj real)
+        self.errors = 0
+        self.hist = LatencyHistogram()  # por hora de envío *prevista* dentro de la ventana
+
+    def merge(self, other:"Window"):
+        self.sent += other.sent
+        self.completed += other.completed
+        self.errors += other.errors
+        self.hist.merge(other.hist)
+
+    def to_dict(self)->dict:
+        return {"idx": self.idx, "start_s": self.start_s, "length_s": self.length_s, "sent": self.sent,
+                "completed": self.completed, "errors": self.errors, "hist": self.hist.to_dict()}
 
-def summarize(samples, elapsed, total):
-    lat = [s["latency_ms"] for s in samples if s["ok"]]
-    errors = [s for s in samples if not s["ok"]]
-    succ = len(lat)
-    def pct(p):
-        if not lat: return 0
-        idx = max(0, min(len(lat)-1, int((p/100.0)*len(lat))-1))
-        return sorted(lat)[idx]
+    @classmethod
+    def from_dict(cls, d:dict)->"Window":
+        w = cls(d["idx"], d["start_s"], d["length_s"])
+        w.sent, w.completed, w.errors = d["sent"], d["completed"], d["errors"]
+        w.hist = LatencyHistogram.from_dict(d["hist"])
+        return w
+
+    def report(self)->dict:
+        return {
+            "window": self.idx,
+            "start_s": round(self.start_s, 3),
+            "offered_rate": round(self.sent / self.length_s, 2),
+            "achieved_throughput": round(self.completed / self.length_s, 2),
+            "errors": self.errors,
+            "latency_ms": self.hist.summary(),
+        }
+
+def constant_schedule(rate:float, n:int):
+    for i in range(n):
+        yield i / rate, 0
+
+def step_schedule(start:float, step:float, max_rate:float, step_s:float):
+    k, rate = 0, start
+    while rate <= max_rate + 1e-9:
+        for j in range(int(rate * step_s)):
+            yield k * step_s + j / rate, k
+        k += 1
+        rate = start + k * step
+
+def ramp_schedule(start:float, max_rate:float, duration_s:float, window_s:float):
+    # tasa(t) = start + a*t  =>  envíos acumulados N(t) = start*t + a*t²/2; se invierte para cada i
+    a = (max_rate - start) / duration_s
+    total = int(start * duration_s + a * duration_s ** 2 / 2)
+    for i in range(total):
+        t = i / start if a == 0 else (-start + math.sqrt(start * start + 2 * a * i)) / a
+        yield t, int(t // window_s)
+
+async def open_loop(mcp, method, tool_name, schedule, windows:dict, window_s:float,
+                    samples, hist:LatencyHistogram, timeout:float, max_in_flight:int):
+    """Envía cada request en su hora prevista. La latencia se mide desde esa hora prevista
+    (no desde el envío real), así un servidor lento no reduce la carga ofrecida ni oculta
+    el tiempo en cola (coordinated omission)."""
+    loop = asyncio.get_running_loop()
+    t0 = loop.time()
+    in_flight = set()
+    stopped = {"at": None}
+
+    def window(idx):
+        if idx not in windows:
+            windows[idx] = Window(idx, idx * window_s, window_s)
+        return windows[idx]
+
+    async def one(idx, intended, w):
+        payload = {"name": tool_name, "arguments": {"code": rand_func_source(idx)}}
+        try:
+            await asyncio.wait_for(mcp.call(method, payload), timeout)
+            ok, err = True, ""
+        except Exception as e:
+            ok, err = False, (str(e) or type(e).__name__)[:200]
+        done = loop.time()
+        latency = (done - intended) * 1000.0
+        samples.append({"ok": ok, "latency_ms": latency, "error": err})
+        window(int((done - t0) // window_s)).completed += ok
+        if ok:
+            w.hist.record(latency)
+            hist.record(latency)
+        else:
+            w.errors += 1
+
+    for idx, (offset, widx) in enumerate(schedule):
+        if len(in_flight) >= max_in_flight:
+            stopped["at"] = offset  # el servidor ya no da abasto: dejar de ofrecer carga
+            break
+        intended = t0 + offset
+        delay = intended - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        w = window(widx)
+        w.sent += 1
+        task = asyncio.create_task(one(idx, intended, w))
+        in_flight.add(task)
+        task.add_done_callback(in_flight.discard)
+    if in_flight:
+        await asyncio.gather(*in_flight)
+    return loop.time() - t0, stopped["at"]
+
+def find_saturation(windows:dict, slo_p99_ms:float)->dict:
+    """Primera ventana que incumple el SLO (p99, errores >1% o throughput <90% de lo ofrecido)."""
+    last_ok = None
+    for idx in sorted(windows):
+        w = windows[idx]
+        if not w.sent:
+            continue
+        p99 = w.hist.percentiles([99])[99]
+        offered = w.sent / w.length_s
+        achieved = w.completed / w.length_s
+        reason = None
+        if p99 > slo_p99_ms:
+            reason = f"p99 {p99:.2f} ms > {slo_p99_ms} ms"
+        elif w.errors > 0.01 * w.sent:
+            reason = f"errores {w.errors}/{w.sent}"
+        elif achieved < 0.9 * offered:
+            reason = f"throughput {achieved:.1f} < 90% de {offered:.1f}"
+        if reason:
+            return {"saturated": True, "window": idx, "offered_rate": round(offered, 2), "reason": reason,
+                    "max_sustainable_rate": last_ok["offered_rate"] if last_ok else 0,
+                    "max_sustainable_throughput": last_ok["achieved_throughput"] if last_ok else 0}
+        last_ok = {"offered_rate": round(offered, 2), "achieved_throughput": round(achieved, 2)}
+    return {"saturated": False, "max_sustainable_rate": last_ok["offered_rate"] if last_ok else 0,
+            "max_sustainable_throughput": last_ok["achieved_throughput"] if last_ok else 0}
+
+def summarize(samples, elapsed, total, hist:LatencyHistogram):
+    errors = sum(1 for s in samples if not s["ok"])
+    succ = len(samples) - errors
     return {
         "total_requests": total,
         "success": succ,
-        "errors": len(errors),
+        "errors": errors,
         "success_rate": round(100*succ/max(1,total),2),
         "elapsed_s": round(elapsed,2),
         "throughput_req_per_s": round(total/max(elapsed,1e-6),2),
-        "latency_ms": {
-            "avg": round(sum(lat)/max(1,len(lat)),2) if lat else 0,
-            "p50": round(pct(50),2) if lat else 0,
-            "p90": round(pct(90),2) if lat else 0,
-            "p95": round(pct(95),2) if lat else 0,
-            "p99": round(pct(99),2) if lat else 0
-        }
+        "latency_ms": hist.summary()
     }
 
 def save_reports(samples, summary):
@@ -107,27 +347,129 @@ def save_reports(samples, summary):
         for s in samples:
             w.writerow([s["ok"], f"{s['latency_ms']:.2f}", s["error"]])
 
-async def main():
-    ap = argparse.ArgumentParser(description="Prueba de carga para un servidor MCP por STDIO")
-    ap.add_argument("--command", required=True, help="Comando para lanzar el servidor MCP, ej: \"python -u app/mcp_local/server.py\"")
+# --- Ejecución de un shard (todo el test si --procs 1) ---
+
+def build_schedule(args):
+    if args.profile == "step":
+        return args.step_duration, step_schedule(args.rate_start, args.rate_step, args.max_rate, args.step_duration)
+    if args.profile == "ramp":
+        return args.step_duration, ramp_schedule(args.rate_start, args.max_rate, args.ramp_duration, args.step_duration)
+    return args.requests / args.rate, constant_schedule(args.rate, args.requests)
+
+def share(n:int, shard:int, nshards:int)->int:
+    return n // nshards + (1 if shard < n % nshards else 0)
+
+async def run_shard(args, shard:int=0, nshards:int=1, start_at:float=None)->dict:
+    """Corre la parte `shard` de la carga y devuelve un resultado serializable (pickle/JSON)."""
+    target = HttpTarget(args.url, args.max_connections) if args.url else MCPProc(args.command)
+    await target.start()
+    if start_at is not None:
+        # Todos los procesos arrancan a la vez para que las ventanas coincidan
+        await asyncio.sleep(max(0.0, start_at - time.time()))
+
+    samples, hist, windows = [], LatencyHistogram(), {}
+    stopped_at = None
+    if args.rate > 0 or args.profile:
+        window_s, schedule = build_schedule(args)
+        # Cada shard toma uno de cada N envíos del calendario global: la tasa total se conserva
+        mine = (item for i, item in enumerate(schedule) if i % nshards == shard)
+        elapsed, stopped_at = await open_loop(target, args.method, args.name, mine, windows, window_s,
+                                              samples, hist, args.timeout, max(1, args.max_in_flight // nshards))
+        total = len(samples)
+    else:
+        total = share(args.requests, shard, nshards)
+        left = {"left": total, "sent": 0}
+        tasks = [asyncio.create_task(worker(target, args.method, args.name, samples, left, hist))
+                 for _ in range(max(1, share(args.concurrency, shard, nshards)))]
+        t0 = time.perf_counter()
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - t0
+    out = {"worker": shard, "total": total, "elapsed": elapsed, "stopped_at": stopped_at,
+           "samples": samples, "hist": hist.to_dict(), "windows": [w.to_dict() for w in windows.values()]}
+    if args.url:
+        out["tcp_connections_opened"] = target.client.pool.opened
+    await target.close()
+    return out
+
+def _shard_entry(args, shard, nshards, start_at):
+    return asyncio.run(run_shard(args, shard, nshards, start_at))
+
+def merge_results(args, results:list)->tuple:
+    samples, hist, windows = [], LatencyHistogram(), {}
+    per_worker = []
+    for r in results:
+        samples.extend(r["samples"])
+        h = LatencyHistogram.from_dict(r["hist"])
+        hist.merge(h)
+        for wd in r["windows"]:
+            w = Window.from_dict(wd)
+            if w.idx in windows:
+                windows[w.idx].merge(w)
+            else:
+                windows[w.idx] = w
+        row = summarize(r["samples"], r["elapsed"], r["total"], h)
+        row = {"worker": r["worker"], **row}
+        if "tcp_connections_opened" in r:
+            row["tcp_connections_opened"] = r["tcp_connections_opened"]
+        per_worker.append(row)
+
+    elapsed = max(r["elapsed"] for r in results)
+    total = sum(r["total"] for r in results)
+    summary = summarize(samples, elapsed, total, hist)
+    summary["target"] = args.url or args.command
+    if args.rate > 0 or args.profile:
+        summary["mode"] = "open-loop"
+        summary["latency_basis"] = "intended_send_time"
+        if args.profile:
+            summary["profile"] = args.profile
+            summary["windows"] = [windows[i].report() for i in sorted(windows)]
+            summary["saturation"] = find_saturation(windows, args.slo_p99_ms)
+        else:
+            summary["offered_rate"] = args.rate
+        stops = [r["stopped_at"] for r in results if r["stopped_at"] is not None]
+        if stops:
+            summary["stopped_early_at_s"] = round(min(stops), 3)
+    if len(results) > 1:
+        summary["procs"] = len(results)
+        summary["workers"] = per_worker
+    return samples, summary
+
+def main():
+    ap = argparse.ArgumentParser(description="Prueba de carga para un servidor MCP (STDIO o HTTP)")
+    tgt = ap.add_mutually_exclusive_group(required=True)
+    tgt.add_argument("--command", help="Comando para lanzar el servidor MCP, ej: \"python -u app/mcp_local/server.py\"")
+    tgt.add_argument("--url", help="Endpoint de un servidor MCP por HTTP, ej: http://127.0.0.1:8000/")
+    ap.add_argument("--max-connections", type=int, default=8, help="Conexiones keep-alive por proceso con --url")
+    ap.add_argument("--procs", type=int, default=1, help="Procesos generadores de carga; con --command cada uno lanza su propio servidor")
     ap.add_argument("--method", default="tools/call", help="Método JSON-RPC a invocar")
     ap.add_argument("--name", default="code/complexity/analyze", help="Nombre de la herramienta a invocar")
-    ap.add_argument("--concurrency", type=int, default=10)
+    ap.add_argument("--concurrency", type=int, default=10, help="Workers del modo closed-loop (total, repartido entre procesos)")
     ap.add_argument("--requests", type=int, default=200)
+    ap.add_argument("--rate", type=float, default=0, help="Open-loop: requests/s a tasa fija (ignora --concurrency)")
+    ap.add_argument("--profile", choices=["step", "ramp"], help="Open-loop con tasa creciente para hallar la saturación")
+    ap.add_argument("--rate-start", type=float, default=500)
+    ap.add_argument("--rate-step", type=float, default=500, help="Incremento por escalón (perfil step)")
+    ap.add_argument("--max-rate", type=float, default=10000)
+    ap.add_argument("--step-duration", type=float, default=2.0, help="Segundos por escalón / ventana de la rampa")
+    ap.add_argument("--ramp-duration", type=float, default=20.0, help="Duración total de la rampa")
+    ap.add_argument("--slo-p99-ms", type=float, default=50.0, help="p99 máximo aceptable para considerar una tasa sostenible")
+    ap.add_argument("--timeout", type=float, default=30.0, help="Timeout por request en open-loop")
+    ap.add_argument("--max-in-flight", type=int, default=5000, help="Open-loop: corta la carga si hay más requests pendientes")
+    ap.add_argument("--start-delay", type=float, default=2.0, help="Con --procs >1: segundos para que todos conecten antes de empezar")
     args = ap.parse_args()
 
-    mcp = MCPProc(args.command)
-    await mcp.start()
-
-    samples = []
-    total = {"left": args.requests, "sent": 0}
-    tasks = [asyncio.create_task(worker(mcp, args.method, args.name, samples, total)) for _ in range(args.concurrency)]
-    t0 = time.perf_counter()
-    await asyncio.gather(*tasks)
-    elapsed = time.perf_counter() - t0
-    summary = summarize(samples, elapsed, args.requests)
+    if args.procs <= 1:
+        results = [asyncio.run(run_shard(args))]
+    else:
+        # spawn: mismo comportamiento en Linux y Windows, y sin heredar el estado del padre
+        ctx = multiprocessing.get_context("spawn")
+        start_at = time.time() + args.start_delay
+        with ProcessPoolExecutor(max_workers=args.procs, mp_context=ctx) as pool:
+            futs = [pool.submit(_shard_entry, args, i, args.procs, start_at) for i in range(args.procs)]
+            results = [f.result() for f in futs]
+    samples, summary = merge_results(args, results)
     save_reports(samples, summary)
     print(json.dumps(summary, indent=2))
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    main()
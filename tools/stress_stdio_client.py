@@ -0,0 +1,73 @@
+import asyncio, argparse, json, sys, time
+from pathlib import Path
+
+# Permite importar app.* al ejecutar como script
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from app.host.mcp_client import MCPProcessClient
+
+def func_source(idx:int)->str:
+    return f"def f{idx}(x):\n    if x > {idx}:\n        return 1\n    return 0\n"
+
+async def one_call(client:MCPProcessClient, idx:int, timeout:float):
+    res = await client.call("tools/call", {"name": "code/complexity/analyze",
+                                           "arguments": {"code": func_source(idx)}}, timeout=timeout)
+    # La respuesta debe corresponder a *esta* petición, no a otra en vuelo
+    name = res["content"]["summary"][0]["name"]
+    if name != f"f{idx}":
+        raise AssertionError(f"respuesta cruzada: esperaba f{idx}, llegó {name}")
+
+async def batch_calls(client:MCPProcessClient, start:int, size:int, timeout:float):
+    calls = [("tools/call", {"name": "code/complexity/analyze", "arguments": {"code": func_source(i)}})
+             for i in range(start, start + size)]
+    out = await client.call_batch(calls, timeout=timeout)
+    for i, res in zip(range(start, start + size), out):
+        if isinstance(res, Exception):
+            raise res
+        if res["content"]["summary"][0]["name"] != f"f{i}":
+            raise AssertionError(f"respuesta cruzada en batch: esperaba f{i}")
+
+async def main():
+    ap = argparse.ArgumentParser(description="Stress test de MCPProcessClient: miles de llamadas concurrentes por STDIO")
+    ap.add_argument("--command", default=f"{sys.executable} -u app/mcp_local/server.py")
+    ap.add_argument("--calls", type=int, default=5000)
+    ap.add_argument("--rounds", type=int, default=3)
+    ap.add_argument("--timeout", type=float, default=60)
+    ap.add_argument("--batch", type=int, default=0, help="Si >0, agrupa las llamadas en batches JSON-RPC de este tamaño")
+    args = ap.parse_args()
+
+    client = MCPProcessClient("stress", args.command.split(), echo=False)
+    await client.start()
+    report = {"calls_per_round": args.calls, "batch": args.batch, "rounds": []}
+    failed = False
+    for r in range(args.rounds):
+        first_id = client.next_id
+        t0 = time.perf_counter()
+        if args.batch > 0:
+            jobs = (batch_calls(client, i, min(args.batch, args.calls - i), args.timeout)
+                    for i in range(0, args.calls, args.batch))
+        else:
+            jobs = (one_call(client, i, args.timeout) for i in range(args.calls))
+        results = await asyncio.gather(*jobs, return_exceptions=True)
+        elapsed = time.perf_counter() - t0
+        errors = [str(e)[:200] for e in results if isinstance(e, BaseException)]
+        ids_ok = client.next_id - first_id == args.calls
+        report["rounds"].append({
+            "round": r + 1,
+            "elapsed_s": round(elapsed, 3),
+            "throughput_req_per_s": round(args.calls / max(elapsed, 1e-6), 2),
+            "errors": len(errors),
+            "sample_errors": errors[:5],
+            "pending_after": len(client.pending),
+            "ids_monotonic": ids_ok,
+        })
+        failed = failed or bool(errors) or bool(client.pending) or not ids_ok
+    client.proc.terminate()
+    await client.proc.wait()
+    print(json.dumps(report, indent=2))
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))